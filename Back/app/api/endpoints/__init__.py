@@ -1,5 +1,7 @@
 # app/api/endpoints/__init__.py
 from app.api.endpoints.stream import router as stream_router
 from app.api.endpoints.notifications import router as notifications_router
+from app.api.endpoints.detections import router as detections_router
+from app.api.endpoints.analysis import router as analysis_router
 
-__all__ = ["stream_router", "notifications_router"]
+__all__ = ["stream_router", "notifications_router", "detections_router", "analysis_router"]
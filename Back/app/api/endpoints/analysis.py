@@ -0,0 +1,110 @@
+# app/api/endpoints/analysis.py
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.video_analysis import analyze_videos
+from app.utils.push_id import generate_push_id
+import asyncio
+import logging
+import os
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Trabajos de análisis offline de este proceso
+analysis_jobs: Dict[str, Dict] = {}
+
+
+class AnalysisRequest(BaseModel):
+    """
+    Videos a re-analizar en busca de caídas, relativos a ANALYSIS_INPUT_DIR;
+    `output_dir` es una subcarpeta de ANALYSIS_OUTPUT_DIR
+    """
+    videos: List[str]
+    output_dir: str = ""
+    workers: Optional[int] = None
+    chunk_seconds: float = 60.0
+    stride: int = 1
+    location: str = "Análisis offline"
+
+
+def resolve_under(root: str, path: str) -> str:
+    """Ruta real de `path` dentro de `root`; ValueError si sale de ella (.., absolutas o enlaces)"""
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Ruta fuera de {root}: {path}")
+    return resolved
+
+
+def _prune_jobs():
+    """Descarta los trabajos terminados más antiguos por encima de ANALYSIS_MAX_JOBS"""
+    finished = [job_id for job_id, job in analysis_jobs.items() if job['status'] != 'running']
+    for job_id in finished[:max(len(finished) - settings.ANALYSIS_MAX_JOBS, 0)]:
+        del analysis_jobs[job_id]
+
+
+def _running_jobs() -> int:
+    return sum(1 for job in analysis_jobs.values() if job['status'] == 'running')
+
+
+async def _run_job(job_id: str, request: AnalysisRequest, videos: List[str], output_dir: str):
+    job = analysis_jobs[job_id]
+    # Nunca más procesos que núcleos, los pida quien los pida
+    cpus = os.cpu_count() or 1
+    try:
+        # El pool de procesos se gestiona desde un hilo para no bloquear el event loop
+        job['result'] = await asyncio.to_thread(
+            analyze_videos,
+            videos,
+            os.path.join(output_dir, job_id),
+            workers=min(request.workers or cpus, cpus),
+            chunk_seconds=request.chunk_seconds,
+            stride=max(request.stride, 1),
+            location=request.location,
+        )
+        job['status'] = 'done'
+    except Exception as e:
+        logger.error(f"Error en análisis offline {job_id}: {str(e)}")
+        job['status'] = 'error'
+        job['error'] = str(e)
+    finally:
+        _prune_jobs()
+
+
+@router.post("/analysis", status_code=202)
+async def start_analysis(request: AnalysisRequest):
+    """Inicia un análisis por lotes de videos grabados"""
+    try:
+        videos = [resolve_under(settings.ANALYSIS_INPUT_DIR, video) for video in request.videos]
+        output_dir = resolve_under(settings.ANALYSIS_OUTPUT_DIR, request.output_dir)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    missing = [video for video, path in zip(request.videos, videos) if not os.path.isfile(path)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Videos no encontrados: {missing}")
+
+    if _running_jobs() >= settings.ANALYSIS_MAX_RUNNING:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Ya hay {settings.ANALYSIS_MAX_RUNNING} análisis en curso; reintentar cuando terminen"
+        )
+
+    job_id = generate_push_id()
+    analysis_jobs[job_id] = {'id': job_id, 'status': 'running', 'videos': request.videos}
+    asyncio.create_task(_run_job(job_id, request, videos, output_dir))
+    return analysis_jobs[job_id]
+
+
+@router.get("/analysis/{job_id}")
+async def get_analysis(job_id: str):
+    """Estado y resultado de un análisis offline"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    return job
+
+analysis_router = router
@@ -0,0 +1,40 @@
+# app/api/endpoints/detections.py
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
+from app.core.config import settings
+from app.services.firebase_service import FirebaseService
+import asyncio
+import logging
+import os
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/detections")
+async def list_detections(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    location: Optional[str] = None,
+    limit: int = 100
+):
+    """Consulta detecciones por rango de tiempo (ISO 8601) y ubicación"""
+    store = FirebaseService().store
+    if store is None:
+        raise HTTPException(status_code=503, detail="Almacenamiento no inicializado")
+    try:
+        return await asyncio.to_thread(store.query_detections, start, end, location, limit)
+    except Exception as e:
+        logger.error(f"Error al consultar detecciones: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/detections/clips/{filename}")
+async def get_clip(filename: str):
+    """Descarga el clip de video enlazado en una detección"""
+    path = os.path.join(settings.CLIP_DIR, os.path.basename(filename))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Clip no encontrado")
+    return FileResponse(path, media_type="video/x-msvideo")
+
+detections_router = router
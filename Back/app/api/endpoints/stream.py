@@ -1,13 +1,19 @@
 # app/api/endpoints/stream.py
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Dict, Optional
 from app.services.video_service import VideoService
 from app.services.yolo_service import YoloService
 from app.core.config import settings
-import cv2
-import numpy as np
 import asyncio
+import json
 import logging
+import os
+import time
 from app.services.firebase_service import FirebaseService
+from app.services.stream_pipeline import StreamPipeline, STREAM_MODES
+from app.services.batch_scheduler import BatchScheduler
+from app.services.inference_workers import InferenceWorkerPool
+from app.core.metrics import registry, PIPELINE_STAGE_SECONDS
 from datetime import datetime
 
 router = APIRouter()
@@ -15,19 +21,153 @@ video_service = VideoService()
 yolo_service = YoloService()
 logger = logging.getLogger(__name__)
 
-async def try_reconnect_camera(video_service, max_attempts=3):
-    """Intenta reconectar la cámara"""
-    for attempt in range(max_attempts):
-        logger.info(f"Intento de reconexión {attempt + 1}/{max_attempts}")
-        if await video_service.initialize_camera(settings.CAMERA_URL):
-            logger.info("Reconexión exitosa")
-            return True
-        await asyncio.sleep(1)
-    logger.error("Todos los intentos de reconexión fallaron")
-    return False
-
 # Inicializar servicios
 firebase_service = FirebaseService()
+batch_scheduler = BatchScheduler(
+    yolo_service,
+    window_ms=settings.INFERENCE_BATCH_WINDOW_MS,
+    max_batch=settings.INFERENCE_MAX_BATCH
+)
+# En modo "process" la inferencia sale del proceso de la API a un pool de procesos
+worker_pool: Optional[InferenceWorkerPool] = None
+if settings.INFERENCE_MODE == "process":
+    worker_pool = InferenceWorkerPool(
+        settings.INFERENCE_WORKERS or os.cpu_count() or 1,
+        settings.MODEL_PATH,
+        settings.INFERENCE_DEVICE,
+        settings.MODEL_BACKEND,
+        settings.MODEL_IMGSZ,
+        precision=settings.MODEL_PRECISION,
+        threads=settings.INFERENCE_WORKER_THREADS,
+        warmup=settings.MODEL_WARMUP,
+    )
+# Un pipeline por cámara, todos compartiendo el mismo modelo YOLO
+stream_pipelines: Dict[str, StreamPipeline] = {}
+model_preload_task: Optional[asyncio.Task] = None
+model_preload_error: Optional[str] = None
+
+
+async def ensure_model():
+    """Carga el modelo compartido (o lanza los procesos de inferencia) si aún no está listo"""
+    if worker_pool:
+        await worker_pool.start()
+    else:
+        await yolo_service.initialize(settings.MODEL_PATH)
+
+
+async def preload_model():
+    """Carga y precalienta el modelo compartido para que el primer visor no espere"""
+    global model_preload_error
+    try:
+        await ensure_model()
+        # Los procesos de inferencia se precalientan solos al cargar el modelo
+        if settings.MODEL_WARMUP and not worker_pool:
+            await yolo_service.warmup()
+        model_preload_error = None
+    except Exception as e:
+        model_preload_error = str(e)
+        logger.error(f"Error al precargar el modelo: {str(e)}")
+
+
+def start_model_preload():
+    """Lanza la precarga en segundo plano; la API responde mientras tanto"""
+    global model_preload_task
+    if model_preload_task is None or model_preload_task.done():
+        model_preload_task = asyncio.create_task(preload_model())
+
+
+async def stop_streams():
+    """Detiene los pipelines y los hilos de captura antes de cerrar el proceso"""
+    for pipeline in stream_pipelines.values():
+        await pipeline.stop()
+    await asyncio.to_thread(video_service.camera_registry.stop_all)
+
+
+def stop_inference_workers():
+    if worker_pool:
+        worker_pool.stop()
+
+
+def model_status() -> Dict:
+    """Estado del modelo para el endpoint de readiness"""
+    if worker_pool:
+        return {
+            'loaded': worker_pool.ready,
+            'warmed_up': worker_pool.ready and worker_pool.warmup,
+            'loading': model_preload_task is not None and not model_preload_task.done(),
+            'backend': worker_pool.backend,
+            'device': worker_pool.device,
+            'workers': worker_pool.size,
+            'error': model_preload_error,
+        }
+    return {
+        'loaded': yolo_service.initialized,
+        'warmed_up': yolo_service.warmed_up,
+        'loading': model_preload_task is not None and not model_preload_task.done(),
+        'backend': yolo_service.backend,
+        'device': yolo_service.device,
+        'error': model_preload_error,
+    }
+
+
+def get_stream_pipeline(camera_id: str) -> Optional[StreamPipeline]:
+    """Devuelve (creándolo si hace falta) el pipeline de la cámara indicada"""
+    if camera_id not in stream_pipelines:
+        camera_manager = video_service.get_camera(camera_id)
+        if camera_manager is None:
+            return None
+        stream_pipelines[camera_id] = StreamPipeline(
+            camera_manager, yolo_service, firebase_service, batch_scheduler, worker_pool
+        )
+    return stream_pipelines[camera_id]
+
+
+registry.callback(
+    "stream_viewers", "Visores conectados por cámara", ("camera",),
+    lambda: {(camera_id,): pipeline.viewers for camera_id, pipeline in stream_pipelines.items()}
+)
+registry.callback(
+    "stream_viewers_by_quality", "Visores anotados por nivel de calidad adaptativa", ("camera", "level"),
+    lambda: {
+        (camera_id, str(level)): count
+        for camera_id, pipeline in stream_pipelines.items()
+        for level, count in pipeline.viewer_levels().items()
+    }
+)
+registry.callback(
+    "frames_captured_total", "Frames capturados por cámara", ("camera",),
+    lambda: {
+        (camera.camera_id,): camera.frames_captured
+        for camera in video_service.camera_registry.cameras.values()
+    },
+    metric_type="counter"
+)
+registry.callback(
+    "viewer_frames_dropped_total", "Frames descartados por visores atrasados", ("camera",),
+    lambda: {(camera_id,): pipeline.dropped for camera_id, pipeline in stream_pipelines.items()},
+    metric_type="counter"
+)
+registry.callback(
+    "motion_gate_frames_total", "Frames inferidos o saltados por la compuerta de movimiento",
+    ("camera", "result"),
+    lambda: {
+        (camera_id, result): value
+        for camera_id, pipeline in stream_pipelines.items()
+        for result, value in (
+            ("inferred", pipeline.motion_gate.inferred),
+            ("gated", pipeline.motion_gate.gated),
+        )
+    },
+    metric_type="counter"
+)
+registry.callback(
+    "inference_queue_depth", "Frames esperando inferencia", ("queue",),
+    lambda: {
+        ("batch",): len(batch_scheduler.pending),
+        ("executor",): yolo_service.executor.pending(),
+        ("workers",): worker_pool.pending() if worker_pool else 0,
+    }
+)
 
 @router.on_event("startup")
 async def startup_event():
@@ -42,81 +182,175 @@ async def startup_event():
         
         
 
-# app/api/endpoints/stream.py
+@router.get("/cameras")
+async def list_cameras():
+    """Lista las cámaras configuradas y su estado"""
+    return [
+        {
+            'id': camera.camera_id,
+            'location': camera.location,
+            'running': camera.is_running,
+            'frame_age_s': camera.frame_age_seconds(),
+            'reconnects': camera.reconnects,
+            'viewers': len(video_service.connections.get(camera.camera_id, ())),
+            # Visores anotados por nivel de calidad adaptativa (0 = el mejor)
+            'quality_levels': stream_pipelines[camera.camera_id].viewer_levels()
+            if camera.camera_id in stream_pipelines else {},
+        }
+        for camera in video_service.camera_registry.cameras.values()
+    ]
+
+
+@router.get("/inference/stats")
+async def inference_stats():
+    """Métricas del agrupamiento por lotes y del hilo de inferencia"""
+    return {
+        'batching': batch_scheduler.stats(),
+        'executor': yolo_service.executor.stats(),
+        'workers': worker_pool.stats() if worker_pool else None,
+        'motion_gate': {
+            camera_id: pipeline.motion_gate.stats()
+            for camera_id, pipeline in stream_pipelines.items()
+        },
+    }
+
+
+class StreamOptions:
+    """
+    Modo de un visor: `?mode=overlay&frames=0` en la URL o, en cualquier momento,
+    un mensaje de texto `{"mode": "overlay", "frames": false}`
+    """
+
+    def __init__(self, mode: str = "annotated", frames: bool = True):
+        self.mode = mode
+        self.frames = frames
+
+    def update(self, mode: Optional[str] = None, frames=None):
+        if mode in STREAM_MODES:
+            self.mode = mode
+        elif mode is not None:
+            logger.warning(f"Modo de stream desconocido: {mode}")
+        if frames is not None:
+            self.frames = str(frames).lower() not in ("0", "false", "no")
+
+    @classmethod
+    def from_query(cls, query_params) -> "StreamOptions":
+        options = cls()
+        options.update(query_params.get("mode"), query_params.get("frames"))
+        return options
+
+
+async def receive_stream_options(websocket: WebSocket, options: StreamOptions):
+    """Atiende los mensajes de control del visor mientras se le envía el stream"""
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                control = json.loads(message)
+                options.update(control.get("mode"), control.get("frames"))
+            except (ValueError, AttributeError):
+                logger.warning(f"Mensaje de control inválido: {message[:100]}")
+    except WebSocketDisconnect:
+        pass
+
+
+async def next_stream_item(subscription, receiver: asyncio.Task):
+    """
+    Espera el siguiente elemento del visor; None si se desconectó mientras tanto
+    (con la cámara detenida no llegan frames que delaten la desconexión al enviar)
+    """
+    getter = asyncio.ensure_future(subscription.get())
+    try:
+        done, _ = await asyncio.wait((getter, receiver), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not getter.done():
+            getter.cancel()
+    return getter.result() if getter in done else None
+
+
 @router.websocket("/ws/stream")
-async def websocket_endpoint(websocket: WebSocket):
+async def default_stream_endpoint(websocket: WebSocket):
+    """Stream de la cámara por defecto (la primera configurada)"""
+    await websocket_endpoint(websocket, video_service.camera_registry.default_id)
+
+
+@router.websocket("/ws/stream/{camera_id}")
+async def websocket_endpoint(websocket: WebSocket, camera_id: str):
+    stream_pipeline = get_stream_pipeline(camera_id)
+    if stream_pipeline is None:
+        logger.warning(f"Solicitud de stream para cámara desconocida: {camera_id}")
+        await websocket.close(1008)
+        return
+
+    subscription = None
+    receiver = None
+    options = StreamOptions.from_query(websocket.query_params)
     try:
-        await video_service.connect(websocket)
+        await video_service.connect(websocket, camera_id)
         
         # Inicializar YOLO
         try:
-            await yolo_service.initialize(settings.MODEL_PATH)
+            await ensure_model()
         except Exception as e:
             logger.error(f"Error al inicializar YOLO: {str(e)}")
             await websocket.close(1001)
             return
 
         # Inicializar cámara si no está iniciada
-        if not video_service.camera_manager.is_running:
-            if not await video_service.initialize_camera(settings.CAMERA_URL):
+        if not stream_pipeline.camera_manager.is_running:
+            if not await video_service.initialize_camera(camera_id):
                 await websocket.close(1001)
                 return
 
+        # Un único pipeline por cámara: la inferencia se ejecuta una vez por frame
+        stream_pipeline.start()
+        mode = options.mode
+        # Cada visor anotado tiene su propio control de calidad según cómo drena su conexión
+        quality = stream_pipeline.new_viewer_quality()
+        subscription = stream_pipeline.subscribe(mode, quality, options)
+        receiver = asyncio.create_task(receive_stream_options(websocket, options))
+        send_seconds = PIPELINE_STAGE_SECONDS.labels(camera_id, "send")
+        has_keyframe = False
+
         while True:
-            try:
-                frame_buffer = await video_service.get_frame()
-                if not frame_buffer:
-                    continue
-
-                # Procesar frame con YOLO
-                frame_array = np.frombuffer(frame_buffer, dtype=np.uint8)
-                frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
-                
-                results = await yolo_service.detect(frame)
-                boxes = yolo_service.get_boxes(results)
-                
-                # Procesar detecciones y enviar notificaciones si es necesario
-                for box in boxes:
-                    confidence = box['conf']
-                    class_id = box['class']
-                    
-                    # Si detectamos una caída (asumiendo que class_id 0 es caída)
-                    if class_id == 0 and confidence > settings.DETECTION_THRESHOLD:
-                        detection_data = {
-                            'confidence': float(confidence),
-                            'class_id': int(class_id),
-                            'bbox': box['bbox'],
-                            'location': 'Salon de Pruebas',  # Personalizar según necesidad
-                        }
-                        
-                        # Intentar enviar notificación
-                        await firebase_service.save_detection(detection_data)
-
-                # Dibujar detecciones de YOLO en el frame
-                for box in boxes:
-                    if class_id == 0:
-                        x1, y1, x2, y2 = map(int, box['bbox'])
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                        cv2.putText(frame, f"CAIDA:{box['conf']:.2f}",
-                                (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                    else:
-                        x1, y1, x2, y2 = map(int, box['bbox'])
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        cv2.putText(frame, f"PERSONA:{box['conf']:.2f}",
-                                (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-                # Enviar frame procesado al cliente
-                _, processed_buffer = cv2.imencode('.jpg', frame)
-                await websocket.send_bytes(processed_buffer.tobytes())
-
-            except WebSocketDisconnect:
-                break
-            except Exception as e:
-                logger.error(f"Error en streaming: {str(e)}")
-                await asyncio.sleep(0.01)
+            if options.mode != mode:
+                stream_pipeline.unsubscribe(subscription)
+                mode = options.mode
+                subscription = stream_pipeline.subscribe(mode, quality, options)
+                has_keyframe = False
+                logger.info(f"Visor de {camera_id} cambió a modo {mode}")
 
+            item = await next_stream_item(subscription, receiver)
+            if item is None:
+                raise WebSocketDisconnect()
+            started = time.perf_counter()
+            if mode == "overlay":
+                # Metadatos como texto; el JPEG crudo, si lo hay, llega justo después como binario
+                message, raw_frame = item
+                await websocket.send_text(message)
+                if raw_frame is not None and options.frames:
+                    await websocket.send_bytes(raw_frame)
+                    has_keyframe = True
+                elif options.frames and not has_keyframe:
+                    # El frame crudo inicial se descartó (visor atrasado): se pide otro
+                    stream_pipeline.request_keyframe()
+                send_seconds.observe(time.perf_counter() - started)
+            else:
+                quality.begin_send(len(item))
+                await websocket.send_bytes(item)
+                elapsed = time.perf_counter() - started
+                send_seconds.observe(elapsed)
+                quality.record_send(len(item), elapsed, subscription.dropped)
+
+    except WebSocketDisconnect:
+        logger.info(f"Cliente de stream desconectado: {camera_id}")
     except Exception as e:
         logger.error(f"Error en websocket: {str(e)}")
     finally:
-        video_service.disconnect(websocket)
-
+        if receiver:
+            receiver.cancel()
+        if subscription:
+            stream_pipeline.unsubscribe(subscription)
+        if not stream_pipeline.viewers:
+            await stream_pipeline.stop()
+        await video_service.disconnect(websocket, camera_id)
@@ -0,0 +1,116 @@
+# app/core/adaptive_quality.py
+import time
+from typing import Dict, List, Optional, Sequence
+
+
+class QualityLevel:
+    """Variante del stream: calidad JPEG, escala de la imagen y FPS máximo (0 = sin límite)"""
+
+    __slots__ = ("quality", "scale", "fps")
+
+    def __init__(self, quality: int, scale: float = 1.0, fps: float = 0.0):
+        self.quality = int(quality)
+        self.scale = float(scale)
+        self.fps = float(fps)
+
+    @classmethod
+    def parse_levels(cls, levels: Sequence[Sequence[float]]) -> List["QualityLevel"]:
+        """Convierte `[[calidad, escala, fps], ...]` (de mejor a peor) en niveles"""
+        parsed = [cls(*level) for level in levels]
+        if not parsed:
+            raise ValueError("Se necesita al menos un nivel de calidad")
+        return parsed
+
+
+class AdaptiveQuality:
+    """
+    Control de calidad de un visor según la contrapresión medida.
+
+    Cada ventana se compara el tiempo que el visor pasó recibiendo frames
+    (`send_bytes` espera cuando su conexión no drena) y los frames que se le
+    descartaron por ir atrasado: si está saturado se baja un nivel (menos
+    calidad, resolución o FPS) y si sobra margen de forma sostenida se sube.
+    """
+
+    def __init__(self, levels: List[QualityLevel], window: float = 2.0, busy_high: float = 0.6,
+                 busy_low: float = 0.25, upgrade_after: float = 6.0, enabled: bool = True):
+        self.levels = levels
+        self.window = window
+        self.busy_high = busy_high
+        self.busy_low = busy_low
+        self.upgrade_after = upgrade_after
+        self.enabled = enabled
+        self.level = 0
+        self.changes = 0
+        self.pending_bytes = 0
+        self.busy = 0.0
+        self.throughput = 0.0
+        now = time.monotonic()
+        self._window_start = now
+        self._stable_since = now
+        self._send_seconds = 0.0
+        self._bytes = 0
+        self._dropped_seen = 0
+        self._last_offered = 0.0
+
+    @property
+    def current(self) -> QualityLevel:
+        return self.levels[self.level]
+
+    def ready(self, now: float) -> bool:
+        """Si al visor le toca un frame nuevo según el FPS de su nivel"""
+        fps = self.current.fps
+        # Pequeña tolerancia para no perder frames por el jitter de la captura
+        return not fps or now - self._last_offered >= 0.9 / fps
+
+    def offered(self, now: float):
+        self._last_offered = now
+
+    def begin_send(self, nbytes: int):
+        self.pending_bytes = nbytes
+
+    def record_send(self, nbytes: int, seconds: float, dropped: int, now: Optional[float] = None):
+        """Registra un envío terminado y, al cerrar la ventana, ajusta el nivel"""
+        now = time.monotonic() if now is None else now
+        self.pending_bytes = 0
+        self._send_seconds += seconds
+        self._bytes += nbytes
+
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        self.busy = self._send_seconds / elapsed
+        self.throughput = self._bytes / self._send_seconds if self._send_seconds else 0.0
+        # El contador vuelve a cero si el visor cambia de suscripción
+        drops = max(0, dropped - self._dropped_seen)
+        self._dropped_seen = dropped
+        self._window_start = now
+        self._send_seconds = 0.0
+        self._bytes = 0
+
+        if not self.enabled:
+            return
+        if self.busy > self.busy_high or drops:
+            if self.level < len(self.levels) - 1:
+                self.level += 1
+                self.changes += 1
+            self._stable_since = now
+        elif self.busy >= self.busy_low:
+            self._stable_since = now
+        elif self.level > 0 and now - self._stable_since >= self.upgrade_after:
+            self.level -= 1
+            self.changes += 1
+            self._stable_since = now
+
+    def stats(self) -> Dict:
+        level = self.current
+        return {
+            'level': self.level,
+            'quality': level.quality,
+            'scale': level.scale,
+            'fps': level.fps,
+            'busy': round(self.busy, 3),
+            'throughput_kbps': round(self.throughput * 8 / 1000, 1),
+            'pending_bytes': self.pending_bytes,
+            'changes': self.changes,
+        }
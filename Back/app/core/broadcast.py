@@ -0,0 +1,64 @@
+# app/core/broadcast.py
+import asyncio
+import logging
+from typing import Any, Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Suscripción a un BroadcastHub que conserva solo el último elemento publicado"""
+
+    def __init__(self, maxsize: int = 1, state: Any = None):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        # Estado propio del suscriptor (p. ej. su control de calidad)
+        self.state = state
+
+    def offer(self, item: Any) -> int:
+        """Entrega un elemento descartando el más antiguo si el suscriptor va atrasado"""
+        dropped = 0
+        while self.queue.full():
+            try:
+                self.queue.get_nowait()
+                dropped += 1
+            except asyncio.QueueEmpty:
+                break
+        self.queue.put_nowait(item)
+        self.dropped += dropped
+        return dropped
+
+    async def get(self) -> Any:
+        """Espera el siguiente elemento disponible"""
+        return await self.queue.get()
+
+
+class BroadcastHub:
+    """Difunde cada elemento publicado a todos los suscriptores sin bloquear al productor"""
+
+    def __init__(self):
+        self.subscribers: Set[Subscription] = set()
+        self.dropped = 0
+
+    def subscribe(self, state: Any = None) -> Subscription:
+        subscription = Subscription(state=state)
+        self.subscribers.add(subscription)
+        logger.info(f"Nuevo suscriptor. Total: {len(self.subscribers)}")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        logger.info(f"Suscriptor eliminado. Total: {len(self.subscribers)}")
+
+    def publish(self, item: Any, select: Optional[Callable[[Subscription, Any], Any]] = None):
+        """
+        Publica un elemento a todos los suscriptores (drop-oldest por suscriptor).
+        Con `select` se elige qué entregar a cada uno; None = no se le entrega nada
+        """
+        for subscription in self.subscribers:
+            delivered = select(subscription, item) if select else item
+            if delivered is not None:
+                self.dropped += subscription.offer(delivered)
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
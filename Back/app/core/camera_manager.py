@@ -2,116 +2,346 @@
 import asyncio
 import cv2
 import numpy as np
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Union
 import logging
+import threading
+import time
 from datetime import datetime
+from app.core.config import settings, CameraSettings
+from app.core.frame_ring import FrameRing, FramePacket
+from app.core.metrics import PIPELINE_STAGE_SECONDS, FRAMES_DROPPED, FRAME_AGE_SECONDS
+from app.core.roi import build_roi
 
 logger = logging.getLogger(__name__)
 
+def parse_source(url: str) -> Union[int, str]:
+    """Convierte la URL configurada en una fuente de OpenCV (índice de webcam, archivo o RTSP/HTTP)"""
+    return int(url) if url.isdigit() else url
+
+
+def is_live_source(url: str) -> bool:
+    """Webcams y streams de red entregan frames en tiempo real; los archivos locales no"""
+    source = parse_source(url)
+    if isinstance(source, int):
+        return True
+    return "://" in source and not source.lower().startswith("file://")
+
+
 class CameraManager:
-    _instance = None
+    """
+    Captura de una cámara en un hilo dedicado, con anillo de frames y ciclo de vida propios.
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(CameraManager, cls).__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+    Con fuentes en vivo el hilo hace `grab()` continuamente para vaciar el buffer de
+    la fuente y solo convierte (`retrieve()`) el frame más reciente cuando el pipeline
+    pide uno, así el video entregado nunca se atrasa respecto a la cámara. Los archivos
+    se leen con `read()` al ritmo de su CAP_PROP_FPS y vuelven a empezar al terminar.
+    Si la fuente deja de entregar frames durante CAMERA_STALL_TIMEOUT_S se reconecta
+    con espera exponencial.
+    """
 
-    def __init__(self):
-        if self._initialized:
-            return
-            
+    def __init__(
+        self,
+        camera_id: str,
+        camera_url: str,
+        location: str,
+        roi: Optional[List] = None,
+        imgsz: Optional[int] = None,
+    ):
+        self.camera_id = camera_id
+        self.camera_url = camera_url
+        self.location = location
+        self.roi = build_roi(roi)
+        self.imgsz = imgsz
+        self.live = is_live_source(camera_url)
         self.cap = None
         self.is_running = False
-        self.frame_buffer = None
+        self.frame_ring = FrameRing(settings.FRAME_RING_SIZE)
         self.last_frame_time = None
-        self.clients: Dict = {}
-        self.frame_queue = asyncio.Queue(maxsize=2)
-        self.processing_task = None
-        self._initialized = True
-        logger.info("CameraManager inicializado")
+        # Al terminar un archivo de replay no hay nada que reconectar
+        self.auto_reconnect = True
+        self.capture_seconds = PIPELINE_STAGE_SECONDS.labels(camera_id, "capture")
+        self.frame_age = FRAME_AGE_SECONDS.labels(camera_id)
+        self.dropped_capture = FRAMES_DROPPED.labels(camera_id, "capture")
+        self.frames_captured = 0
+        self.reconnects = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wanted = threading.Event()
+        self._waiters: List[asyncio.Future] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_success = 0.0
+        self._frame_interval = 0.0
+        self._next_frame = 0.0
+        logger.info(f"CameraManager inicializado para cámara '{camera_id}' ({location})")
 
-    async def start(self, camera_url: str):
-        """Inicia la captura de video en un proceso separado"""
+    async def start(self):
+        """Abre la fuente e inicia el hilo de captura"""
         if self.is_running:
             return
 
         try:
-            self.cap = cv2.VideoCapture(camera_url)
-            if not self.cap.isOpened():
-                raise RuntimeError("No se pudo abrir la cámara")
+            cap = await asyncio.to_thread(self._open_capture)
+            if not cap.isOpened():
+                cap.release()
+                raise RuntimeError(f"No se pudo abrir la cámara '{self.camera_id}'")
 
+            self.cap = cap
             self.is_running = True
-            self.processing_task = asyncio.create_task(self._process_frames())
-            logger.info("Captura de video iniciada")
+            self._loop = asyncio.get_running_loop()
+            # Cada arranque tiene su propio evento: un hilo anterior que aún no
+            # terminó de salir no se reactiva
+            self._stop_event = threading.Event()
+            self._last_success = time.monotonic()
+            self._thread = threading.Thread(
+                target=self._capture_loop, args=(cap, self._stop_event),
+                name=f"capture:{self.camera_id}", daemon=True
+            )
+            self._thread.start()
+            logger.info(f"Captura de video iniciada: {self.camera_id}")
         except Exception as e:
-            logger.error(f"Error al iniciar la cámara: {str(e)}")
+            logger.error(f"Error al iniciar la cámara {self.camera_id}: {str(e)}")
             self.is_running = False
             raise
 
-    async def _process_frames(self):
-        """Procesa frames en segundo plano"""
-        while self.is_running:
+    def _open_capture(self):
+        """Abre la fuente de video; las subclases pueden reemplazarla (p. ej. replays)"""
+        source = parse_source(self.camera_url)
+        if isinstance(source, str) and hasattr(cv2, "CAP_PROP_READ_TIMEOUT_MSEC"):
+            # Sin timeout, un stream de red caído bloquea grab() indefinidamente
+            return cv2.VideoCapture(source, cv2.CAP_ANY, [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, settings.CAMERA_IO_TIMEOUT_MS,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, settings.CAMERA_IO_TIMEOUT_MS,
+            ])
+        return cv2.VideoCapture(source)
+
+    def _source_interval(self, cap) -> float:
+        """Intervalo entre frames de un archivo según su FPS (0 = sin ritmo: fuente en vivo)"""
+        if self.live or not hasattr(cap, "get"):
+            return 0.0
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not fps or not 0 < fps <= 240:
+            fps = 30.0
+        return 1.0 / fps
+
+    def _pace(self, stop_event: threading.Event) -> bool:
+        """Espera el turno del siguiente frame de un archivo; False si se detuvo la cámara"""
+        if not self._frame_interval:
+            return True
+        now = time.monotonic()
+        delay = self._next_frame - now
+        if delay > 0 and stop_event.wait(delay):
+            return False
+        self._next_frame = max(self._next_frame, now) + self._frame_interval
+        return True
+
+    def _capture_loop(self, cap, stop_event: threading.Event):
+        """Hilo de captura: lee, publica y reconecta hasta que se detenga la cámara"""
+        backoff = settings.CAMERA_RECONNECT_MIN_S
+        self._frame_interval = self._source_interval(cap)
+        while not stop_event.is_set():
+            if cap is None:
+                cap = self._reconnect(stop_event, backoff)
+                if cap is None:
+                    backoff = min(backoff * 2, settings.CAMERA_RECONNECT_MAX_S)
+                else:
+                    self._frame_interval = self._source_interval(cap)
+                continue
+
+            if not self._pace(stop_event):
+                break
+
             try:
-                success = await self._capture_frame()
-                if not success:
-                    logger.warning("Error al capturar frame")
-                    await asyncio.sleep(0.01)
-                    continue
-
-                # Mantener solo el frame más reciente
-                while not self.frame_queue.empty():
-                    try:
-                        self.frame_queue.get_nowait()
-                    except asyncio.QueueEmpty:
-                        break
-
-                await self.frame_queue.put(self.frame_buffer)
-                
+                ok = self._capture_frame(cap)
             except Exception as e:
-                logger.error(f"Error en procesamiento de frames: {str(e)}")
-                await asyncio.sleep(0.01)
+                logger.error(f"Error al capturar frame ({self.camera_id}): {str(e)}")
+                ok = False
 
-    async def _capture_frame(self) -> bool:
-        """Captura un frame de la cámara de manera asíncrona"""
-        if not self.cap or not self.is_running:
-            return False
+            if ok:
+                backoff = settings.CAMERA_RECONNECT_MIN_S
+                continue
+
+            stalled = time.monotonic() - self._last_success
+            if self.auto_reconnect and stalled > settings.CAMERA_STALL_TIMEOUT_S:
+                logger.warning(
+                    f"Cámara {self.camera_id} sin frames durante {stalled:.1f} s, reconectando"
+                )
+                cap.release()
+                cap = None
+            else:
+                stop_event.wait(0.01)
 
+        if cap is not None:
+            cap.release()
+        logger.info(f"Hilo de captura terminado: {self.camera_id}")
+
+    def _reconnect(self, stop_event: threading.Event, delay: float):
+        """Espera `delay` segundos y vuelve a abrir la fuente; None si no se pudo"""
+        if stop_event.wait(delay):
+            return None
         try:
-            # Ejecutar la captura en un thread separado
-            loop = asyncio.get_event_loop()
-            ret, frame = await loop.run_in_executor(None, self.cap.read)
+            cap = self._open_capture()
+            if cap.isOpened():
+                self.cap = cap
+                self.reconnects += 1
+                self._last_success = time.monotonic()
+                logger.info(f"Cámara {self.camera_id} reconectada (intento tras {delay:.1f} s)")
+                return cap
+            cap.release()
+        except Exception as e:
+            logger.error(f"Error al reconectar la cámara {self.camera_id}: {str(e)}")
+        logger.warning(f"Reconexión fallida de {self.camera_id}, siguiente intento en {delay * 2:.1f} s")
+        return None
 
-            if not ret:
+    def _capture_frame(self, cap) -> bool:
+        """
+        Captura un frame en el hilo de captura. Con fuentes en vivo que admiten
+        grab/retrieve solo se convierte el frame si el pipeline está esperando uno;
+        el resto se descarta. Los archivos se leen completos y se repiten al terminar.
+        """
+        started = time.perf_counter()
+        if self.live and hasattr(cap, "grab") and hasattr(cap, "retrieve"):
+            if not cap.grab():
                 return False
+            timestamp = time.time()
+            self._last_success = time.monotonic()
+            if not self._wanted.is_set():
+                self.dropped_capture.inc()
+                return True
+            ret, frame = cap.retrieve(self.frame_ring.acquire())
+        else:
+            ret, frame = cap.read(self.frame_ring.acquire())
+            if not ret and not self.live and self.auto_reconnect and hasattr(cap, "set"):
+                # Fin del archivo: se vuelve al inicio en lugar de esperar la reconexión
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read(self.frame_ring.acquire())
+            timestamp = time.time()
 
-            # Codificar el frame
-            _, buffer = cv2.imencode('.jpg', frame)
-            self.frame_buffer = buffer.tobytes()
-            self.last_frame_time = datetime.now()
-            return True
-
-        except Exception as e:
-            logger.error(f"Error al capturar frame: {str(e)}")
+        if not ret:
             return False
+        self._last_success = time.monotonic()
+        self.capture_seconds.observe(time.perf_counter() - started)
+        self.frames_captured += 1
+
+        # Publicar el frame crudo; el JPEG solo se genera si algún consumidor lo pide
+        self._wanted.clear()
+        self.frame_ring.commit(frame, timestamp)
+        self.last_frame_time = datetime.now()
+        self._notify_waiters()
+        return True
 
-    async def get_frame(self) -> Optional[bytes]:
-        """Obtiene el último frame disponible"""
+    def _notify_waiters(self):
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake_waiters)
+        except RuntimeError:
+            # El event loop ya se cerró
+            pass
+
+    def _wake_waiters(self):
+        """Despierta (en el event loop) a los consumidores que esperan un frame nuevo"""
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def get_frame(self, after: int = 0) -> Optional[FramePacket]:
+        """Espera y devuelve el último frame con número de secuencia mayor que `after`"""
         try:
-            return await self.frame_queue.get()
+            while self.frame_ring.sequence <= after:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                self._wanted.set()
+                await waiter
+            packet = self.frame_ring.latest()
+            if packet is not None:
+                self.frame_age.observe(max(time.time() - packet.timestamp, 0.0))
+            return packet
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error al obtener frame: {str(e)}")
             return None
 
+    def frame_age_seconds(self) -> Optional[float]:
+        """Antigüedad del último frame publicado"""
+        packet = self.frame_ring.latest()
+        return time.time() - packet.timestamp if packet else None
+
     def stop(self):
-        """Detiene la captura de video"""
+        """Detiene la captura y espera a que el hilo libere la fuente"""
+        thread = self._signal_stop()
+        if thread is not None:
+            self._join(thread)
+
+    async def stop_async(self):
+        """Como stop(), pero espera al hilo de captura fuera del event loop"""
+        thread = self._signal_stop()
+        if thread is not None:
+            await asyncio.to_thread(self._join, thread)
+
+    def _signal_stop(self) -> Optional[threading.Thread]:
+        """Marca la cámara como detenida y avisa al hilo; devuelve el hilo por el que hay que esperar"""
+        was_running = self.is_running
         self.is_running = False
-        if self.processing_task:
-            self.processing_task.cancel()
-        if self.cap:
-            self.cap.release()
+        self._stop_event.set()
+        self._wanted.clear()
         self.cap = None
-        logger.info("Captura de video detenida")
+        thread, self._thread = self._thread, None
+        if was_running:
+            logger.info(f"Captura de video detenida: {self.camera_id}")
+        if thread is None or thread is threading.current_thread():
+            return None
+        return thread
+
+    def _join(self, thread: threading.Thread):
+        # Un read() bloqueado en un stream de red termina como mucho con CAMERA_IO_TIMEOUT_MS
+        thread.join(timeout=settings.CAMERA_IO_TIMEOUT_MS / 1000 + 1)
+        if thread.is_alive():
+            logger.warning(f"El hilo de captura de {self.camera_id} no terminó a tiempo")
 
     def __del__(self):
         self.stop()
+
+
+class CameraRegistry:
+    """Registro de cámaras del proceso, construido a partir de la configuración"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CameraRegistry, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.cameras: Dict[str, CameraManager] = {}
+        for camera in settings.get_cameras():
+            self.register(camera)
+        self._initialized = True
+
+    def register(self, camera: CameraSettings) -> CameraManager:
+        if camera.id in self.cameras:
+            raise ValueError(f"Cámara duplicada en la configuración: {camera.id}")
+        manager = CameraManager(camera.id, camera.url, camera.location, camera.roi, camera.imgsz)
+        self.cameras[camera.id] = manager
+        return manager
+
+    def get(self, camera_id: str) -> Optional[CameraManager]:
+        return self.cameras.get(camera_id)
+
+    @property
+    def default_id(self) -> str:
+        """Identificador de la primera cámara configurada"""
+        return next(iter(self.cameras))
+
+    def ids(self) -> List[str]:
+        return list(self.cameras)
+
+    def stop_all(self):
+        for manager in self.cameras.values():
+            manager.stop()
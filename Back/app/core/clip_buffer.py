@@ -0,0 +1,44 @@
+# app/core/clip_buffer.py
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+class ClipBuffer:
+    """
+    Ventana deslizante de frames ya codificados en JPEG.
+
+    Conserva como máximo `max_seconds` segundos y `max_bytes` bytes: al añadir un
+    frame se descartan los más antiguos que excedan cualquiera de los dos límites,
+    por lo que la memoria usada no crece con el tiempo de funcionamiento.
+    """
+
+    def __init__(self, max_seconds: float, max_bytes: int):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self._frames: Deque[Tuple[float, bytes]] = deque()
+        self.bytes = 0
+        self.evicted = 0
+
+    def append(self, jpeg: bytes, timestamp: Optional[float] = None):
+        """Añade un frame codificado y descarta lo que quede fuera de la ventana"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._frames.append((timestamp, jpeg))
+        self.bytes += len(jpeg)
+
+        oldest_allowed = timestamp - self.max_seconds
+        while self._frames and (self.bytes > self.max_bytes or self._frames[0][0] < oldest_allowed):
+            _, evicted = self._frames.popleft()
+            self.bytes -= len(evicted)
+            self.evicted += 1
+
+    def snapshot(self) -> List[Tuple[float, bytes]]:
+        """Copia de la ventana actual (los JPEG son inmutables, no se duplican)"""
+        return list(self._frames)
+
+    def clear(self):
+        self._frames.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
@@ -1,7 +1,20 @@
 # app/core/config.py
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 import os
-from typing import ClassVar
+from typing import ClassVar, List, Optional
+
+
+class CameraSettings(BaseModel):
+    """Configuración de una cámara: URL de OpenCV (índice, archivo, RTSP o HTTP) y ubicación"""
+    id: str
+    url: str
+    location: str = "Salon de Pruebas"
+    # Zonas donde puede haber caídas: polígonos [[x, y], ...] en coordenadas 0-1
+    # (dos puntos = rectángulo). Vacío = todo el frame
+    roi: List[List[List[float]]] = []
+    # Tamaño de entrada del modelo para esta cámara (solo backend torch; por defecto MODEL_IMGSZ)
+    imgsz: Optional[int] = None
 
 
 class Settings(BaseSettings):
@@ -11,22 +24,37 @@ class Settings(BaseSettings):
     
     # Configuraciones para video
     CAMERA_URL: str = "http://10.40.8.151:4747/video"
+    CAMERA_LOCATION: str = "Salon de Pruebas"
+    # Lista JSON de cámaras, p. ej. [{"id": "sala", "url": "rtsp://...", "location": "Sala"}]
+    # Si está vacía se usa una única cámara "default" con CAMERA_URL
+    CAMERAS: List[CameraSettings] = []
+    FRAME_RING_SIZE: int = 3  # Buffers crudos reutilizables por cámara
+    CAMERA_STALL_TIMEOUT_S: float = 5.0  # Sin frames durante este tiempo se reconecta la cámara
+    CAMERA_RECONNECT_MIN_S: float = 0.5  # Espera inicial entre reconexiones (se duplica en cada fallo)
+    CAMERA_RECONNECT_MAX_S: float = 30.0
+    CAMERA_IO_TIMEOUT_MS: int = 5000  # Timeout de apertura y lectura de streams de red (FFmpeg)
     
     # Configuración del modelo YOLO
     BASE_DIR: ClassVar[str] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     MODEL_PATH: str = os.path.join(BASE_DIR, "best.pt")
+    INFERENCE_DEVICE: str = "auto"  # auto | cpu | cuda:0 ...
+    MODEL_BACKEND: str = "auto"  # auto | torch | onnx | openvino (los exportados se guardan junto a MODEL_PATH)
+    MODEL_IMGSZ: int = 640  # Tamaño de entrada del modelo (también usado al exportar)
+    MODEL_PRECISION: str = "fp32"  # fp32 | int8-dynamic | int8-static (variantes ONNX de benchmarks.quantize)
+    INFERENCE_BATCH_WINDOW_MS: float = 5.0  # Espera máxima para agrupar frames de varias cámaras
+    INFERENCE_MAX_BATCH: int = 8  # Tamaño máximo de lote por pasada del modelo
+    INFERENCE_DEADLINE_MS: float = 500.0  # Frames que esperan más que esto se descartan (0 = sin plazo)
+    # "thread": un hilo de inferencia en el proceso de la API
+    # "process": pool de procesos que reciben los frames por memoria compartida
+    INFERENCE_MODE: str = "thread"
+    INFERENCE_WORKERS: int = 0  # Procesos de inferencia (0 = uno por núcleo)
+    INFERENCE_WORKER_THREADS: int = 1  # Hilos de torch/OpenMP por proceso de inferencia
+    MODEL_PRELOAD: bool = True  # Cargar el modelo al arrancar (en segundo plano) y no con el primer visor
+    MODEL_WARMUP: bool = True  # Inferencia de prueba tras cargar, para que el primer frame no sea lento
     
     class Config:
         env_file = ".env"
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        print(f"Ruta del modelo configurada: {self.MODEL_PATH}")
-        try:
-            self.validate_paths()
-        except Exception as e:
-            print(f"Error en la validación de configuración: {str(e)}")
-
     def validate_paths(self):
         """Validar rutas y configuraciones críticas"""
         if not os.path.exists(self.MODEL_PATH):
@@ -34,13 +62,70 @@ class Settings(BaseSettings):
                 f"ERROR CRÍTICO: Modelo no encontrado en {self.MODEL_PATH}"
             )
         return True
+
+    def get_cameras(self) -> List[CameraSettings]:
+        """Cámaras configuradas, o la cámara única de CAMERA_URL si no hay ninguna"""
+        if self.CAMERAS:
+            return self.CAMERAS
+        return [CameraSettings(id="default", url=self.CAMERA_URL, location=self.CAMERA_LOCATION)]
+
+    # Almacenamiento de detecciones: "firebase" o "sqlite" (local, sin credenciales)
+    STORAGE_BACKEND: str = "firebase"
+    SQLITE_PATH: str = "detections.db"
+
     #Configuración de Firebase
     FIREBASE_CRED_PATH: str = "app/core/credentials/firebase-credenciales.json"
     FIREBASE_DATABASE_URL: str = "https://fallapp-6d506-default-rtdb.firebaseio.com"
+    FIREBASE_WRITE_QUEUE_SIZE: int = 1000  # Escrituras pendientes antes de descartar las más antiguas
+    FIREBASE_WRITE_BATCH_MS: float = 50.0  # Ventana para agrupar ráfagas en un solo update()
+    FIREBASE_WRITE_MAX_BATCH: int = 100
+    FIREBASE_WRITE_RETRIES: int = 5
+
+    # Registro de tiempos de escritura (CSV en segundo plano)
+    TIMING_CSV_PATH: str = "tiempos.csv"
+    TIMING_CSV_FLUSH_S: float = 2.0
+    TIMING_CSV_MAX_BYTES: int = 10 * 1024 * 1024  # Rotar al superar este tamaño
+    TIMING_CSV_ROTATE_DAILY: bool = False
     
     # Configuración de detección
     DETECTION_THRESHOLD: float = 0.2  # Umbral de confianza para notificaciones
     NOTIFICATION_COOLDOWN: int = 50  # Segundos entre notificaciones
+    NOTIFICATION_OUTBOX_SIZE: int = 32  # Mensajes pendientes por cliente antes de expulsarlo
+    NOTIFICATION_SEND_TIMEOUT_S: float = 5.0  # Tiempo máximo de un envío por WebSocket
+    NOTIFICATION_DEDUP_SIZE: int = 1024  # Ids recordados para no entregar dos veces una notificación
+
+    # Compuerta de movimiento: evita inferir frames sin cambios en la escena
+    MOTION_GATE_ENABLED: bool = True
+    MOTION_THRESHOLD: float = 0.01  # Fracción de píxeles que debe cambiar para volver a inferir
+    MOTION_PIXEL_DELTA: int = 25  # Diferencia de intensidad (0-255) para considerar un píxel cambiado
+    MOTION_FORCE_INTERVAL_S: float = 2.0  # Inferencia forzada aunque no haya movimiento
+    MOTION_DOWNSCALE_WIDTH: int = 160  # Ancho del frame reducido usado para comparar
+
+    # Clips de video alrededor de cada caída (frames crudos, sin anotar)
+    CLIP_ENABLED: bool = True
+    CLIP_DIR: str = "clips"
+    CLIP_PRE_SECONDS: float = 10.0  # Segundos previos a la caída que se conservan
+    CLIP_POST_SECONDS: float = 5.0  # Segundos grabados después de la caída
+    CLIP_MAX_BYTES: int = 32 * 1024 * 1024  # Memoria máxima de la ventana previa por cámara
+    CLIP_FPS: float = 10.0  # Frames por segundo guardados en los clips (cada uno es un JPEG crudo extra)
+
+    # Análisis offline por la API: solo videos bajo ANALYSIS_INPUT_DIR y resultados bajo ANALYSIS_OUTPUT_DIR
+    ANALYSIS_INPUT_DIR: str = "grabaciones"
+    ANALYSIS_OUTPUT_DIR: str = "analisis"
+    ANALYSIS_MAX_JOBS: int = 50  # Trabajos terminados que se conservan para consultar su estado
+    ANALYSIS_MAX_RUNNING: int = 1  # Análisis simultáneos: cada uno lanza su propio pool de procesos
+
+    # Modo overlay del stream: se envían metadatos de detección y el cliente dibuja las cajas
+    STREAM_OVERLAY_FRAME_INTERVAL: int = 30  # Un frame crudo cada N mensajes (0 = solo metadatos)
+
+    # Calidad adaptativa por visor: se baja o sube de nivel según cuánto tarda en recibir los frames
+    STREAM_ADAPTIVE_QUALITY: bool = True
+    # Niveles [calidad JPEG, escala, FPS máximo (0 = sin límite)], de mejor a peor
+    STREAM_QUALITY_LEVELS: List[List[float]] = [[90, 1.0, 0], [75, 1.0, 15], [60, 0.75, 10], [45, 0.5, 5]]
+    STREAM_QUALITY_WINDOW_S: float = 2.0  # Ventana de medición entre decisiones
+    STREAM_BUSY_HIGH: float = 0.6  # Fracción del tiempo enviando a partir de la cual se baja de nivel
+    STREAM_BUSY_LOW: float = 0.25  # Por debajo de esta fracción, sostenida, se sube de nivel
+    STREAM_UPGRADE_AFTER_S: float = 6.0  # Tiempo con margen antes de volver a subir
 
 
 settings = Settings()
@@ -0,0 +1,45 @@
+# app/core/event_bus.py
+import logging
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Tópico de las notificaciones generadas por este proceso
+NOTIFICATIONS_TOPIC = "notifications"
+
+
+class EventBus:
+    """Publicación/suscripción en memoria dentro del proceso (se usa desde el event loop)"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(EventBus, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.subscribers: Dict[str, List[Callable[..., Any]]] = {}
+        self._initialized = True
+
+    def subscribe(self, topic: str, callback: Callable[..., Any]) -> Callable[[], None]:
+        """Registra `callback` en el tópico; devuelve una función para cancelar la suscripción"""
+        self.subscribers.setdefault(topic, []).append(callback)
+
+        def unsubscribe():
+            callbacks = self.subscribers.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+        return unsubscribe
+
+    def publish(self, topic: str, *args: Any):
+        """Entrega el evento a todos los suscriptores del tópico de forma inmediata"""
+        for callback in list(self.subscribers.get(topic, ())):
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Error en suscriptor de '{topic}': {str(e)}")
@@ -0,0 +1,73 @@
+# app/core/frame_ring.py
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+class FramePacket:
+    """Frame crudo con número de secuencia; la codificación JPEG se hace solo bajo demanda"""
+
+    __slots__ = ("image", "sequence", "timestamp", "_jpeg")
+
+    def __init__(self, image: np.ndarray, sequence: int, timestamp: float):
+        self.image = image
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self._jpeg: Optional[bytes] = None
+
+    def jpeg(self, image: Optional[np.ndarray] = None) -> bytes:
+        """
+        Codifica el frame a JPEG una sola vez y reutiliza el resultado (clips y frames
+        crudos del modo overlay). `image` es una copia propia del frame, aún sin anotar:
+        la captura puede estar reescribiendo el slot del anillo mientras se codifica
+        """
+        if self._jpeg is None:
+            _, buffer = cv2.imencode('.jpg', self.image if image is None else image)
+            self._jpeg = buffer.tobytes()
+        return self._jpeg
+
+
+class FrameRing:
+    """
+    Anillo de buffers preasignados para frames crudos.
+
+    El productor escribe en el slot devuelto por `acquire` (p. ej. `cap.read(slot)`)
+    y lo publica con `commit`. Un consumidor puede usar el frame de forma segura
+    mientras no se capturen `size - 1` frames nuevos; si necesita retenerlo más
+    tiempo debe copiarlo.
+    """
+
+    def __init__(self, size: int = 3):
+        if size < 2:
+            raise ValueError("El anillo de frames necesita al menos 2 slots")
+        self.size = size
+        self.sequence = 0
+        self._slots: List[Optional[np.ndarray]] = [None] * size
+        self._packets: List[Optional[FramePacket]] = [None] * size
+
+    def acquire(self) -> Optional[np.ndarray]:
+        """Devuelve el buffer donde debe escribirse el próximo frame (None si aún no existe)"""
+        return self._slots[(self.sequence + 1) % self.size]
+
+    def commit(self, image: np.ndarray, timestamp: Optional[float] = None) -> FramePacket:
+        """
+        Publica el frame recién escrito y le asigna el siguiente número de secuencia.
+        La secuencia se incrementa al final, para que un lector en otro hilo nunca
+        vea el número nuevo con el paquete anterior.
+        """
+        sequence = self.sequence + 1
+        index = sequence % self.size
+        self._slots[index] = image
+        packet = FramePacket(image, sequence, time.time() if timestamp is None else timestamp)
+        self._packets[index] = packet
+        self.sequence = sequence
+        return packet
+
+    def latest(self) -> Optional[FramePacket]:
+        """Devuelve el frame más reciente publicado"""
+        if not self.sequence:
+            return None
+        return self._packets[self.sequence % self.size]
+
@@ -0,0 +1,196 @@
+# app/core/metrics.py
+import bisect
+import logging
+from typing import Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Límites de los buckets en segundos: de 0.5 ms a 2.5 s (presupuesto de 33 ms por frame a 30 fps)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.075,
+    0.1, 0.15, 0.25, 0.5, 1.0, 2.5,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Histogram:
+    """Histograma de buckets fijos; `labels()` devuelve un hijo que conviene cachear en el hot path"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[LabelValues, _HistogramChild] = {}
+
+    def labels(self, *values) -> _HistogramChild:
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = _HistogramChild(self.buckets)
+        return child
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {child.count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+    def snapshot(self) -> Dict[LabelValues, _HistogramChild]:
+        return dict(self.children)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[LabelValues, _CounterChild] = {}
+
+    def labels(self, *values) -> _CounterChild:
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = _CounterChild()
+        return child
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"
+            for values, child in self.children.items()
+        ]
+
+
+class CallbackMetric:
+    """Métrica calculada al momento del scrape (profundidad de colas, clientes conectados...)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[LabelValues, float]], metric_type: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.type = metric_type
+
+    def render(self) -> List[str]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"Error al recolectar métrica {self.name}: {str(e)}")
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in values.items()
+        ]
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso, expuesto en formato de texto de Prometheus"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.metrics: Dict[str, object] = {}
+        self._initialized = True
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self.metrics.get(name) or self.register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.metrics.get(name) or self.register(Counter(name, documentation, labelnames))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[LabelValues, float]], metric_type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, collect, metric_type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Latencia por etapa del pipeline de stream:
+# capture, copy, inference, extract, draw, encode, send, persist
+PIPELINE_STAGE_SECONDS = registry.histogram(
+    "pipeline_stage_seconds",
+    "Duración de cada etapa del pipeline de stream por cámara",
+    ("camera", "stage"),
+)
+FRAMES_DROPPED = registry.counter(
+    "frames_dropped_total",
+    "Frames descartados por cámara y motivo",
+    ("camera", "reason"),
+)
+FRAME_AGE_SECONDS = registry.histogram(
+    "camera_frame_age_seconds",
+    "Antigüedad del frame (desde su captura) al entregarlo al pipeline",
+    ("camera",),
+)
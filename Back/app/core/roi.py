@@ -0,0 +1,99 @@
+# app/core/roi.py
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from app.models.detections import Detections
+
+# Polígono en coordenadas normalizadas (0-1) del frame; dos puntos = rectángulo
+Polygon = Sequence[Sequence[float]]
+
+# Lado mínimo del recorte en píxeles: una zona diminuta nunca deja al modelo sin imagen
+MIN_CROP = 32
+
+
+class RegionOfInterest:
+    """
+    Zonas de una cámara donde puede ocurrir una caída.
+
+    Los polígonos se configuran en coordenadas normalizadas y se convierten a
+    píxeles (una vez por resolución) en un rectángulo envolvente, usado para
+    recortar el frame antes de la inferencia, y en una máscara, usada para
+    descartar las detecciones cuyo centro queda fuera de las zonas.
+    """
+
+    def __init__(self, polygons: Sequence[Polygon]):
+        self.polygons = [self._normalize(polygon) for polygon in polygons]
+        self._cache: Dict[Tuple[int, int], Tuple[Tuple[int, int, int, int], np.ndarray]] = {}
+
+    @staticmethod
+    def _normalize(polygon: Polygon) -> np.ndarray:
+        points = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        if len(points) == 2:
+            (x1, y1), (x2, y2) = points
+            points = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+        if len(points) < 3:
+            raise ValueError(f"Región de interés inválida: {polygon}")
+        points = np.clip(points, 0.0, 1.0)
+        # Puntos repetidos, alineados o fuera del frame (tras recortar a 0-1) no delimitan nada
+        if cv2.contourArea(points) <= 0:
+            raise ValueError(f"Región de interés sin área dentro del frame: {polygon}")
+        return points
+
+    def __bool__(self) -> bool:
+        return bool(self.polygons)
+
+    def _geometry(self, shape) -> Tuple[Tuple[int, int, int, int], np.ndarray]:
+        """Rectángulo envolvente y máscara en píxeles para una resolución dada"""
+        height, width = shape[:2]
+        cached = self._cache.get((height, width))
+        if cached is None:
+            scale = np.array([width, height], dtype=np.float32)
+            pixel_polygons = [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, pixel_polygons, 1)
+            points = np.concatenate(pixel_polygons)
+            x1, y1 = points.min(axis=0)
+            x2, y2 = points.max(axis=0)
+            x1, x2 = _span(int(x1), int(x2), width)
+            y1, y2 = _span(int(y1), int(y2), height)
+            bounds = (x1, y1, x2, y2)
+            cached = (bounds, mask)
+            self._cache[(height, width)] = cached
+        return cached
+
+    def bounds(self, shape) -> Tuple[int, int, int, int]:
+        """Rectángulo envolvente (x1, y1, x2, y2) de las zonas en píxeles"""
+        return self._geometry(shape)[0]
+
+    def crop(self, frame: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Vista (sin copia) del rectángulo envolvente de las zonas y su desplazamiento"""
+        x1, y1, x2, y2 = self.bounds(frame.shape)
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def to_frame(self, detections: Detections, offset: Tuple[int, int], shape) -> Detections:
+        """Lleva las cajas del recorte al frame completo y descarta las que caen fuera de las zonas"""
+        if not len(detections):
+            return detections
+        x, y = offset
+        xyxy = detections.xyxy + np.array([x, y, x, y], dtype=np.float32)
+        detections = Detections(xyxy, detections.conf, detections.cls)
+
+        _, mask = self._geometry(shape)
+        height, width = mask.shape
+        centers_x = np.clip(((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(np.int32), 0, width - 1)
+        centers_y = np.clip(((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(np.int32), 0, height - 1)
+        return detections[mask[centers_y, centers_x].astype(bool)]
+
+
+def _span(low: int, high: int, size: int) -> Tuple[int, int]:
+    """Amplía [low, high) alrededor de su centro hasta MIN_CROP píxeles, sin salir de [0, size)"""
+    length = min(max(high - low, MIN_CROP), size)
+    start = min(max((low + high - length) // 2, 0), size - length)
+    return start, start + length
+
+
+def build_roi(polygons: Optional[List[Polygon]]) -> Optional[RegionOfInterest]:
+    """RegionOfInterest de la configuración de una cámara (None si cubre todo el frame)"""
+    return RegionOfInterest(polygons) if polygons else None
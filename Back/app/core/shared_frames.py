@@ -0,0 +1,72 @@
+# app/core/shared_frames.py
+import logging
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SharedFrameRef(NamedTuple):
+    """Referencia (serializable) a un frame en memoria compartida y al recorte a inferir"""
+    name: str
+    shape: Tuple[int, ...]
+    crop: Optional[Tuple[int, int, int, int]] = None
+
+
+class SharedFrame:
+    """
+    Lienzo de un frame en memoria compartida.
+
+    El pipeline copia cada frame aquí (la misma copia que ya hacía a su lienzo
+    propio) y los procesos de inferencia lo leen por nombre, sin que el frame
+    atraviese un pipe. El bloque solo se recrea si llega un frame más grande.
+    """
+
+    def __init__(self):
+        self.shm: Optional[shared_memory.SharedMemory] = None
+
+    def array(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Vista uint8 de `shape` sobre el bloque compartido (las vistas previas dejan de ser válidas)"""
+        nbytes = int(np.prod(shape))
+        if self.shm is None or self.shm.size < nbytes:
+            self.close()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def ref(self, shape: Tuple[int, ...], crop: Optional[Tuple[int, int, int, int]] = None) -> SharedFrameRef:
+        return SharedFrameRef(self.shm.name, tuple(shape), crop)
+
+    def close(self):
+        """Libera el bloque; los procesos que lo tengan mapeado conservan su copia del mapeo"""
+        if self.shm is None:
+            return
+        try:
+            self.shm.close()
+        except BufferError:
+            # Aún hay vistas NumPy vivas; el mapeo se libera cuando desaparezcan
+            logger.debug(f"Memoria compartida {self.shm.name} con vistas activas al cerrar")
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Abre un bloque creado por otro proceso. Los procesos lanzados con
+    multiprocessing comparten el resource tracker del padre, así que el bloque
+    sigue siendo del proceso que lo creó y se borra cuando este lo libera.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+
+def view(shm: shared_memory.SharedMemory, ref: SharedFrameRef) -> np.ndarray:
+    """Vista del frame referenciado, recortada si la referencia trae recorte"""
+    frame = np.ndarray(ref.shape, dtype=np.uint8, buffer=shm.buf)
+    if ref.crop:
+        x1, y1, x2, y2 = ref.crop
+        frame = frame[y1:y2, x1:x2]
+    return frame
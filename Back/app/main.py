@@ -1,9 +1,12 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.core import settings
 from app.services.firebase_service import FirebaseService
-from app.api.endpoints import stream_router, notifications_router
+from app.api.endpoints import stream_router, notifications_router, detections_router, analysis_router
+from app.api.endpoints.stream import start_model_preload, model_status, stop_inference_workers, stop_streams
 from app.core.logging_config import setup_logging
 from app.services.notification_listener import NotificationListener
+from app.core.metrics import registry
 import logging
 from datetime import datetime
 
@@ -20,15 +23,20 @@ app = FastAPI(
 async def startup_event():
     logger.info(f"Iniciando {settings.APP_NAME}")
     logger.info(f"Modo debug: {settings.DEBUG}")
-    
-    # Verificar configuración de Firebase
+    logger.info(f"Ruta del modelo configurada: {settings.MODEL_PATH}")
+    try:
+        settings.validate_paths()
+    except Exception as e:
+        logger.error(f"Error en la validación de configuración: {str(e)}")
+
+    # Verificar configuración del almacenamiento (Firebase o SQLite)
     try:
         firebase_service = FirebaseService()
         firebase_service.initialize(
             cred_path=settings.FIREBASE_CRED_PATH,
             database_url=settings.FIREBASE_DATABASE_URL
         )
-        logger.info("Firebase inicializado correctamente")
+        logger.info(f"Almacenamiento inicializado correctamente ({settings.STORAGE_BACKEND})")
     except Exception as e:
         logger.error(f"Error al inicializar Firebase: {str(e)}")
         raise
@@ -41,6 +49,18 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error al iniciar servicio de notificaciones: {str(e)}")
         raise
+
+    # El modelo se carga en segundo plano: /health y las notificaciones ya responden
+    if settings.MODEL_PRELOAD:
+        start_model_preload()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Detener captura y pipelines antes de enviar las detecciones que aún estén en cola
+    await stop_streams()
+    await FirebaseService().close()
+    stop_inference_workers()
     
 
 @app.get("/")
@@ -49,8 +69,41 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: el proceso está vivo y atiende peticiones"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: almacenamiento listo y, si se precarga, modelo cargado y precalentado"""
+    model = model_status()
+    storage_ready = FirebaseService().store is not None
+    model_ready = not settings.MODEL_PRELOAD or (
+        model['loaded'] and (model['warmed_up'] or not settings.MODEL_WARMUP)
+    )
+    ready = storage_ready and model_ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            'status': 'ready' if ready else 'starting',
+            'storage': storage_ready,
+            'model': model,
+        }
+    )
+
+registry.callback(
+    "notification_clients", "Clientes conectados a /ws/notifications", (),
+    lambda: {(): len(NotificationListener().clients)}
+)
+registry.callback(
+    "persistence_queue_depth", "Detecciones esperando ser guardadas", (),
+    lambda: {(): FirebaseService().queue_depth()}
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas del pipeline en formato de texto de Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-firebase")
 async def test_firebase():
     try:
@@ -79,4 +132,16 @@ app.include_router(
     notifications_router,
     prefix=settings.API_V1_STR,
     tags=["notifications"]
-)
\ No newline at end of file
+)
+
+app.include_router(
+    detections_router,
+    prefix=settings.API_V1_STR,
+    tags=["detections"]
+)
+
+app.include_router(
+    analysis_router,
+    prefix=settings.API_V1_STR,
+    tags=["analysis"]
+)
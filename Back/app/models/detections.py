@@ -0,0 +1,73 @@
+# app/models/detections.py
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Clases del modelo entrenado (TrainModel/data.yaml)
+CLASS_FALL = 0
+CLASS_PERSON = 1
+CLASS_LABELS = {CLASS_FALL: "CAIDA", CLASS_PERSON: "PERSONA"}
+
+
+class Detections:
+    """
+    Detecciones de un frame en arreglos NumPy contiguos:
+    `xyxy` (N, 4) float32, `conf` (N,) float32 y `cls` (N,) int32.
+    """
+
+    __slots__ = ("xyxy", "conf", "cls")
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(
+            np.empty((0, 4), dtype=np.float32),
+            np.empty(0, dtype=np.float32),
+            np.empty(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_array(cls, data: np.ndarray) -> "Detections":
+        """Construye las detecciones desde `boxes.data` de YOLO: columnas x1, y1, x2, y2, conf, cls"""
+        data = np.asarray(data, dtype=np.float32)
+        if data.size == 0:
+            return cls.empty()
+        return cls(
+            np.ascontiguousarray(data[:, :4]),
+            np.ascontiguousarray(data[:, 4]),
+            data[:, 5].astype(np.int32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __getitem__(self, index) -> "Detections":
+        """Selecciona detecciones con una máscara booleana o un arreglo de índices"""
+        return Detections(self.xyxy[index], self.conf[index], self.cls[index])
+
+    def filter(self, classes: Optional[Iterable[int]] = None, min_conf: float = 0.0) -> "Detections":
+        """Filtra por clase y confianza mínima de forma vectorizada"""
+        mask = self.conf > min_conf
+        if classes is not None:
+            mask &= np.isin(self.cls, list(classes))
+        return self[mask]
+
+    def to_dicts(self) -> List[Dict]:
+        """Convierte al formato de diccionarios {'bbox', 'conf', 'class'} que se guarda en Firebase"""
+        return [
+            {'bbox': bbox, 'conf': conf, 'class': cls}
+            for bbox, conf, cls in zip(self.xyxy.tolist(), self.conf.tolist(), self.cls.tolist())
+        ]
+
+    def to_overlay(self) -> Dict[str, List]:
+        """Formato compacto para que el cliente dibuje las cajas: píxeles enteros y confianza a 3 decimales"""
+        return {
+            'boxes': np.rint(self.xyxy).astype(np.int32).tolist(),
+            'cls': self.cls.tolist(),
+            # En float32 el redondeo no es exacto y el JSON llevaría 0.800000011920929
+            'conf': np.round(self.conf.astype(np.float64), 3).tolist(),
+        }
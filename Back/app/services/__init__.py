@@ -1,6 +1,20 @@
-from app.services.video_service import VideoService
-from app.services.yolo_service import YoloService
-from app.services.firebase_service import FirebaseService
+import importlib
 
+# Los servicios se importan al usarlos: importar el paquete no carga OpenCV,
+# firebase_admin ni el modelo (ver __getattr__)
+_EXPORTS = {
+    "VideoService": "app.services.video_service",
+    "YoloService": "app.services.yolo_service",
+    "FirebaseService": "app.services.firebase_service",
+    "StreamPipeline": "app.services.stream_pipeline",
+}
 
-__all__ = ["VideoService", "YoloService", "FirebaseService"]
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
+
+
+__all__ = ["VideoService", "YoloService", "FirebaseService", "StreamPipeline"]
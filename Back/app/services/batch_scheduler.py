@@ -0,0 +1,99 @@
+# app/services/batch_scheduler.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.inference_executor import InferenceDropped
+
+
+class BatchScheduler:
+    """
+    Agrupa los frames que envían los pipelines de las distintas cámaras y ejecuta
+    una sola pasada del modelo por lote. Un lote se despacha cuando vence la
+    ventana de espera o cuando alcanza el tamaño máximo; mientras hay un lote en
+    curso, los frames nuevos se acumulan para el siguiente.
+    """
+
+    def __init__(self, yolo_service, window_ms: float = 5.0, max_batch: int = 8):
+        self.yolo_service = yolo_service
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch = max(max_batch, 1)
+        self.pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._window_handle: Optional[asyncio.TimerHandle] = None
+        self._running = False
+        self.logger = logging.getLogger(__name__)
+
+        # Métricas
+        self.batches = 0
+        self.frames = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.window_wait_total = 0.0
+        self.window_wait_max = 0.0
+
+    async def detect(self, frame, key: Optional[str] = None):
+        """Encola un frame en el lote actual y espera su resultado"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((frame, future, time.perf_counter()))
+
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif len(self.pending) == 1 and self._window_handle is None:
+            self._window_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Despacha el lote pendiente si no hay otro en curso"""
+        if self._window_handle is not None:
+            self._window_handle.cancel()
+            self._window_handle = None
+        if self._running or not self.pending:
+            return
+
+        batch = self.pending[:self.max_batch]
+        self.pending = self.pending[self.max_batch:]
+        self._running = True
+        asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        started = time.perf_counter()
+        self._record(len(batch), [started - submitted for _, _, submitted in batch])
+
+        try:
+            results = await self.yolo_service.detect_batch([frame for frame, _, _ in batch])
+        except Exception as e:
+            if not isinstance(e, InferenceDropped):
+                self.logger.error(f"Error en lote de inferencia: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running = False
+            # Los frames que llegaron durante la inferencia ya esperaron lo suficiente
+            if self.pending:
+                self._flush()
+
+    def _record(self, size: int, waits: List[float]):
+        self.batches += 1
+        self.frames += size
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+        self.window_wait_total += sum(waits)
+        self.window_wait_max = max(self.window_wait_max, max(waits))
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaños de lote alcanzados y latencia añadida por la ventana de agrupación"""
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': self.frames / self.batches if self.batches else 0.0,
+            'batch_size_histogram': dict(sorted(self.batch_sizes.items())),
+            'mean_window_wait_ms': self.window_wait_total / self.frames * 1000 if self.frames else 0.0,
+            'max_window_wait_ms': self.window_wait_max * 1000,
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+        }
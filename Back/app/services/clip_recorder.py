@@ -0,0 +1,169 @@
+# app/services/clip_recorder.py
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.clip_buffer import ClipBuffer
+
+# Un único hilo escribe todos los clips: decodificar y escribir video nunca
+# ocurre en el bucle de captura ni en el de inferencia
+_clip_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-writer")
+
+
+class PendingClip:
+    """Clip en curso: frames previos al evento más los posteriores hasta `until`"""
+
+    __slots__ = ("path", "frames", "until")
+
+    def __init__(self, path: str, frames: List[Tuple[float, bytes]], until: float):
+        self.path = path
+        self.frames = frames
+        self.until = until
+
+
+class ClipRecorder:
+    """
+    Graba clips de una cámara alrededor de cada caída.
+
+    Mantiene los últimos `pre_seconds` de frames JPEG crudos de la cámara (con un
+    tope de `max_bytes`); al iniciar un clip copia esa ventana, sigue acumulando
+    `post_seconds` más y lo escribe en disco en segundo plano. Solo guarda hasta
+    `fps` frames por segundo, para no codificar cada frame de la cámara.
+    """
+
+    def __init__(
+        self,
+        camera_id: str,
+        clip_dir: str,
+        pre_seconds: float = 10.0,
+        post_seconds: float = 5.0,
+        max_bytes: int = 32 * 1024 * 1024,
+        enabled: bool = True,
+        fps: float = 10.0,
+    ):
+        self.camera_id = camera_id
+        self.clip_dir = clip_dir
+        self.post_seconds = post_seconds
+        self.enabled = enabled
+        self.fps = fps
+        self._last_frame: Optional[float] = None
+        self.buffer = ClipBuffer(pre_seconds, max_bytes)
+        self._pending: List[PendingClip] = []
+        self.logger = logging.getLogger(__name__)
+
+        # Métricas
+        self.saved = 0
+        self.failed = 0
+
+    def wants_frame(self, timestamp: float) -> bool:
+        """Si al clip le toca un frame nuevo según `fps` (0 = todos los frames)"""
+        if not self.enabled:
+            return False
+        # Misma tolerancia que el límite de FPS de los visores, por el jitter de la captura
+        return not self.fps or self._last_frame is None or timestamp - self._last_frame >= 0.9 / self.fps
+
+    def add_frame(self, jpeg: bytes, timestamp: Optional[float] = None):
+        """Registra un frame codificado; cierra los clips cuyo tramo posterior terminó"""
+        if not self.enabled:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        self._last_frame = timestamp
+        self.buffer.append(jpeg, timestamp)
+
+        if not self._pending:
+            return
+        for clip in list(self._pending):
+            clip.frames.append((timestamp, jpeg))
+            if timestamp >= clip.until:
+                self._finish(clip)
+
+    def reserve_path(self) -> Optional[str]:
+        """Ruta del próximo clip, para enlazarla en la detección antes de grabarlo"""
+        if not self.enabled:
+            return None
+        stem = f"{self.camera_id}_{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        path = os.path.join(self.clip_dir, f"{stem}.avi")
+        suffix = 1
+        while os.path.exists(path) or any(clip.path == path for clip in self._pending):
+            path = os.path.join(self.clip_dir, f"{stem}-{suffix}.avi")
+            suffix += 1
+        return path
+
+    def start_clip(self, path: str, timestamp: Optional[float] = None):
+        """Inicia un clip con la ventana previa actual y los próximos `post_seconds`"""
+        if not self.enabled or not path:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        self._pending.append(PendingClip(path, self.buffer.snapshot(), timestamp + self.post_seconds))
+        self.logger.info(f"Grabando clip de caída: {path}")
+
+    def flush(self):
+        """Escribe los clips en curso con los frames que tengan (p. ej. al detener la cámara)"""
+        for clip in list(self._pending):
+            self._finish(clip)
+        self.buffer.clear()
+        self._last_frame = None
+
+    def _finish(self, clip: PendingClip):
+        self._pending.remove(clip)
+        future = _clip_writer.submit(write_clip, clip.path, clip.frames)
+        future.add_done_callback(self._on_written)
+
+    def _on_written(self, future):
+        try:
+            path = future.result()
+            self.saved += 1
+            self.logger.info(f"Clip guardado: {path}")
+        except Exception as e:
+            self.failed += 1
+            self.logger.error(f"Error al guardar clip: {str(e)}")
+
+    def stats(self):
+        return {
+            'buffered_frames': len(self.buffer),
+            'buffered_bytes': self.buffer.bytes,
+            'pending_clips': len(self._pending),
+            'saved': self.saved,
+            'failed': self.failed,
+        }
+
+
+def write_clip(path: str, frames: List[Tuple[float, bytes]]) -> str:
+    """Decodifica los JPEG y los escribe como video MJPG a la tasa real de captura"""
+    if not frames:
+        raise ValueError(f"Clip sin frames: {path}")
+
+    first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+    if first is None:
+        raise ValueError(f"Frame inválido en el clip: {path}")
+    height, width = first.shape[:2]
+    duration = frames[-1][0] - frames[0][0]
+    fps = (len(frames) - 1) / duration if duration > 0 else 10.0
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    stem, ext = os.path.splitext(path)
+    partial = f"{stem}.part{ext}"
+    writer = cv2.VideoWriter(partial, cv2.VideoWriter_fourcc(*"MJPG"), max(fps, 1.0), (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"No se pudo crear el clip: {path}")
+    try:
+        writer.write(first)
+        for _, jpeg in frames[1:]:
+            frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                continue
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    # El clip solo aparece con su nombre final cuando está completo
+    os.replace(partial, path)
+    return path
@@ -0,0 +1,497 @@
+# app/services/detection_analytics.py
+"""
+Analítica de detecciones exportadas con memoria acotada.
+
+Lee el export JSON de Firebase (`{"detections": {id: {...}}}`, como
+`TabulationData/detecciones.json`) y los CSV de tiempos de escritura
+(`tiempos.csv`, incluidas las filas antiguas con ids `{'-OJ...'}`) de forma
+incremental, registro a registro, y los guarda en formato columnar: archivos
+`.npz` de NumPy por bloques de filas, con las columnas de texto codificadas
+como diccionario. Los reportes recorren esos bloques uno a uno con operaciones
+vectorizadas, así que la memoria depende del tamaño de bloque y no del export.
+
+Uso (desde Back/):
+    python -m app.services.detection_analytics convert --detections ../TabulationData/detecciones.json --timings tiempos.csv --out analitica
+    python -m app.services.detection_analytics report analitica --output reporte.json
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 65536
+READ_CHUNK_CHARS = 1 << 20
+# Caracteres que delimitan valores al recorrer el JSON sin decodificarlo
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s,}\]]')
+
+
+class _JSONStream:
+    """Lector incremental sobre un archivo JSON: decodifica valores sin cargar el archivo completo"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        # Se descarta lo ya consumido para que el buffer no crezca con el archivo
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter no blanco ('' al final del archivo)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' y se encontró '{found}'")
+        self.pos += 1
+
+    def _value_end(self, keep: bool) -> int:
+        """
+        Índice donde termina el valor que empieza en `pos`. Solo cuenta llaves y
+        corchetes fuera de las cadenas, sin decodificar nada; con `keep=False` va
+        descartando lo recorrido para que saltar un nodo grande use memoria acotada.
+        """
+        if not self.peek():
+            raise ValueError("JSON inválido: fin de archivo inesperado")
+        i = self.pos
+        scalar = self.buffer[i] not in '{["'
+        depth = 0
+        in_string = False
+        while True:
+            if scalar:
+                # Un número partido entre dos bloques se sigue leyendo hasta su delimitador
+                match = _SCALAR_END.search(self.buffer, i)
+                if match:
+                    return match.start()
+                i = len(self.buffer)
+            else:
+                match = (_STRING_SPECIAL if in_string else _STRUCTURE).search(self.buffer, i)
+                while match:
+                    i = match.end()
+                    char = match.group()
+                    if in_string:
+                        if char == "\\":
+                            i += 1
+                        else:
+                            in_string = False
+                    elif char == '"':
+                        in_string = True
+                    elif char in "{[":
+                        depth += 1
+                    else:
+                        depth -= 1
+                    if not depth and not in_string:
+                        return i
+                    match = (_STRING_SPECIAL if in_string else _STRUCTURE).search(self.buffer, i)
+                i = max(i, len(self.buffer))
+            if not keep:
+                self.pos = len(self.buffer)
+            offset = i - self.pos
+            if not self._fill():
+                if scalar:
+                    return len(self.buffer)
+                raise ValueError("JSON inválido: fin de archivo inesperado")
+            i = self.pos + offset
+
+    def value(self) -> Any:
+        """Decodifica el siguiente valor completo, leyendo más del archivo si hace falta"""
+        end = self._value_end(keep=True)
+        value = json.loads(self.buffer[self.pos:end])
+        self.pos = end
+        return value
+
+    def skip(self):
+        """Salta el siguiente valor sin decodificarlo ni mantenerlo en memoria"""
+        self.pos = self._value_end(keep=False)
+
+    def members(self) -> Iterator[str]:
+        """Recorre las claves del objeto actual; tras cada clave el llamador consume su valor"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"JSON inválido: separador inesperado '{separator}'")
+
+
+def iter_firebase_records(path: str, collection: str = "detections") -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Itera (id, registro) de una colección del export de Firebase en streaming.
+    Acepta el export completo (`{"detections": {...}, ...}`) o solo el nodo de la colección.
+    """
+    with open(path, encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        root_keys = stream.members()
+        for key in root_keys:
+            if key == collection:
+                for record_id in stream.members():
+                    yield record_id, stream.value()
+            elif stream.peek() == "{" and key.startswith("-"):
+                # El archivo es directamente el nodo de la colección
+                yield key, stream.value()
+                for record_id in root_keys:
+                    yield record_id, stream.value()
+                return
+            else:
+                stream.skip()
+
+
+def clean_detection_id(value: str) -> str:
+    """Normaliza los ids de tiempos.csv: las filas antiguas los guardaban como "{'-OJ...'}" """
+    return value.strip().strip("{}").strip().strip("'\"")
+
+
+def iter_timing_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Filas de un CSV de tiempos de escritura con el id normalizado y los tiempos en ms"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                yield {
+                    'detection_id': clean_detection_id(row['detection_id']),
+                    'start_ms': float(row['start_time']),
+                    'end_ms': float(row['end_time']),
+                    'delta_ms': float(row['delta_time']),
+                }
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Fila de tiempos inválida en {path}: {row}")
+
+
+class Categories:
+    """Codificación de diccionario de una columna de texto (valor → código entero estable)"""
+
+    def __init__(self, values: Sequence[str] = ()):
+        self.values: List[str] = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value: Optional[str]) -> int:
+        value = "" if value is None else str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarWriter:
+    """
+    Escribe filas como bloques columnar `.npz` (`{name}.part-00000.npz`, ...).
+    Solo mantiene en memoria las filas del bloque en curso.
+    """
+
+    def __init__(self, directory: str, name: str, schema: Dict[str, str],
+                 categorical: Sequence[str] = (), chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.directory = directory
+        self.name = name
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.categories = {column: Categories() for column in categorical}
+        self.rows = 0
+        self.parts = 0
+        self._pending: Dict[str, list] = {column: [] for column in schema}
+        os.makedirs(directory, exist_ok=True)
+        for old in glob.glob(os.path.join(directory, f"{name}.part-*.npz")):
+            os.remove(old)
+
+    def append(self, row: Dict[str, Any]):
+        for column in self.schema:
+            value = row.get(column)
+            if column in self.categories:
+                value = self.categories[column].code(value)
+            self._pending[column].append(value)
+        if len(self._pending[next(iter(self.schema))]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        count = len(self._pending[next(iter(self.schema))])
+        if not count:
+            return
+        arrays = {}
+        for column, dtype in self.schema.items():
+            values = self._pending[column]
+            if dtype.startswith("datetime64"):
+                values = [value or "NaT" for value in values]
+            elif dtype.startswith("float"):
+                values = [np.nan if value is None else value for value in values]
+            arrays[column] = np.array(values, dtype=dtype)
+            self._pending[column] = []
+        path = os.path.join(self.directory, f"{self.name}.part-{self.parts:05d}.npz")
+        np.savez(path, **arrays)
+        self.parts += 1
+        self.rows += count
+
+    def close(self) -> Dict[str, Any]:
+        """Escribe el último bloque y los diccionarios de las columnas de texto"""
+        self.flush()
+        with open(os.path.join(self.directory, f"{self.name}.meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                'rows': self.rows,
+                'parts': self.parts,
+                'schema': self.schema,
+                'categories': {column: categories.values for column, categories in self.categories.items()},
+            }, f, ensure_ascii=False, indent=2)
+        return {'rows': self.rows, 'parts': self.parts}
+
+
+def read_meta(directory: str, name: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, f"{name}.meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_chunks(directory: str, name: str) -> Iterator[Dict[str, np.ndarray]]:
+    """Recorre los bloques columnar de una tabla, uno en memoria a la vez"""
+    for path in sorted(glob.glob(os.path.join(directory, f"{name}.part-*.npz"))):
+        with np.load(path) as part:
+            yield {column: part[column] for column in part.files}
+
+
+DETECTION_SCHEMA = {
+    'id': 'S24',
+    'timestamp': 'datetime64[us]',
+    'location': 'int32',
+    'camera_id': 'int32',
+    'status': 'int32',
+    'class_id': 'int16',
+    'confidence': 'float32',
+    'duration': 'float32',
+    'x1': 'float32',
+    'y1': 'float32',
+    'x2': 'float32',
+    'y2': 'float32',
+}
+TIMING_SCHEMA = {
+    'detection_id': 'S24',
+    'start_ms': 'float64',
+    'end_ms': 'float64',
+    'delta_ms': 'float32',
+}
+
+
+def convert_detections(path: str, directory: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[str, Any]:
+    """Export JSON de Firebase → tabla columnar `detections`"""
+    writer = ColumnarWriter(
+        directory, "detections", DETECTION_SCHEMA,
+        categorical=("location", "camera_id", "status"), chunk_rows=chunk_rows
+    )
+    for detection_id, record in iter_firebase_records(path, "detections"):
+        if not isinstance(record, dict) or 'confidence' not in record:
+            continue
+        bbox = record.get('bbox') or [None] * 4
+        writer.append({
+            'id': detection_id.encode("ascii", "ignore"),
+            'timestamp': record.get('timestamp'),
+            'location': record.get('location'),
+            'camera_id': record.get('camera_id'),
+            'status': record.get('status'),
+            'class_id': record.get('class_id', -1),
+            'confidence': record.get('confidence'),
+            'duration': record.get('duration'),
+            'x1': bbox[0], 'y1': bbox[1], 'x2': bbox[2], 'y2': bbox[3],
+        })
+    return writer.close()
+
+
+def convert_timings(paths: Sequence[str], directory: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[str, Any]:
+    """CSV de tiempos (incluidos los rotados) → tabla columnar `timings`"""
+    writer = ColumnarWriter(directory, "timings", TIMING_SCHEMA, chunk_rows=chunk_rows)
+    for path in paths:
+        for row in iter_timing_rows(path):
+            row['detection_id'] = row['detection_id'].encode("ascii", "ignore")
+            writer.append(row)
+    return writer.close()
+
+
+class StreamingHistogram:
+    """
+    Histograma de bordes fijos que se acumula por bloques. Los percentiles se
+    interpolan dentro del bucket, con memoria constante sea cual sea el volumen.
+    """
+
+    def __init__(self, low: float, high: float, bins: int, log: bool = False):
+        self.edges = np.geomspace(low, high, bins + 1) if log else np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def add(self, values: np.ndarray):
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return
+        clipped = np.clip(values, self.edges[0], self.edges[-1])
+        self.counts += np.histogram(clipped, bins=self.edges)[0]
+        self.count += values.size
+        self.total += float(values.sum())
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, target))
+        index = min(index, len(self.counts) - 1)
+        before = cumulative[index - 1] if index else 0
+        fraction = (target - before) / self.counts[index] if self.counts[index] else 0.0
+        value = self.edges[index] + fraction * (self.edges[index + 1] - self.edges[index])
+        return float(np.clip(value, self.minimum, self.maximum))
+
+    def summary(self, quantiles: Sequence[float] = (0.5, 0.95, 0.99), digits: int = 3) -> Dict[str, Any]:
+        if not self.count:
+            return {'count': 0}
+        result = {
+            'count': self.count,
+            'mean': round(self.total / self.count, digits),
+            'min': round(self.minimum, digits),
+            'max': round(self.maximum, digits),
+        }
+        for q in quantiles:
+            result[f"p{int(q * 100)}"] = round(self.quantile(q), digits)
+        return result
+
+
+def detections_report(directory: str) -> Dict[str, Any]:
+    """Detecciones por ubicación y hora del día, por clase y distribución de confianza"""
+    meta = read_meta(directory, "detections")
+    locations = meta['categories']['location']
+    by_location_hour = np.zeros((len(locations), 24), dtype=np.int64)
+    by_class: Dict[int, int] = {}
+    confidence = {}
+    confidence_bins = np.linspace(0.0, 1.0, 21)
+    first = last = None
+
+    for chunk in iter_chunks(directory, "detections"):
+        timestamps = chunk['timestamp']
+        valid = ~np.isnat(timestamps)
+        hours = (timestamps[valid].astype('datetime64[h]').astype(np.int64) % 24)
+        np.add.at(by_location_hour, (chunk['location'][valid], hours), 1)
+        if valid.any():
+            chunk_first, chunk_last = timestamps[valid].min(), timestamps[valid].max()
+            first = chunk_first if first is None else min(first, chunk_first)
+            last = chunk_last if last is None else max(last, chunk_last)
+
+        classes, counts = np.unique(chunk['class_id'], return_counts=True)
+        for class_id, count in zip(classes.tolist(), counts.tolist()):
+            by_class[class_id] = by_class.get(class_id, 0) + count
+            histogram = confidence.setdefault(class_id, StreamingHistogram(0.0, 1.0, 1000))
+            histogram.add(chunk['confidence'][chunk['class_id'] == class_id].astype(np.float64))
+
+    from app.models.detections import CLASS_LABELS
+    return {
+        'total': int(by_location_hour.sum()),
+        'first': str(first) if first is not None else None,
+        'last': str(last) if last is not None else None,
+        'by_location': {
+            location: int(by_location_hour[code].sum()) for code, location in enumerate(locations)
+        },
+        'by_location_hour': {
+            location: by_location_hour[code].tolist() for code, location in enumerate(locations)
+        },
+        'by_class': {CLASS_LABELS.get(class_id, str(class_id)): count for class_id, count in sorted(by_class.items())},
+        'confidence': {
+            CLASS_LABELS.get(class_id, str(class_id)): {
+                **histogram.summary((0.05, 0.5, 0.95)),
+                'histogram': {
+                    f"{low:.2f}-{high:.2f}": int(count)
+                    for low, high, count in zip(
+                        confidence_bins[:-1], confidence_bins[1:],
+                        histogram.counts.reshape(20, -1).sum(axis=1)
+                    )
+                },
+            }
+            for class_id, histogram in sorted(confidence.items())
+        },
+    }
+
+
+def timings_report(directory: str) -> Dict[str, Any]:
+    """Latencia de escritura (ms) con p50/p95/p99 sobre un histograma logarítmico"""
+    latency = StreamingHistogram(0.01, 600_000.0, 4000, log=True)
+    for chunk in iter_chunks(directory, "timings"):
+        latency.add(chunk['delta_ms'].astype(np.float64))
+    return {'write_latency_ms': latency.summary(digits=2)}
+
+
+def build_report(directory: str) -> Dict[str, Any]:
+    report: Dict[str, Any] = {'generated_at': datetime.now().isoformat()}
+    if os.path.exists(os.path.join(directory, "detections.meta.json")):
+        report['detections'] = detections_report(directory)
+    if os.path.exists(os.path.join(directory, "timings.meta.json")):
+        report['timings'] = timings_report(directory)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analítica columnar de detecciones y tiempos de escritura")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Convertir exports JSON/CSV a formato columnar")
+    convert.add_argument("--detections", help="Export JSON de Firebase (detecciones.json)")
+    convert.add_argument("--timings", nargs="*", default=[], help="CSV de tiempos (tiempos.csv y rotados)")
+    convert.add_argument("--out", default="analitica", help="Carpeta de salida")
+    convert.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Filas por bloque")
+
+    report = commands.add_parser("report", help="Reporte a partir de la carpeta columnar")
+    report.add_argument("directory", help="Carpeta generada por convert")
+    report.add_argument("--output", help="Archivo JSON de salida (por defecto, stdout)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "convert":
+        if args.detections:
+            result = convert_detections(args.detections, args.out, args.chunk_rows)
+            logger.info(f"Detecciones: {result['rows']} filas en {result['parts']} bloques")
+        if args.timings:
+            result = convert_timings(args.timings, args.out, args.chunk_rows)
+            logger.info(f"Tiempos: {result['rows']} filas en {result['parts']} bloques")
+        return
+
+    output = json.dumps(build_report(args.directory), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# app/services/detection_store.py
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# callback(notification_id, notification_data), invocado desde un hilo del backend
+NotificationCallback = Callable[[str, Any], None]
+
+
+class DetectionRecord(NamedTuple):
+    """Detección y notificación asociada, con sus claves ya generadas"""
+    detection_id: str
+    detection: Dict[str, Any]
+    notification_id: str
+    notification: Dict[str, Any]
+
+
+class DetectionStore(ABC):
+    """Interfaz de persistencia de detecciones y notificaciones (métodos bloqueantes)"""
+
+    @abstractmethod
+    def save_batch(self, records: Sequence[DetectionRecord]):
+        """Guarda un lote de detecciones y notificaciones en una sola operación"""
+
+    @abstractmethod
+    def query_detections(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        location: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Detecciones entre `start` y `end` (ISO 8601), opcionalmente de una ubicación"""
+
+    @abstractmethod
+    def listen_notifications(self, callback: NotificationCallback):
+        """Suscribe `callback` al flujo de notificaciones nuevas; devuelve un objeto con close()"""
+
+    def close(self):
+        pass
+
+
+class FirebaseStore(DetectionStore):
+    """Persistencia en Firebase Realtime Database"""
+
+    def __init__(self, root_ref):
+        self.db = root_ref
+
+    def save_batch(self, records: Sequence[DetectionRecord]):
+        updates: Dict[str, Any] = {}
+        for record in records:
+            updates[f"detections/{record.detection_id}"] = record.detection
+            updates[f"notifications/{record.notification_id}"] = record.notification
+        self.db.update(updates)
+
+    def query_detections(self, start=None, end=None, location=None, limit=100):
+        query = self.db.child('detections').order_by_child('timestamp')
+        if start:
+            query = query.start_at(start)
+        if end:
+            query = query.end_at(end)
+        snapshot = query.limit_to_last(limit).get() or {}
+
+        detections = [
+            {'id': key, **value}
+            for key, value in snapshot.items()
+            if location is None or value.get('location') == location
+        ]
+        return sorted(detections, key=lambda d: d.get('timestamp', ''))
+
+    def listen_notifications(self, callback: NotificationCallback):
+        def on_event(event):
+            for notification_id, notification in firebase_notification_events(
+                event.event_type, event.path, event.data
+            ):
+                callback(notification_id, notification)
+
+        return self.db.child('notifications').listen(on_event)
+
+
+def firebase_notification_events(event_type: str, path: str, data: Any):
+    """
+    Convierte un evento del listener de `notifications` en pares (id, notificación).
+    `save_batch` escribe con un update() multi-ruta, que llega como `patch` en la raíz
+    con `{id: notificación}`; las escrituras sueltas llegan como `put` en `/{id}`.
+    """
+    if not data:
+        return []
+    if event_type == 'patch':
+        # Un patch bajo `/{id}` solo modifica campos de una notificación existente
+        if path != '/':
+            return []
+        return [(notification_id, notification) for notification_id, notification in data.items() if notification]
+    if event_type == 'put':
+        return [(path[1:], data)]  # Elimina el '/' inicial
+    return []
+
+
+class SQLiteStore(DetectionStore):
+    """
+    Persistencia local en SQLite (modo WAL) para operar sin red ni credenciales.
+    Las notificaciones llevan una secuencia creciente que sirve de change feed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS detections (
+            id TEXT PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            location TEXT,
+            camera_id TEXT,
+            confidence REAL,
+            class_id INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_detections_location_timestamp ON detections (location, timestamp);
+        CREATE TABLE IF NOT EXISTS notifications (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT UNIQUE NOT NULL,
+            timestamp TEXT,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(self.SCHEMA)
+        logger.info(f"Almacenamiento SQLite en: {path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def save_batch(self, records: Sequence[DetectionRecord]):
+        detections = [
+            (
+                record.detection_id,
+                record.detection.get('timestamp', ''),
+                record.detection.get('location'),
+                record.detection.get('camera_id'),
+                record.detection.get('confidence'),
+                record.detection.get('class_id'),
+                json.dumps(record.detection),
+            )
+            for record in records
+        ]
+        notifications = [
+            (
+                record.notification_id,
+                record.notification.get('timestamp'),
+                json.dumps(record.notification),
+            )
+            for record in records
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO detections "
+                "(id, timestamp, location, camera_id, confidence, class_id, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                detections,
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO notifications (id, timestamp, data) VALUES (?, ?, ?)",
+                notifications,
+            )
+
+    def query_detections(self, start=None, end=None, location=None, limit=100):
+        clauses, params = [], []
+        if location is not None:
+            clauses.append("location = ?")
+            params.append(location)
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, data FROM ("
+                f"SELECT id, data, timestamp FROM detections {where} "
+                f"ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp",
+                (*params, limit),
+            ).fetchall()
+        return [{'id': row[0], **json.loads(row[1])} for row in rows]
+
+    def listen_notifications(self, callback: NotificationCallback):
+        return _SQLiteNotificationFeed(self, callback)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _SQLiteNotificationFeed:
+    """Hilo que sondea las notificaciones nuevas (incluidas las de otros procesos)"""
+
+    def __init__(self, store: SQLiteStore, callback: NotificationCallback):
+        self.store = store
+        self.callback = callback
+        self._stop = threading.Event()
+        self._conn = store._connect()
+        row = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM notifications").fetchone()
+        self.last_seq = row[0]
+        self._thread = threading.Thread(target=self._run, name="sqlite-notifications", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.store.poll_interval):
+            try:
+                rows = self._conn.execute(
+                    "SELECT seq, id, data FROM notifications WHERE seq > ? ORDER BY seq",
+                    (self.last_seq,),
+                ).fetchall()
+                for seq, notification_id, data in rows:
+                    self.last_seq = seq
+                    self.callback(notification_id, json.loads(data))
+            except Exception as e:
+                logger.error(f"Error al leer notificaciones de SQLite: {str(e)}")
+        self._conn.close()
+
+    def close(self):
+        self._stop.set()
@@ -1,12 +1,21 @@
 # app/services/firebase_service.py
-import firebase_admin
-from firebase_admin import credentials, db
 import asyncio
 from datetime import datetime
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, NamedTuple, Optional
 import time
-from app.utils.csv_utils import write_to_csv
+from app.core.config import settings
+from app.core.event_bus import EventBus, NOTIFICATIONS_TOPIC
+from app.core.metrics import PIPELINE_STAGE_SECONDS
+from app.utils.csv_utils import BufferedCSVWriter
+from app.utils.push_id import generate_push_id
+from app.services.detection_store import DetectionRecord, DetectionStore, FirebaseStore, SQLiteStore
+
+
+class PendingWrite(NamedTuple):
+    """Escritura pendiente y momento en que se encoló"""
+    record: DetectionRecord
+    enqueued_at: float
 
 
 class FirebaseService:
@@ -24,20 +33,45 @@ class FirebaseService:
             
         self.app = None
         self.db = None
+        self.store: Optional[DetectionStore] = None
         self.logger = logging.getLogger(__name__)
         self._initialized = True
-        self.last_notification_time = None
-        self.notification_cooldown = 30  # segundos entre notificaciones
+        # Última notificación por cámara: una caída en una sala no silencia a las demás
+        self._last_notification: Dict[str, datetime] = {}
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.timing_writer = BufferedCSVWriter(
+            settings.TIMING_CSV_PATH,
+            ['detection_id', 'start_time', 'end_time', 'delta_time'],
+            flush_interval=settings.TIMING_CSV_FLUSH_S,
+            max_bytes=settings.TIMING_CSV_MAX_BYTES,
+            rotate_daily=settings.TIMING_CSV_ROTATE_DAILY,
+        )
 
     def initialize(self, cred_path: str, database_url: str):
-        """Inicializa la conexión con Firebase"""
+        """
+        Inicializa el almacenamiento configurado en STORAGE_BACKEND: Firebase
+        (por defecto) o SQLite local, que no necesita credenciales ni red
+        """
+        if self.store:
+            return
+        if settings.STORAGE_BACKEND == "sqlite":
+            self.store = SQLiteStore(settings.SQLITE_PATH)
+            self.logger.info("Almacenamiento local SQLite inicializado")
+            return
+
         if not self.app:
             try:
+                # firebase_admin (y google-auth) solo se importan si se usa Firebase
+                import firebase_admin
+                from firebase_admin import credentials, db
+
                 cred = credentials.Certificate(cred_path)
                 self.app = firebase_admin.initialize_app(cred, {
                     'databaseURL': database_url
                 })
                 self.db = db.reference()
+                self.store = FirebaseStore(self.db)
                 self.logger.info("Firebase inicializado correctamente")
             except Exception as e:
                 self.logger.error(f"Error al inicializar Firebase: {str(e)}")
@@ -45,73 +79,149 @@ class FirebaseService:
 
     async def save_detection(self, detection_data: Dict[str, Any]) -> bool:
         """
-        Guarda una detección en Firebase y envía notificación si es necesario
+        Encola una detección (y su notificación) para guardarla en Firebase.
+        Retorna de inmediato; la escritura la hace el worker en segundo plano.
         """
-        if not self.db:
+        if not self.store:
             raise Exception("Firebase no ha sido inicializado")
 
         try:
             current_time = datetime.now()
             
-            # Verificar cooldown de notificaciones
-            if (self.last_notification_time and 
-                (current_time - self.last_notification_time).total_seconds() < self.notification_cooldown):
+            # Verificar cooldown de notificaciones de la cámara
+            cooldown_key = self._cooldown_key(detection_data)
+            if self.in_cooldown(cooldown_key, current_time):
                 return False
 
             detection_data.update({
                 'timestamp': current_time.isoformat(),
                 'status': 'pending'  # pending, processed, ignored
             })
-            #medicion de tiempo
-            start_time = time.perf_counter()
-            
-            ref = self.db.child('detections').push(detection_data)
-            self.last_notification_time = current_time
+            self._last_notification[cooldown_key] = current_time
 
-            # Guardar en Firebase
-            ref = self.db.child('detections').push(detection_data)
-            self.last_notification_time = current_time
-            
-            # Enviar notificación
-            await self._send_notification(detection_data)
-            
-            #medicion de tiempo final
-            end_time = time.perf_counter()
-            delta_time = (end_time - start_time) * 1000
-            
-            # --- LOGGING ---
-            self.logger.info(f"Tiempo inicial: {start_time * 1000:.2f} ms")
-            self.logger.info(f"Tiempo final: {end_time * 1000:.2f} ms")
-            self.logger.info(f"Tiempo transcurrido: {delta_time:.2f} ms")            
-            self.logger.info(f"Detección guardada con ID: {ref.key}")
-            
-            # --- GUARDAR EN CSV ---
-            csv_data = {
-                'detection_id': {ref.key},                'start_time': f"{start_time * 1000:.2f}",
-                'end_time': f"{end_time * 1000:.2f}",
-                'delta_time': f"{delta_time:.2f}",
-            }
-            write_to_csv(csv_data)
+            detection_id = generate_push_id()
+            record = DetectionRecord(
+                detection_id,
+                detection_data,
+                generate_push_id(),
+                self._build_notification(detection_id, detection_data),
+            )
+            self._enqueue(PendingWrite(record, time.perf_counter()))
+
+            # Entrega inmediata a los dashboards de este proceso, sin esperar a Firebase
+            EventBus().publish(NOTIFICATIONS_TOPIC, record.notification_id, record.notification)
             return True
 
         except Exception as e:
-            self.logger.error(f"Error al guardar en Firebase: {str(e)}")
+            self.logger.error(f"Error al encolar detección: {str(e)}")
             return False
 
-    async def _send_notification(self, detection_data: Dict[str, Any]):
-        """
-        Envía notificación a través de Firebase
-        """
-        try:
-            notification_data = {
-                'title': 'CAIDA DETECTADA',
-                'body': f"Se ha detectado un accidente : {detection_data.get('confidence', 0):.2f}",
-                'timestamp': detection_data['timestamp'],
-                'status': 'new'
-            }
-            
-            self.db.child('notifications').push(notification_data)
-            self.logger.info("Notificación enviada correctamente")
-            
-        except Exception as e:
-            self.logger.error(f"Error al enviar notificación: {str(e)}")
+    def in_cooldown(self, key: Optional[str], now: Optional[datetime] = None) -> bool:
+        """Si la cámara (o ubicación) notificó una caída hace menos de NOTIFICATION_COOLDOWN segundos"""
+        last = self._last_notification.get(key)
+        if last is None:
+            return False
+        now = now or datetime.now()
+        return (now - last).total_seconds() < settings.NOTIFICATION_COOLDOWN
+
+    @staticmethod
+    def _cooldown_key(detection_data: Dict[str, Any]) -> Optional[str]:
+        return detection_data.get('camera_id') or detection_data.get('location')
+
+    def _build_notification(self, detection_id: str, detection_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Construye la notificación asociada a una detección"""
+        return {
+            'title': 'CAIDA DETECTADA',
+            'body': f"Se ha detectado un accidente : {detection_data.get('confidence', 0):.2f}",
+            'timestamp': detection_data['timestamp'],
+            'status': 'new',
+            'detection_id': detection_id,
+        }
+
+    def _enqueue(self, pending: PendingWrite):
+        """Encola una escritura; si la cola está llena se descarta la más antigua"""
+        if self._write_queue is None:
+            self._write_queue = asyncio.Queue(maxsize=settings.FIREBASE_WRITE_QUEUE_SIZE)
+        if not self._writer_task or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._drain_writes())
+
+        if self._write_queue.full():
+            dropped = self._write_queue.get_nowait()
+            self._write_queue.task_done()
+            self.logger.warning(f"Cola de escritura llena, se descarta la detección {dropped.record.detection_id}")
+        self._write_queue.put_nowait(pending)
+
+    async def _drain_writes(self):
+        """Worker: agrupa las escrituras en ráfaga y las guarda en una sola operación"""
+        loop = asyncio.get_running_loop()
+        window = settings.FIREBASE_WRITE_BATCH_MS / 1000
+
+        while True:
+            batch = [await self._write_queue.get()]
+            deadline = loop.time() + window
+            while len(batch) < settings.FIREBASE_WRITE_MAX_BATCH:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._write_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    async def _write_batch(self, batch: List[PendingWrite]):
+        """Escribe un lote con reintentos y backoff exponencial"""
+        records = [pending.record for pending in batch]
+
+        delay = 0.5
+        for attempt in range(1, settings.FIREBASE_WRITE_RETRIES + 1):
+            try:
+                # El almacenamiento es bloqueante: se ejecuta fuera del event loop
+                await asyncio.to_thread(self.store.save_batch, records)
+                break
+            except Exception as e:
+                if attempt == settings.FIREBASE_WRITE_RETRIES:
+                    self.logger.error(
+                        f"Error al guardar en Firebase tras {attempt} intentos, "
+                        f"se pierden {len(batch)} detecciones: {str(e)}"
+                    )
+                    return
+                self.logger.warning(f"Error al guardar en Firebase (intento {attempt}), reintentando: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+        end_time = time.perf_counter()
+        self.logger.info(f"Lote de {len(batch)} detecciones guardado")
+
+        # --- GUARDAR EN CSV ---
+        for pending in batch:
+            PIPELINE_STAGE_SECONDS.labels(
+                pending.record.detection.get('camera_id', 'unknown'), "persist"
+            ).observe(end_time - pending.enqueued_at)
+            delta_time = (end_time - pending.enqueued_at) * 1000
+            self.timing_writer.write({
+                'detection_id': pending.record.detection_id,
+                'start_time': f"{pending.enqueued_at * 1000:.2f}",
+                'end_time': f"{end_time * 1000:.2f}",
+                'delta_time': f"{delta_time:.2f}",
+            })
+
+    def queue_depth(self) -> int:
+        return self._write_queue.qsize() if self._write_queue is not None else 0
+
+    async def close(self, timeout: float = 5.0):
+        """Espera a que se vacíe la cola de escritura y detiene el worker"""
+        if self._write_queue is not None:
+            try:
+                await asyncio.wait_for(self._write_queue.join(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Quedaron {self._write_queue.qsize()} escrituras sin enviar a Firebase")
+        if self._writer_task:
+            self._writer_task.cancel()
+            self._writer_task = None
+        await asyncio.to_thread(self.timing_writer.close)
@@ -0,0 +1,133 @@
+# app/services/inference_executor.py
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class InferenceDropped(Exception):
+    """La petición de inferencia se descartó (reemplazada por una más reciente o vencida)"""
+
+
+def resolve_threadsafe(loop, future, result=None, exception=None):
+    """Resuelve desde otro hilo un future creado en `loop` (si sigue pendiente)"""
+    def resolve():
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    try:
+        loop.call_soon_threadsafe(resolve)
+    except RuntimeError:
+        # El event loop ya se cerró
+        pass
+
+
+class InferenceExecutor:
+    """
+    Ejecuta la inferencia en un hilo dedicado para no bloquear el event loop.
+
+    Cada origen (`key`, p. ej. una cámara o el planificador de lotes) tiene un único
+    slot de envío: si llega un frame nuevo antes de que el anterior empiece a
+    procesarse, el anterior se descarta (latest-frame-wins). Las peticiones que
+    esperaron más que `deadline_ms` se descartan en lugar de procesarse tarde.
+    """
+
+    def __init__(self, deadline_ms: float = 500.0, name: str = "inference"):
+        self.deadline = deadline_ms / 1000 if deadline_ms > 0 else None
+        self.name = name
+        self._slots: Dict[str, Tuple[Callable, tuple, asyncio.Future, asyncio.AbstractEventLoop, float]] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.logger = logging.getLogger(__name__)
+
+        # Métricas
+        self.completed = 0
+        self.superseded = 0
+        self.expired = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+        self._thread.start()
+        self.logger.info("Hilo de inferencia iniciado")
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            pending = list(self._slots.values())
+            self._slots.clear()
+            self._condition.notify_all()
+        for _, _, future, loop, _ in pending:
+            resolve_threadsafe(loop, future, exception=InferenceDropped("Ejecutor detenido"))
+        self.logger.info("Hilo de inferencia detenido")
+
+    async def run(self, key: str, fn: Callable, *args) -> Any:
+        """Envía `fn(*args)` al hilo de inferencia y espera su resultado"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._condition:
+            previous = self._slots.pop(key, None)
+            self._slots[key] = (fn, args, future, loop, time.monotonic())
+            self._condition.notify()
+
+        if previous:
+            self.superseded += 1
+            _, _, previous_future, previous_loop, _ = previous
+            resolve_threadsafe(
+                previous_loop, previous_future,
+                exception=InferenceDropped(f"Frame reemplazado por uno más reciente ({key})")
+            )
+
+        return await future
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._slots and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                # El slot más antiguo primero, para no desatender a ningún origen
+                key = next(iter(self._slots))
+                fn, args, future, loop, submitted = self._slots.pop(key)
+
+            if future.done():
+                continue
+
+            if self.deadline is not None and time.monotonic() - submitted > self.deadline:
+                self.expired += 1
+                resolve_threadsafe(
+                    loop, future,
+                    exception=InferenceDropped(f"Petición vencida antes de procesarse ({key})")
+                )
+                continue
+
+            try:
+                result = fn(*args)
+            except Exception as e:
+                resolve_threadsafe(loop, future, exception=e)
+            else:
+                self.completed += 1
+                resolve_threadsafe(loop, future, result=result)
+
+    def pending(self) -> int:
+        """Peticiones esperando turno en el hilo de inferencia"""
+        return len(self._slots)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'completed': self.completed,
+            'superseded': self.superseded,
+            'expired': self.expired,
+            'deadline_ms': self.deadline * 1000 if self.deadline else 0.0,
+        }
@@ -0,0 +1,268 @@
+# app/services/inference_workers.py
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.shared_frames import SharedFrameRef, attach, view
+from app.models.detections import Detections
+from app.services.inference_executor import InferenceDropped, resolve_threadsafe
+
+logger = logging.getLogger(__name__)
+
+# Bloques de memoria compartida que un worker mantiene abiertos (uno por cámara activa)
+_MAX_ATTACHED = 64
+
+
+def _worker_main(conn, model_path: str, device: str, backend: str, imgsz: int,
+                 precision: str, threads: int, warmup: bool):
+    """
+    Proceso de inferencia: carga el modelo una vez y responde peticiones
+    (request_id, SharedFrameRef, imgsz) con arreglos N x 6 (x1, y1, x2, y2, conf, cls)
+    """
+    # Los hilos de torch/OpenMP se fijan antes de importar el modelo
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    import cv2
+    from app.services import model_backends
+
+    cv2.setNumThreads(1)
+    try:
+        device = model_backends.resolve_device(device)
+        model, backend = model_backends.load_model(
+            model_path, device, model_backends.select_backend(backend, device, precision), imgsz, precision
+        )
+        if warmup:
+            model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False, device=device, imgsz=imgsz)
+    except Exception as e:
+        conn.send(("error", str(e)))
+        return
+    conn.send(("ready", backend, device))
+
+    attached: "OrderedDict[str, Any]" = OrderedDict()
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        request_id, ref, request_imgsz = message
+        try:
+            shm = attached.get(ref.name)
+            if shm is None:
+                shm = attached[ref.name] = attach(ref.name)
+                while len(attached) > _MAX_ATTACHED:
+                    attached.popitem(last=False)[1].close()
+            attached.move_to_end(ref.name)
+
+            frame = view(shm, ref)
+            results = model(frame, verbose=False, device=device, imgsz=request_imgsz or imgsz)
+            del frame
+            data = results[0].boxes.data
+            if hasattr(data, "cpu"):
+                data = data.cpu().numpy()
+            conn.send((request_id, np.ascontiguousarray(data, dtype=np.float32), None))
+        except Exception as e:
+            conn.send((request_id, None, str(e)))
+
+    for shm in attached.values():
+        shm.close()
+
+
+class _Worker:
+    """
+    Proceso de inferencia, su pipe y las peticiones que tiene en curso.
+    `lock` protege `conn` y `pending`, que usan a la vez el event loop y el hilo lector
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.pending: Dict[int, Tuple[asyncio.Future, asyncio.AbstractEventLoop]] = {}
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.restarts = 0
+
+
+class InferenceWorkerPool:
+    """
+    Pool de procesos de inferencia para escalar con los núcleos.
+
+    Cada proceso carga el modelo una sola vez. El proceso de la API solo envía
+    por pipe una referencia al frame en memoria compartida (SharedFrameRef) y
+    recibe un arreglo compacto de detecciones; cada petición va al worker con
+    menos trabajo en curso. Si un worker muere se relanza y sus peticiones
+    pendientes fallan con InferenceDropped.
+    """
+
+    def __init__(self, workers: int, model_path: str, device: str, backend: str,
+                 imgsz: int, precision: str = "fp32", threads: int = 1, warmup: bool = True):
+        self.size = max(workers, 1)
+        self.model_path = model_path
+        self.device = device
+        self.backend = backend
+        self.imgsz = imgsz
+        self.precision = precision
+        self.threads = max(threads, 1)
+        self.warmup = warmup
+        self.workers: List[_Worker] = []
+        self.ready = False
+        self._ids = itertools.count()
+        self._stopping = False
+        self._start_lock = asyncio.Lock()
+        self._context = mp.get_context("spawn")
+
+    async def start(self):
+        """Lanza los procesos y espera a que todos hayan cargado el modelo"""
+        if self.ready:
+            return
+        async with self._start_lock:
+            if self.ready:
+                return
+            self._stopping = False
+            started = time.perf_counter()
+            self.workers = [_Worker(index) for index in range(self.size)]
+            await asyncio.gather(*(asyncio.to_thread(self._spawn, worker) for worker in self.workers))
+            self.ready = True
+            logger.info(
+                f"{self.size} procesos de inferencia listos ({self.backend}, {self.device}) "
+                f"en {time.perf_counter() - started:.1f} s"
+            )
+
+    def _spawn(self, worker: _Worker):
+        """Lanza el proceso del worker y bloquea hasta que carga el modelo"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_path, self.device, self.backend,
+                  self.imgsz, self.precision, self.threads, self.warmup),
+            name=f"inference-worker-{worker.index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        try:
+            status = parent_conn.recv()
+        except EOFError:
+            status = ("error", f"el proceso terminó con código {process.exitcode}")
+        if status[0] != "ready":
+            process.join(1)
+            raise RuntimeError(f"Error al iniciar el worker de inferencia {worker.index}: {status[1]}")
+
+        _, self.backend, self.device = status
+        with worker.lock:
+            worker.process, worker.conn = process, parent_conn
+        threading.Thread(
+            target=self._read_results, args=(worker, parent_conn),
+            name=f"inference-results-{worker.index}", daemon=True
+        ).start()
+
+    def _read_results(self, worker: _Worker, conn):
+        """Hilo lector: resuelve los futures con las respuestas del worker"""
+        while True:
+            try:
+                request_id, data, error = conn.recv()
+            except (EOFError, OSError):
+                break
+            with worker.lock:
+                entry = worker.pending.pop(request_id, None)
+            if entry is None:
+                continue
+            future, loop = entry
+            worker.completed += 1
+            resolve_threadsafe(loop, future, data, None if error is None else Exception(error))
+
+        # El worker terminó: deja de aceptar peticiones, fallan las que tenía y,
+        # si no se está deteniendo el pool, se relanza
+        with worker.lock:
+            worker.conn = None
+            pending, worker.pending = worker.pending, {}
+        for future, loop in pending.values():
+            resolve_threadsafe(loop, future, None, InferenceDropped(f"Worker de inferencia {worker.index} terminado"))
+        if self._stopping:
+            return
+
+        logger.error(f"Worker de inferencia {worker.index} terminó inesperadamente, relanzando")
+        worker.restarts += 1
+        try:
+            self._spawn(worker)
+        except Exception as e:
+            logger.error(f"No se pudo relanzar el worker de inferencia {worker.index}: {str(e)}")
+
+    async def detect(self, ref: SharedFrameRef, key: Optional[str] = None,
+                     imgsz: Optional[int] = None) -> Detections:
+        """Infiere el frame referenciado en el worker menos ocupado"""
+        await self.start()
+        available = [worker for worker in self.workers if worker.conn is not None]
+        if not available:
+            raise InferenceDropped("No hay workers de inferencia disponibles")
+        worker = min(available, key=lambda w: len(w.pending))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = next(self._ids)
+        # Si el hilo lector ya dio el worker por terminado, la petición no se registra
+        with worker.lock:
+            conn = worker.conn
+            if conn is None:
+                raise InferenceDropped(f"Worker de inferencia {worker.index} no disponible")
+            worker.pending[request_id] = (future, loop)
+        try:
+            conn.send((request_id, ref, imgsz))
+        except (OSError, ValueError) as e:
+            with worker.lock:
+                worker.pending.pop(request_id, None)
+            raise InferenceDropped(f"Worker de inferencia {worker.index} no disponible: {str(e)}")
+        return Detections.from_array(await future)
+
+    def supports_imgsz(self, imgsz: int) -> bool:
+        """Los modelos exportados (ONNX/OpenVINO) tienen la entrada fija en MODEL_IMGSZ"""
+        return self.backend == "torch" or imgsz == self.imgsz
+
+    def stop(self):
+        """Detiene los procesos de inferencia"""
+        self._stopping = True
+        self.ready = False
+        for worker in self.workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(None)
+                except (OSError, ValueError):
+                    pass
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(2)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        logger.info("Procesos de inferencia detenidos")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.size,
+            'ready': self.ready,
+            'backend': self.backend,
+            'device': self.device,
+            'per_worker': [
+                {
+                    'pending': len(worker.pending),
+                    'completed': worker.completed,
+                    'restarts': worker.restarts,
+                    'alive': bool(worker.process and worker.process.is_alive()),
+                }
+                for worker in self.workers
+            ],
+        }
+
+    def pending(self) -> int:
+        return sum(len(worker.pending) for worker in self.workers)
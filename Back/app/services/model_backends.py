@@ -0,0 +1,134 @@
+# app/services/model_backends.py
+import importlib.util
+import logging
+import os
+import shutil
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# Backends soportados y el paquete que necesita cada uno en tiempo de ejecución
+BACKEND_PACKAGES = {
+    "torch": "torch",
+    "onnx": "onnxruntime",
+    "openvino": "openvino",
+}
+# Orden de preferencia en CPU cuando MODEL_BACKEND=auto (del más rápido al más lento)
+CPU_BACKEND_PREFERENCE = ("openvino", "onnx", "torch")
+# Variantes del modelo ONNX: las INT8 se generan con `python -m benchmarks.quantize`
+PRECISIONS = ("fp32", "int8-dynamic", "int8-static")
+
+
+def is_available(backend: str) -> bool:
+    package = BACKEND_PACKAGES.get(backend)
+    return package is not None and importlib.util.find_spec(package) is not None
+
+
+def resolve_device(device: str) -> str:
+    """Traduce INFERENCE_DEVICE ('auto', 'cpu', 'cuda:0', ...) a un dispositivo concreto"""
+    if device != "auto":
+        return device
+    try:
+        import torch
+        return "cuda:0" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def select_backend(backend: str, device: str, precision: str = "fp32") -> str:
+    """
+    Elige el backend a usar; en 'auto' prefiere PyTorch en GPU y el más rápido
+    instalado en CPU. Las variantes INT8 solo existen en ONNX.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Precisión de modelo no soportada: {precision}")
+    if backend == "auto" and precision != "fp32" and is_available("onnx"):
+        return "onnx"
+    if backend != "auto":
+        if backend not in BACKEND_PACKAGES:
+            raise ValueError(f"Backend de modelo no soportado: {backend}")
+        return backend
+    if device.startswith("cuda"):
+        return "torch"
+    for candidate in CPU_BACKEND_PREFERENCE:
+        if is_available(candidate):
+            return candidate
+    return "torch"
+
+
+def exported_path(model_path: str, backend: str, imgsz: int) -> str:
+    """Ruta del artefacto exportado, junto a MODEL_PATH e identificado por el tamaño de entrada"""
+    stem, _ = os.path.splitext(model_path)
+    if backend == "onnx":
+        return f"{stem}-{imgsz}.onnx"
+    if backend == "openvino":
+        return f"{stem}-{imgsz}_openvino_model"
+    return model_path
+
+
+def quantized_path(model_path: str, imgsz: int, precision: str) -> str:
+    """Ruta de una variante INT8 del modelo ONNX, junto a MODEL_PATH"""
+    stem, _ = os.path.splitext(model_path)
+    return f"{stem}-{imgsz}-{precision}.onnx"
+
+
+def _is_fresh(artifact: str, model_path: str) -> bool:
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(model_path)
+
+
+def prepare_model(model_path: str, backend: str, imgsz: int) -> str:
+    """
+    Devuelve la ruta del modelo a cargar para el backend indicado. Los modelos
+    exportados se guardan junto a MODEL_PATH y se reutilizan entre reinicios;
+    solo se vuelven a exportar si `best.pt` es más reciente que el artefacto.
+    """
+    if backend == "torch":
+        return model_path
+
+    target = exported_path(model_path, backend, imgsz)
+    if _is_fresh(target, model_path):
+        logger.info(f"Usando modelo {backend} en caché: {target}")
+        return target
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exportando modelo a {backend} (imgsz={imgsz}), esto puede tardar...")
+    output = YOLO(model_path).export(format=backend, imgsz=imgsz)
+
+    if os.path.abspath(output) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        os.replace(output, target)
+    logger.info(f"Modelo exportado en: {target}")
+    return target
+
+
+def load_model(model_path: str, device: str, backend: str, imgsz: int,
+               precision: str = "fp32") -> Tuple[object, str]:
+    """
+    Carga el modelo con el backend elegido. Si la exportación falla se vuelve a
+    PyTorch para no dejar el servicio sin modelo. Devuelve (modelo, backend usado).
+    """
+    from ultralytics import YOLO
+
+    if backend == "onnx" and precision != "fp32":
+        target = quantized_path(model_path, imgsz, precision)
+        if _is_fresh(target, model_path):
+            logger.info(f"Usando variante {precision}: {target}")
+            return YOLO(target, task="detect"), backend
+        logger.warning(
+            f"No existe la variante {precision} actualizada ({target}); se usará ONNX fp32. "
+            f"Generarla con: python -m benchmarks.quantize"
+        )
+    elif precision != "fp32":
+        logger.warning(f"La precisión {precision} solo aplica al backend onnx; se ignora con {backend}")
+
+    if backend != "torch":
+        try:
+            return YOLO(prepare_model(model_path, backend, imgsz), task="detect"), backend
+        except Exception as e:
+            logger.warning(f"No se pudo usar el backend {backend}, se usará torch: {str(e)}")
+
+    return YOLO(model_path).to(device), "torch"
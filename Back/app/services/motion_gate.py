@@ -0,0 +1,88 @@
+# app/services/motion_gate.py
+import time
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Compuerta de movimiento barata previa a YOLO: compara una versión reducida y
+    en escala de grises del frame con la del último frame inferido. Si la fracción
+    de píxeles que cambió no supera el umbral, se reutilizan las detecciones
+    anteriores. Cada `force_interval` segundos se infiere igualmente para no perder
+    a una persona que yace inmóvil.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.01,
+        pixel_delta: int = 25,
+        force_interval: float = 2.0,
+        downscale_width: int = 160,
+        enabled: bool = True,
+    ):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.force_interval = force_interval
+        self.downscale_width = downscale_width
+        self.enabled = enabled
+        self._reference: Optional[np.ndarray] = None
+        self._small: Optional[np.ndarray] = None
+        self._last_inference = 0.0
+
+        # Métricas
+        self.inferred = 0
+        self.gated = 0
+        self.forced = 0
+
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (self.downscale_width, max(1, height * self.downscale_width // width))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        self._small = cv2.resize(gray, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(self._small, (5, 5), 0)
+
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """Decide si el frame necesita una nueva inferencia"""
+        if not self.enabled:
+            self.inferred += 1
+            return True
+
+        now = time.monotonic() if now is None else now
+        small = self._downscale(frame)
+
+        if self._reference is None or self._reference.shape != small.shape:
+            return self._accept(small, now)
+
+        if now - self._last_inference >= self.force_interval:
+            self.forced += 1
+            return self._accept(small, now)
+
+        diff = cv2.absdiff(small, self._reference)
+        changed = np.count_nonzero(diff > self.pixel_delta) / diff.size
+        if changed > self.threshold:
+            return self._accept(small, now)
+
+        self.gated += 1
+        return False
+
+    def _accept(self, small: np.ndarray, now: float) -> bool:
+        self._reference = small
+        self._last_inference = now
+        self.inferred += 1
+        return True
+
+    def reset(self):
+        self._reference = None
+        self._last_inference = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.inferred + self.gated
+        return {
+            'inferred': self.inferred,
+            'gated': self.gated,
+            'forced': self.forced,
+            'gated_ratio': self.gated / total if total else 0.0,
+        }
@@ -1,11 +1,54 @@
 # app/services/notification_listener.py
 
-from firebase_admin import db
 import asyncio
-from typing import Callable, Dict, List
+import json
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
 import logging
 from datetime import datetime
 from fastapi import WebSocket
+from app.core.config import settings
+from app.core.event_bus import EventBus, NOTIFICATIONS_TOPIC
+from app.services.firebase_service import FirebaseService
+
+
+class ClientOutbox:
+    """Cola de salida acotada de un cliente, vaciada por su propia tarea de envío"""
+
+    def __init__(self, websocket: WebSocket, on_evict: Callable[[WebSocket, str], None]):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.NOTIFICATION_OUTBOX_SIZE)
+        self.on_evict = on_evict
+        self.task: Optional[asyncio.Task] = asyncio.create_task(self._sender())
+
+    def offer(self, message: str) -> bool:
+        """Encola un mensaje ya serializado; False si el cliente va demasiado atrasado"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _sender(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(message),
+                    timeout=settings.NOTIFICATION_SEND_TIMEOUT_S
+                )
+            except asyncio.TimeoutError:
+                self.on_evict(self.websocket, "tiempo de envío agotado")
+                return
+            except Exception as e:
+                self.on_evict(self.websocket, f"error al enviar: {str(e)}")
+                return
+
+    def close(self):
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+        self.task = None
+
 
 class NotificationListener:
     _instance = None
@@ -21,68 +64,94 @@ class NotificationListener:
             return
             
         self.logger = logging.getLogger(__name__)
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, ClientOutbox] = {}
         self.stream = None
+        self._unsubscribe_local = None
+        # Ids ya entregados: evita reenviar las notificaciones locales cuando vuelven del almacenamiento
+        self._delivered_ids: "OrderedDict[str, None]" = OrderedDict()
         self._initialized = True
         self.loop = None
 
     async def connect(self, websocket: WebSocket):
         """Conecta un nuevo cliente WebSocket"""
         await websocket.accept()
-        self.active_connections.append(websocket)
-        self.logger.info(f"Nuevo cliente conectado. Total: {len(self.active_connections)}")
+        self.clients[websocket] = ClientOutbox(websocket, self._evict)
+        self.logger.info(f"Nuevo cliente conectado. Total: {len(self.clients)}")
 
     def disconnect(self, websocket: WebSocket):
         """Desconecta un cliente WebSocket"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        self.logger.info(f"Cliente desconectado. Total: {len(self.active_connections)}")
+        outbox = self.clients.pop(websocket, None)
+        if outbox:
+            outbox.close()
+        self.logger.info(f"Cliente desconectado. Total: {len(self.clients)}")
+
+    def _evict(self, websocket: WebSocket, reason: str):
+        """Expulsa a un cliente lento o caído para que no retrase a los demás"""
+        if websocket not in self.clients:
+            return
+        self.logger.warning(f"Cliente expulsado ({reason})")
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_quietly(websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
 
     def start_listening(self):
-        """Inicia la escucha de nuevas notificaciones"""
+        """
+        Inicia la escucha de nuevas notificaciones: las de este proceso llegan por el
+        bus de eventos en memoria y las de otros nodos por el listener del almacenamiento
+        """
         try:
             self.loop = asyncio.get_event_loop()
-            notifications_ref = db.reference('notifications')
+            store = FirebaseService().store
+            if store is None:
+                raise Exception("El almacenamiento no ha sido inicializado")
+
+            self._unsubscribe_local = EventBus().subscribe(NOTIFICATIONS_TOPIC, self._deliver)
             
-            def on_notification(event):
-                if event.event_type == 'put' and event.data:
-                    notification_data = {
-                        'id': event.path[1:],  # Elimina el '/' inicial
-                        'data': event.data,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    self.loop.call_soon_threadsafe(
-                        lambda: self.loop.create_task(
-                            self._broadcast_notification(notification_data)
-                        )
-                    )
-                
-
-            self.stream = notifications_ref.listen(on_notification)
+            def on_notification(notification_id, data):
+                self.loop.call_soon_threadsafe(self._deliver, notification_id, data)
+
+            self.stream = store.listen_notifications(on_notification)
             self.logger.info("Listener de notificaciones iniciado")
             
         except Exception as e:
             self.logger.error(f"Error al iniciar listener: {str(e)}")
             raise
 
-    async def _broadcast_notification(self, notification: Dict):
-        """Envía la notificación a todos los clientes conectados"""
-        disconnected_clients = []
-        
-        for websocket in self.active_connections:
-            try:
-                await websocket.send_json(notification)
-                self.logger.debug(f"Notificación enviada: {notification}")
-            except Exception as e:
-                self.logger.error(f"Error al enviar notificación: {str(e)}")
-                disconnected_clients.append(websocket)
+    def _deliver(self, notification_id: str, data):
+        """Entrega una notificación una única vez, venga del bus local o del almacenamiento"""
+        if notification_id:
+            if notification_id in self._delivered_ids:
+                return
+            self._delivered_ids[notification_id] = None
+            if len(self._delivered_ids) > settings.NOTIFICATION_DEDUP_SIZE:
+                self._delivered_ids.popitem(last=False)
+
+        self._broadcast_notification({
+            'id': notification_id,
+            'data': data,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    def _broadcast_notification(self, notification: Dict):
+        """Serializa la notificación una sola vez y la encola para cada cliente conectado"""
+        message = json.dumps(notification, separators=(",", ":"), ensure_ascii=False)
 
-        # Limpia las conexiones cerradas
-        for websocket in disconnected_clients:
-            self.disconnect(websocket)
+        for websocket, outbox in list(self.clients.items()):
+            if not outbox.offer(message):
+                self._evict(websocket, "cola de salida llena")
+        self.logger.debug(f"Notificación difundida a {len(self.clients)} clientes: {notification}")
 
     def stop_listening(self):
         """Detiene el listener de notificaciones"""
+        if self._unsubscribe_local:
+            self._unsubscribe_local()
+            self._unsubscribe_local = None
         if self.stream:
             self.stream.close()
             self.logger.info("Listener de notificaciones detenido")
@@ -0,0 +1,417 @@
+# app/services/stream_pipeline.py
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.adaptive_quality import AdaptiveQuality, QualityLevel
+from app.core.broadcast import BroadcastHub, Subscription
+from app.core.config import settings
+from app.core.shared_frames import SharedFrame
+from app.core.metrics import PIPELINE_STAGE_SECONDS, FRAMES_DROPPED
+from app.models.detections import Detections, CLASS_FALL, CLASS_LABELS
+from app.services.clip_recorder import ClipRecorder
+from app.services.inference_executor import InferenceDropped
+from app.services.motion_gate import MotionGate
+
+# Modos de stream: frames anotados en el servidor o metadatos para dibujar en el cliente
+STREAM_MODES = ("annotated", "overlay")
+
+
+class StreamPipeline:
+    """
+    Etapa compartida del stream de una cámara: detecta, anota y codifica cada frame
+    una sola vez y publica el resultado en un BroadcastHub para todos sus visores.
+
+    Los visores en modo overlay reciben por `overlay_hub` tuplas (mensaje JSON, JPEG crudo
+    o None): el frame sin anotar solo se codifica cada STREAM_OVERLAY_FRAME_INTERVAL mensajes
+    (y nunca si todos usan `frames=0`). Sin visores anotados no se dibuja ni se codifica nada
+    más: los clips guardan el JPEG del frame crudo.
+
+    Los visores anotados reciben el nivel de calidad que les asigna su AdaptiveQuality:
+    cada variante (calidad/escala) se codifica una vez por frame para todos los que la comparten,
+    y a un visor con FPS limitado simplemente no se le entregan los frames intermedios.
+    """
+
+    def __init__(self, camera_manager, yolo_service, firebase_service, batch_scheduler=None, worker_pool=None):
+        self.camera_manager = camera_manager
+        self.yolo_service = yolo_service
+        self.batch_scheduler = batch_scheduler
+        # Con un pool de procesos el lienzo vive en memoria compartida y se infiere fuera de este proceso
+        self.worker_pool = worker_pool
+        self._shared_frame = SharedFrame() if worker_pool else None
+        self.firebase_service = firebase_service
+        self.hub = BroadcastHub()
+        self.quality_levels = QualityLevel.parse_levels(settings.STREAM_QUALITY_LEVELS)
+        self.overlay_hub = BroadcastHub()
+        self._overlay_messages = 0
+        self._keyframe_due = True
+        self.task: Optional[asyncio.Task] = None
+        self.last_sequence = 0
+        self.motion_gate = MotionGate(
+            threshold=settings.MOTION_THRESHOLD,
+            pixel_delta=settings.MOTION_PIXEL_DELTA,
+            force_interval=settings.MOTION_FORCE_INTERVAL_S,
+            downscale_width=settings.MOTION_DOWNSCALE_WIDTH,
+            enabled=settings.MOTION_GATE_ENABLED,
+        )
+        self.last_detections = Detections.empty()
+        self.clip_recorder = ClipRecorder(
+            camera_manager.camera_id,
+            settings.CLIP_DIR,
+            pre_seconds=settings.CLIP_PRE_SECONDS,
+            post_seconds=settings.CLIP_POST_SECONDS,
+            max_bytes=settings.CLIP_MAX_BYTES,
+            enabled=settings.CLIP_ENABLED,
+            fps=settings.CLIP_FPS,
+        )
+        self._canvas: Optional[np.ndarray] = None
+        self._imgsz_warned = False
+        self.logger = logging.getLogger(__name__)
+
+        camera_id = camera_manager.camera_id
+        self.stages = {
+            stage: PIPELINE_STAGE_SECONDS.labels(camera_id, stage)
+            for stage in ("copy", "motion", "inference", "extract", "draw", "encode", "raw_encode", "overlay")
+        }
+        self.dropped_inference = FRAMES_DROPPED.labels(camera_id, "inference")
+
+    @property
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @property
+    def viewers(self) -> int:
+        return len(self.hub) + len(self.overlay_hub)
+
+    @property
+    def dropped(self) -> int:
+        return self.hub.dropped + self.overlay_hub.dropped
+
+    def subscribe(self, mode: str = "annotated", quality: Optional[AdaptiveQuality] = None,
+                  options=None) -> Subscription:
+        """
+        Suscribe un visor al modo indicado; en overlay el siguiente mensaje lleva frame crudo
+        si las `options` del visor (con atributo `frames`) lo piden.
+        Los visores anotados sin control de calidad reciben siempre el mejor nivel
+        """
+        if mode == "overlay":
+            self._keyframe_due = True
+            return self.overlay_hub.subscribe(state=options)
+        return self.hub.subscribe(state=quality)
+
+    def new_viewer_quality(self) -> AdaptiveQuality:
+        """Control de calidad para un visor nuevo, según la configuración"""
+        return AdaptiveQuality(
+            self.quality_levels,
+            window=settings.STREAM_QUALITY_WINDOW_S,
+            busy_high=settings.STREAM_BUSY_HIGH,
+            busy_low=settings.STREAM_BUSY_LOW,
+            upgrade_after=settings.STREAM_UPGRADE_AFTER_S,
+            enabled=settings.STREAM_ADAPTIVE_QUALITY,
+        )
+
+    def viewer_levels(self) -> Dict[int, int]:
+        """Visores anotados por nivel de calidad"""
+        levels: Dict[int, int] = {}
+        for subscription in self.hub.subscribers:
+            level = subscription.state.level if subscription.state else 0
+            levels[level] = levels.get(level, 0) + 1
+        return levels
+
+    def request_keyframe(self):
+        """El próximo mensaje overlay lleva el frame crudo"""
+        self._keyframe_due = True
+
+    def unsubscribe(self, subscription):
+        self.hub.unsubscribe(subscription)
+        self.overlay_hub.unsubscribe(subscription)
+
+    def start(self):
+        """Inicia el procesamiento compartido si aún no está en marcha"""
+        if self.is_running:
+            return
+        self.task = asyncio.create_task(self._run())
+        self.logger.info(f"Pipeline de stream iniciado: {self.camera_manager.camera_id}")
+
+    async def stop(self):
+        """Detiene el procesamiento compartido"""
+        if not self.task:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self.motion_gate.reset()
+        self.last_detections = Detections.empty()
+        self._overlay_messages = 0
+        self._keyframe_due = True
+        self.clip_recorder.flush()
+        if self._shared_frame:
+            self._canvas = None
+            self._shared_frame.close()
+        self.logger.info(f"Pipeline de stream detenido: {self.camera_manager.camera_id}")
+
+    async def _run(self):
+        """Bucle principal: un único consumidor de frames por cámara"""
+        while True:
+            try:
+                packet = await self.camera_manager.get_frame(self.last_sequence)
+                if packet is None or packet.sequence <= self.last_sequence:
+                    await asyncio.sleep(0.01)
+                    continue
+                self.last_sequence = packet.sequence
+
+                started = time.perf_counter()
+                frame = self._copy_to_canvas(packet.image)
+                self.stages["copy"].observe(time.perf_counter() - started)
+
+                # Los clips y el frame crudo de los visores overlay comparten el JPEG del paquete;
+                # se codifica desde el lienzo, antes de dibujar, y no desde el slot del anillo.
+                # Los clips guardan como mucho CLIP_FPS frames por segundo
+                keyframe = self._keyframe_wanted()
+                clip_frame = self.clip_recorder.wants_frame(packet.timestamp)
+                raw_jpeg = None
+                if keyframe or clip_frame:
+                    started = time.perf_counter()
+                    raw_jpeg = packet.jpeg(frame)
+                    self.stages["raw_encode"].observe(time.perf_counter() - started)
+
+                variants = await self._process_frame(
+                    frame, packet.sequence, packet.timestamp, raw_jpeg if keyframe else None
+                )
+                if variants:
+                    self.hub.publish(variants, select=_select_variant)
+                if clip_frame:
+                    self.clip_recorder.add_frame(raw_jpeg, packet.timestamp)
+                # Si ya hay otro frame listo, get_frame no espera: se cede el turno para que
+                # los visores envíen lo publicado antes de procesar el siguiente
+                await asyncio.sleep(0)
+
+            except asyncio.CancelledError:
+                raise
+            except InferenceDropped as e:
+                # El modelo va atrasado: se salta este frame y se fuerza inferir el siguiente
+                self.logger.debug(str(e))
+                self.dropped_inference.inc()
+                self.motion_gate.reset()
+            except Exception as e:
+                self.logger.error(f"Error en pipeline de stream: {str(e)}")
+                await asyncio.sleep(0.01)
+
+    def _copy_to_canvas(self, image: np.ndarray) -> np.ndarray:
+        """
+        Copia el frame crudo a un lienzo propio y reutilizable: el slot del anillo
+        puede ser sobrescrito por la captura mientras se infiere y se dibuja
+        """
+        if self._canvas is None or self._canvas.shape != image.shape:
+            if self._shared_frame:
+                self._canvas = None
+                self._canvas = self._shared_frame.array(image.shape)
+            else:
+                self._canvas = np.empty_like(image)
+        np.copyto(self._canvas, image)
+        return self._canvas
+
+    def _inference_imgsz(self) -> Optional[int]:
+        """Tamaño de entrada propio de la cámara, si el backend cargado lo admite"""
+        imgsz = self.camera_manager.imgsz
+        if not imgsz or imgsz == settings.MODEL_IMGSZ:
+            return None
+        inference = self.worker_pool or self.yolo_service
+        if not inference.supports_imgsz(imgsz):
+            if not self._imgsz_warned:
+                self.logger.warning(
+                    f"El backend {inference.backend} no admite imgsz={imgsz} "
+                    f"({self.camera_manager.camera_id}); se usa MODEL_IMGSZ={settings.MODEL_IMGSZ}"
+                )
+                self._imgsz_warned = True
+            return None
+        return imgsz
+
+    async def _process_frame(self, frame, sequence: int = 0, timestamp: Optional[float] = None,
+                             keyframe: Optional[bytes] = None) -> Optional[Dict[int, bytes]]:
+        """
+        Ejecuta YOLO, guarda caídas, publica los metadatos para los visores overlay y,
+        si algún visor usa el frame anotado, dibuja las detecciones y codifica
+        las variantes pedidas: {nivel de calidad: JPEG}
+        """
+        stages = self.stages
+        # Solo se analiza (movimiento e inferencia) el rectángulo que envuelve las zonas de interés
+        roi = self.camera_manager.roi
+        source, offset = roi.crop(frame) if roi else (frame, (0, 0))
+
+        started = time.perf_counter()
+        should_infer = self.motion_gate.should_infer(source)
+        stages["motion"].observe(time.perf_counter() - started)
+
+        if should_infer:
+            camera_id = self.camera_manager.camera_id
+            imgsz = self._inference_imgsz()
+            started = time.perf_counter()
+            if self.worker_pool:
+                # Solo viaja la referencia al lienzo compartido y el recorte de la ROI
+                crop = roi.bounds(frame.shape) if roi else None
+                results = await self.worker_pool.detect(
+                    self._shared_frame.ref(frame.shape, crop), key=camera_id, imgsz=imgsz
+                )
+            elif imgsz:
+                # Un lote comparte el tamaño de entrada: esta cámara se infiere aparte
+                results = await self.yolo_service.detect(source, key=camera_id, imgsz=imgsz)
+            else:
+                # Con varias cámaras activas la inferencia se agrupa en lotes
+                detector = self.batch_scheduler or self.yolo_service
+                results = await detector.detect(source, key=camera_id)
+            stages["inference"].observe(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            detections = self.yolo_service.get_detections(results)
+            if roi:
+                detections = roi.to_frame(detections, offset, frame.shape)
+            self.last_detections = detections
+            stages["extract"].observe(time.perf_counter() - started)
+            await self._save_falls(self.last_detections)
+
+        if self.overlay_hub:
+            started = time.perf_counter()
+            self.overlay_hub.publish(self._overlay_message(frame, sequence, timestamp, keyframe))
+            stages["overlay"].observe(time.perf_counter() - started)
+
+        levels = self._wanted_levels()
+        if not levels:
+            return None
+
+        # Sin cambios en la escena se redibujan las últimas detecciones
+        started = time.perf_counter()
+        draw_detections(frame, self.last_detections)
+        stages["draw"].observe(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        variants = encode_variants(frame, self.quality_levels, levels)
+        stages["encode"].observe(time.perf_counter() - started)
+        return variants
+
+    def _wanted_levels(self) -> Set[int]:
+        """Niveles que algún visor anotado va a recibir en este frame"""
+        now = time.monotonic()
+        levels = set()
+        for subscription in self.hub.subscribers:
+            quality = subscription.state
+            if quality is None:
+                levels.add(0)
+            elif quality.ready(now):
+                levels.add(quality.level)
+        return levels
+
+    def _keyframe_wanted(self) -> bool:
+        """Si el próximo mensaje overlay debe llevar el frame crudo"""
+        interval = settings.STREAM_OVERLAY_FRAME_INTERVAL
+        return bool(self.overlay_hub) and interval > 0 and self._overlay_wants_frames() and (
+            self._keyframe_due or self._overlay_messages % interval == 0
+        )
+
+    def _overlay_message(self, frame, sequence: int, timestamp: Optional[float],
+                         keyframe: Optional[bytes] = None) -> Tuple[str, Optional[bytes]]:
+        """Mensaje compacto de detecciones, acompañado cada N mensajes del JPEG crudo del frame"""
+        if keyframe is not None:
+            self._keyframe_due = False
+        self._overlay_messages += 1
+
+        height, width = frame.shape[:2]
+        message = {
+            'seq': sequence,
+            'ts': round(timestamp if timestamp is not None else time.time(), 3),
+            'w': width,
+            'h': height,
+            **self.last_detections.to_overlay(),
+        }
+        return json.dumps(message, separators=(",", ":")), keyframe
+
+    def _overlay_wants_frames(self) -> bool:
+        """Si algún visor overlay recibe frames crudos (`frames=0` los desactiva)"""
+        return any(
+            subscription.state is None or subscription.state.frames
+            for subscription in self.overlay_hub.subscribers
+        )
+
+    async def _save_falls(self, detections: Detections):
+        """Guarda las caídas que superan el umbral y envía la notificación"""
+        falls = detections.filter(classes=(CLASS_FALL,), min_conf=settings.DETECTION_THRESHOLD)
+        camera_id = self.camera_manager.camera_id
+        for bbox, confidence, class_id in zip(falls.xyxy.tolist(), falls.conf.tolist(), falls.cls.tolist()):
+            # En cooldown la detección se descartaría: no se reserva clip ni se intenta guardar
+            if self.firebase_service.in_cooldown(camera_id):
+                return
+            detection_data = {
+                'confidence': confidence,
+                'class_id': class_id,
+                'bbox': bbox,
+                'location': self.camera_manager.location,
+                'camera_id': camera_id,
+            }
+            clip_path = self.clip_recorder.reserve_path()
+            if clip_path:
+                detection_data['clip'] = clip_path
+
+            # Intentar enviar notificación; el clip solo se graba si la detección se guardó
+            if await self.firebase_service.save_detection(detection_data):
+                self.clip_recorder.start_clip(clip_path)
+
+
+def _select_variant(subscription: Subscription, variants: Dict[int, bytes]) -> Optional[bytes]:
+    """Variante que le corresponde a un visor; None si su límite de FPS no le deja recibirla"""
+    quality = subscription.state
+    if quality is None:
+        return variants.get(0)
+    now = time.monotonic()
+    encoded = variants.get(quality.level)
+    if encoded is None or not quality.ready(now):
+        return None
+    quality.offered(now)
+    return encoded
+
+
+def encode_variants(frame: np.ndarray, quality_levels, levels: Set[int]) -> Dict[int, bytes]:
+    """
+    Codifica cada variante pedida una sola vez: los niveles que solo difieren en FPS
+    comparten el JPEG y los de igual escala comparten el redimensionado
+    """
+    resized: Dict[float, np.ndarray] = {}
+    encoded: Dict[Tuple[float, int], bytes] = {}
+    variants = {}
+    for index in sorted(levels):
+        level = quality_levels[index]
+        key = (level.scale, level.quality)
+        if key not in encoded:
+            image = resized.get(level.scale)
+            if image is None:
+                image = frame if level.scale == 1.0 else cv2.resize(
+                    frame, None, fx=level.scale, fy=level.scale, interpolation=cv2.INTER_AREA
+                )
+                resized[level.scale] = image
+            _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, level.quality])
+            encoded[key] = buffer.tobytes()
+        variants[index] = encoded[key]
+    return variants
+
+
+def draw_detections(frame: np.ndarray, detections: Detections):
+    """Dibuja las cajas sobre el frame: caídas en rojo y personas en verde"""
+    if not len(detections):
+        return
+    for (x1, y1, x2, y2), confidence, class_id in zip(
+        detections.xyxy.astype(np.int32).tolist(),
+        detections.conf.tolist(),
+        detections.cls.tolist(),
+    ):
+        color = (0, 0, 255) if class_id == CLASS_FALL else (0, 255, 0)
+        label = CLASS_LABELS.get(class_id, str(class_id))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{label}:{confidence:.2f}",
+                (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
@@ -0,0 +1,350 @@
+# app/services/video_analysis.py
+"""
+Análisis por lotes de video grabado.
+
+Divide cada video en tramos de tiempo que se procesan en paralelo en un pool de
+procesos; cada proceso carga el modelo una sola vez, decodifica su tramo de forma
+secuencial y escribe las detecciones en JSONL con el número de frame y su
+instante. Al final los tramos se unen por video y se genera un `detections.json`
+con el mismo esquema que FirebaseService (el de `TabulationData/detecciones.json`).
+
+Uso (desde Back/):
+    python -m app.services.video_analysis grabacion.mp4 --output-dir analisis --workers 8
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import cv2
+
+from app.core.config import settings
+from app.models.detections import Detections, CLASS_FALL
+from app.utils.push_id import generate_push_id
+
+logger = logging.getLogger(__name__)
+
+
+class VideoChunk(NamedTuple):
+    """Tramo [start_frame, end_frame) de un video"""
+    path: str
+    index: int
+    start_frame: int
+    end_frame: int
+    fps: float
+
+
+class ChunkResult(NamedTuple):
+    chunk: VideoChunk
+    output_path: str
+    frames_decoded: int
+    frames_analyzed: int
+    detections: int
+    seconds: float
+
+
+def plan_chunks(path: str, chunk_seconds: float) -> List[VideoChunk]:
+    """Divide el video en tramos de `chunk_seconds` segundos"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"No se pudo abrir el video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames <= 0:
+        raise RuntimeError(f"No se pudo determinar la duración del video: {path}")
+
+    frames_per_chunk = max(int(chunk_seconds * fps), 1)
+    return [
+        VideoChunk(path, index, start, min(start + frames_per_chunk, total_frames), fps)
+        for index, start in enumerate(range(0, total_frames, frames_per_chunk))
+    ]
+
+
+# Estado por proceso del pool: el modelo se carga una sola vez en el initializer
+_worker_model = None
+_worker_device = None
+
+
+def _init_worker(model_path: str, device: str, backend: str, imgsz: int, precision: str = "fp32"):
+    global _worker_model, _worker_device
+    from app.services import model_backends
+
+    # Un hilo de OpenCV por proceso: el paralelismo lo da el pool
+    cv2.setNumThreads(1)
+    _worker_device = model_backends.resolve_device(device)
+    selected = model_backends.select_backend(backend, _worker_device, precision)
+    _worker_model, _ = model_backends.load_model(model_path, _worker_device, selected, imgsz, precision)
+
+
+def _predict(frames: List) -> List[Detections]:
+    results = _worker_model(frames, verbose=False, device=_worker_device, imgsz=settings.MODEL_IMGSZ)
+    detections = []
+    for result in results:
+        data = result.boxes.data
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        detections.append(Detections.from_array(data))
+    return detections
+
+
+def seek_frame(cap, target: int) -> int:
+    """
+    Posiciona `cap` para que el próximo read() devuelva el frame `target` y devuelve
+    la posición real. Según el códec el seek puede caer en otro keyframe: se lee la
+    posición resultante y se avanza con grab() hasta el frame pedido (desde el
+    inicio si quedó más adelante). Solo es menor que `target` si el video se acaba antes
+    """
+    if target <= 0:
+        return 0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if not 0 <= position <= target:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        position = 0
+    while position < target and cap.grab():
+        position += 1
+    return position
+
+
+def analyze_chunk(
+    chunk: VideoChunk,
+    output_dir: str,
+    stride: int = 1,
+    batch_size: int = 8,
+    min_conf: float = 0.0,
+    classes: Optional[Sequence[int]] = None,
+) -> ChunkResult:
+    """Procesa un tramo en el proceso actual y escribe sus detecciones en JSONL"""
+    started = time.perf_counter()
+    stem = os.path.splitext(os.path.basename(chunk.path))[0]
+    output_path = os.path.join(output_dir, f"{stem}.{chunk.index:05d}.jsonl")
+
+    cap = cv2.VideoCapture(chunk.path)
+    # Los números de frame (y su instante en el video) dependen de que el seek sea exacto
+    position = seek_frame(cap, chunk.start_frame)
+    if position != chunk.start_frame:
+        logger.warning(f"{chunk.path}: el video termina antes del frame {chunk.start_frame}")
+    frames_decoded = frames_analyzed = detections_written = 0
+    batch_frames, batch_numbers = [], []
+
+    with open(output_path, "w", encoding="utf-8") as output:
+        def flush():
+            nonlocal detections_written
+            for number, detections in zip(batch_numbers, _predict(batch_frames)):
+                detections = detections.filter(classes=classes, min_conf=min_conf)
+                for row in detections.to_dicts():
+                    output.write(json.dumps({
+                        'video': chunk.path,
+                        'frame': number,
+                        'video_time': round(number / chunk.fps, 3),
+                        'class_id': row['class'],
+                        'confidence': row['conf'],
+                        'bbox': row['bbox'],
+                    }) + "\n")
+                    detections_written += 1
+            batch_frames.clear()
+            batch_numbers.clear()
+
+        for number in range(position, chunk.end_frame):
+            # Los frames que no se analizan se avanzan con grab(): la mayoría de códecs igual
+            # los decodifica, pero se evita convertirlos a BGR y copiarlos
+            if (number - chunk.start_frame) % stride:
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames_decoded += 1
+            batch_frames.append(frame)
+            batch_numbers.append(number)
+            if len(batch_frames) >= batch_size:
+                frames_analyzed += len(batch_frames)
+                flush()
+
+        if batch_frames:
+            frames_analyzed += len(batch_frames)
+            flush()
+
+    cap.release()
+    return ChunkResult(
+        chunk, output_path, frames_decoded, frames_analyzed, detections_written,
+        time.perf_counter() - started
+    )
+
+
+def estimate_start_time(path: str, duration_s: float) -> datetime:
+    """Inicio aproximado de la grabación: la fecha de modificación suele marcar el final"""
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration_s)
+
+
+def to_detection_record(row: Dict[str, Any], start_time: datetime, location: str) -> Dict[str, Any]:
+    """Convierte una fila JSONL al esquema de detección de FirebaseService"""
+    return {
+        'confidence': row['confidence'],
+        'class_id': row['class_id'],
+        'bbox': row['bbox'],
+        'location': location,
+        'timestamp': (start_time + timedelta(seconds=row['video_time'])).isoformat(),
+        'status': 'pending',
+        'video': row['video'],
+        'frame': row['frame'],
+    }
+
+
+def merge_detections(
+    rows: Iterable[Dict[str, Any]],
+    start_time: datetime,
+    location: str,
+    cooldown_s: float,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Une las filas de un video en registros de detección. Como en vivo, tras una
+    caída registrada se ignoran las siguientes durante `cooldown_s` segundos.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    last_time = None
+    for row in rows:
+        if last_time is not None and row['video_time'] - last_time < cooldown_s:
+            continue
+        last_time = row['video_time']
+        merged[generate_push_id()] = to_detection_record(row, start_time, location)
+    return merged
+
+
+def _merge_chunks(video: str, results: List[ChunkResult], output_dir: str) -> str:
+    stem = os.path.splitext(os.path.basename(video))[0]
+    merged_path = os.path.join(output_dir, f"{stem}.jsonl")
+    with open(merged_path, "w", encoding="utf-8") as merged:
+        for result in sorted(results, key=lambda r: r.chunk.index):
+            with open(result.output_path, encoding="utf-8") as part:
+                for line in part:
+                    merged.write(line)
+            os.remove(result.output_path)
+    return merged_path
+
+
+def analyze_videos(
+    paths: Sequence[str],
+    output_dir: str,
+    workers: Optional[int] = None,
+    chunk_seconds: float = 60.0,
+    stride: int = 1,
+    batch_size: int = 8,
+    min_conf: float = settings.DETECTION_THRESHOLD,
+    classes: Optional[Sequence[int]] = (CLASS_FALL,),
+    location: str = "Análisis offline",
+    cooldown_s: float = settings.NOTIFICATION_COOLDOWN,
+    start_time: Optional[datetime] = None,
+    model_path: str = settings.MODEL_PATH,
+) -> Dict[str, Any]:
+    """Analiza los videos en paralelo y devuelve un resumen con las rutas generadas"""
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    chunks = [chunk for path in paths for chunk in plan_chunks(path, chunk_seconds)]
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Analizando {len(paths)} videos en {len(chunks)} tramos con {workers} procesos")
+
+    results: Dict[str, List[ChunkResult]] = {path: [] for path in paths}
+    # spawn: el endpoint crea el pool desde un proceso con hilos (uvicorn, captura, torch)
+    # y un fork desde ahí puede dejar a los hijos bloqueados
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_path, settings.INFERENCE_DEVICE, settings.MODEL_BACKEND,
+                  settings.MODEL_IMGSZ, settings.MODEL_PRECISION),
+    ) as pool:
+        futures = [
+            pool.submit(analyze_chunk, chunk, output_dir, stride, batch_size, min_conf, classes)
+            for chunk in chunks
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[result.chunk.path].append(result)
+            logger.info(
+                f"Tramo {done}/{len(chunks)} listo: {os.path.basename(result.chunk.path)} "
+                f"#{result.chunk.index} ({result.frames_analyzed} frames en {result.seconds:.1f} s)"
+            )
+
+    detections: Dict[str, Dict[str, Any]] = {}
+    videos = []
+    for path, video_results in results.items():
+        merged_path = _merge_chunks(path, video_results, output_dir)
+        fps = video_results[0].chunk.fps if video_results else 30.0
+        duration = max((r.chunk.end_frame for r in video_results), default=0) / fps
+        video_start = start_time or estimate_start_time(path, duration)
+        with open(merged_path, encoding="utf-8") as merged:
+            detections.update(merge_detections(
+                (json.loads(line) for line in merged), video_start, location, cooldown_s
+            ))
+        videos.append({
+            'video': path,
+            'jsonl': merged_path,
+            'duration_s': round(duration, 1),
+            'frames_analyzed': sum(r.frames_analyzed for r in video_results),
+            'raw_detections': sum(r.detections for r in video_results),
+        })
+
+    detections_path = os.path.join(output_dir, "detections.json")
+    with open(detections_path, "w", encoding="utf-8") as f:
+        json.dump({'detections': detections}, f, indent=2, ensure_ascii=False)
+
+    elapsed = time.perf_counter() - started
+    total_video = sum(video['duration_s'] for video in videos)
+    return {
+        'videos': videos,
+        'detections_json': detections_path,
+        'detections': len(detections),
+        'elapsed_s': round(elapsed, 1),
+        'speedup': round(total_video / elapsed, 1) if elapsed else None,
+        'workers': workers,
+        'chunks': len(chunks),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis offline de video en paralelo")
+    parser.add_argument("videos", nargs="+", help="Archivos de video a analizar")
+    parser.add_argument("--output-dir", default="analisis", help="Carpeta de salida")
+    parser.add_argument("--workers", type=int, help="Procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0, help="Duración de cada tramo")
+    parser.add_argument("--stride", type=int, default=1, help="Analizar uno de cada N frames")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames por pasada del modelo")
+    parser.add_argument("--min-conf", type=float, default=settings.DETECTION_THRESHOLD)
+    parser.add_argument("--all-classes", action="store_true", help="Guardar también las personas, no solo caídas")
+    parser.add_argument("--location", default="Análisis offline", help="Ubicación de las detecciones")
+    parser.add_argument("--cooldown", type=float, default=settings.NOTIFICATION_COOLDOWN,
+                        help="Segundos entre detecciones registradas en detections.json")
+    parser.add_argument("--start-time", type=datetime.fromisoformat,
+                        help="Inicio de la grabación (ISO 8601); por defecto se estima por la fecha del archivo")
+    parser.add_argument("--model", default=settings.MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    summary = analyze_videos(
+        args.videos,
+        args.output_dir,
+        workers=args.workers,
+        chunk_seconds=args.chunk_seconds,
+        stride=max(args.stride, 1),
+        batch_size=max(args.batch_size, 1),
+        min_conf=args.min_conf,
+        classes=None if args.all_classes else (CLASS_FALL,),
+        location=args.location,
+        cooldown_s=args.cooldown,
+        start_time=args.start_time,
+        model_path=args.model,
+    )
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
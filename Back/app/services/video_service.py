@@ -1,33 +1,46 @@
 # app/services/video_service.py
-from app.core.camera_manager import CameraManager
+from app.core.camera_manager import CameraManager, CameraRegistry
 from fastapi import WebSocket
+from typing import Dict, Optional, Set
 import logging
 
 class VideoService:
     def __init__(self):
-        self.camera_manager = CameraManager()
-        self.connections = set()
+        self.camera_registry = CameraRegistry()
+        self.connections: Dict[str, Set[WebSocket]] = {}
         self.logger = logging.getLogger(__name__)
 
-    async def initialize_camera(self, camera_url: str) -> bool:
+    def get_camera(self, camera_id: str) -> Optional[CameraManager]:
+        return self.camera_registry.get(camera_id)
+
+    async def initialize_camera(self, camera_id: str) -> bool:
+        camera_manager = self.get_camera(camera_id)
+        if camera_manager is None:
+            self.logger.error(f"Cámara desconocida: {camera_id}")
+            return False
         try:
-            await self.camera_manager.start(camera_url)
+            await camera_manager.start()
             return True
         except Exception as e:
-            self.logger.error(f"Error al inicializar cámara: {str(e)}")
+            self.logger.error(f"Error al inicializar cámara {camera_id}: {str(e)}")
             return False
 
-    async def get_frame(self):
-        return await self.camera_manager.get_frame()
+    async def get_frame(self, camera_id: str, after: int = 0):
+        return await self.camera_registry.get(camera_id).get_frame(after)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, camera_id: str):
         await websocket.accept()
-        self.connections.add(websocket)
-        self.logger.info("Nuevo cliente WebSocket conectado")
+        self.connections.setdefault(camera_id, set()).add(websocket)
+        self.logger.info(f"Nuevo cliente WebSocket conectado a cámara {camera_id}")
+
+    async def disconnect(self, websocket: WebSocket, camera_id: str):
+        connections = self.connections.get(camera_id, set())
+        connections.discard(websocket)
+        self.logger.info(f"Cliente WebSocket desconectado de cámara {camera_id}")
 
-    def disconnect(self, websocket: WebSocket):
-        self.connections.remove(websocket)
-        self.logger.info("Cliente WebSocket desconectado")
-        
-        if not self.connections:
-            self.camera_manager.stop()
+        if not connections:
+            self.connections.pop(camera_id, None)
+            camera_manager = self.get_camera(camera_id)
+            if camera_manager:
+                # Esperar al hilo de captura puede tardar segundos: no se bloquea el event loop
+                await camera_manager.stop_async()
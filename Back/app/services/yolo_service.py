@@ -1,58 +1,125 @@
 # app/services/yolo_service.py
-from ultralytics import YOLO
+import asyncio
 import os
 import logging
-from typing import List, Dict
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.inference_executor import InferenceExecutor, InferenceDropped
+from app.services import model_backends
+from app.models.detections import Detections
 
 class YoloService:
     def __init__(self):
         self.model = None
         self.initialized = False
+        self.warmed_up = False
+        self.device = None
+        self.backend = None
+        self.executor = InferenceExecutor(settings.INFERENCE_DEADLINE_MS)
+        # Evita cargar el modelo dos veces si el precargado y un visor coinciden
+        self._init_lock = asyncio.Lock()
         self.logger = logging.getLogger(__name__)
 
     async def initialize(self, model_path: str = "best.pt"):
         """Inicializa el modelo YOLO"""
-        if not self.initialized:
+        if self.initialized:
+            return
+        async with self._init_lock:
+            if self.initialized:
+                return
             try:
                 if not os.path.exists(model_path):
                     raise FileNotFoundError(f"Modelo no encontrado en: {model_path}")
                 
-                self.logger.info(f"Cargando modelo desde: {model_path}")
-                self.model = YOLO(model_path).to("cuda:0")
+                self.device = model_backends.resolve_device(settings.INFERENCE_DEVICE)
+                backend = model_backends.select_backend(
+                    settings.MODEL_BACKEND, self.device, settings.MODEL_PRECISION
+                )
+
+                self.logger.info(f"Cargando modelo desde: {model_path} ({backend}, {self.device})")
+                # La exportación/carga es lenta: se hace fuera del event loop
+                self.model, self.backend = await asyncio.to_thread(
+                    model_backends.load_model,
+                    model_path, self.device, backend, settings.MODEL_IMGSZ, settings.MODEL_PRECISION
+                )
                 self.initialized = True
-                self.logger.info("Modelo YOLO inicializado correctamente con gpu")
+                self.logger.info(
+                    f"Modelo YOLO inicializado correctamente con {self.backend} en {self.device}"
+                )
             except Exception as e:
                 self.logger.error(f"Error al inicializar YOLO: {str(e)}")
                 raise Exception(f"Error al inicializar YOLO: {str(e)}")
 
-    async def detect(self, frame):
-        """Realiza la detección en un frame"""
+    async def warmup(self):
+        """
+        Inferencia de prueba con un frame vacío del tamaño de entrada configurado:
+        la primera pasada reserva memoria y compila kernels, y no debe pagarla un visor
+        """
+        if self.warmed_up:
+            return
+        if not self.initialized:
+            raise Exception("YOLO no ha sido inicializado")
+
+        started = time.perf_counter()
+        frame = np.zeros((settings.MODEL_IMGSZ, settings.MODEL_IMGSZ, 3), dtype=np.uint8)
+        await self.executor.run("warmup", self._predict, frame)
+        self.warmed_up = True
+        self.logger.info(f"Modelo precalentado en {time.perf_counter() - started:.2f} s")
+
+    def _predict(self, source, imgsz: Optional[int] = None):
+        """Pasada síncrona del modelo; solo se ejecuta en el hilo de inferencia"""
+        return self.model(source, verbose=False, device=self.device, imgsz=imgsz or settings.MODEL_IMGSZ)
+
+    def supports_imgsz(self, imgsz: int) -> bool:
+        """Los modelos exportados (ONNX/OpenVINO) tienen la entrada fija en MODEL_IMGSZ"""
+        return self.backend == "torch" or imgsz == settings.MODEL_IMGSZ
+
+    async def detect(self, frame, key: str = "default", imgsz: Optional[int] = None):
+        """
+        Realiza la detección en un frame desde el hilo de inferencia.
+        `key` identifica el origen (p. ej. la cámara) para descartar sus frames atrasados;
+        `imgsz` reemplaza el tamaño de entrada por defecto (MODEL_IMGSZ).
+        """
         if not self.initialized:
             raise Exception("YOLO no ha sido inicializado")
         
         try:
-            results = self.model(frame, verbose=False)
+            results = await self.executor.run(key, self._predict, frame, imgsz)
             return results[0]
+        except InferenceDropped:
+            raise
         except Exception as e:
             self.logger.error(f"Error en la detección: {str(e)}")
             raise
 
-    def get_boxes(self, result) -> List[Dict]:
-        """Extrae las cajas delimitadoras de los resultados de YOLO"""
-        boxes = []
+    async def detect_batch(self, frames: Sequence) -> List:
+        """Realiza la detección de varios frames en una sola pasada del modelo"""
+        if not self.initialized:
+            raise Exception("YOLO no ha sido inicializado")
+
         try:
-            for box in result.boxes:
-                # Convertir tensor a lista
-                bbox = box.xyxy[0].tolist()
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                
-                boxes.append({
-                    'bbox': bbox,
-                    'conf': conf,
-                    'class': cls
-                })
-            return boxes
+            results = await self.executor.run("batch", self._predict, list(frames))
+            return list(results)
+        except InferenceDropped:
+            raise
+        except Exception as e:
+            self.logger.error(f"Error en la detección por lotes: {str(e)}")
+            raise
+
+    def get_detections(self, result) -> Detections:
+        """Extrae las detecciones de YOLO con una sola copia dispositivo → host"""
+        if isinstance(result, Detections):
+            # Los procesos de inferencia ya devuelven las detecciones extraídas
+            return result
+        try:
+            data = result.boxes.data
+            if hasattr(data, "cpu"):
+                data = data.cpu().numpy()
+            return Detections.from_array(data)
         except Exception as e:
             self.logger.error(f"Error al procesar boxes: {str(e)}")
-            return []
+            return Detections.empty()
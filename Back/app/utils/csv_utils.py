@@ -1,22 +1,143 @@
 # app/utils/csv_utils.py
 import csv
+import logging
 import os
-from typing import Dict, Any
+import queue
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Sequence
 
-def write_to_csv(data: Dict[str, Any], filename: str = "tiempos.csv"):
+logger = logging.getLogger(__name__)
+
+
+class BufferedCSVWriter:
     """
-    Escribe datos en un archivo CSV. Crea el archivo si no existe.
+    Escritor de registros CSV en segundo plano.
 
-    Args:
-        data: Diccionario con los datos a escribir.  Las claves serán las cabeceras.
-        filename: Nombre del archivo CSV (por defecto, "tiempos.csv").
+    `write` solo encola el registro (nunca hace E/S en el hilo que llama); un hilo
+    propio vacía la cola cada `flush_interval` segundos o al juntar `flush_size`
+    registros. La cabecera es fija (`fieldnames`); si el archivo existente tiene
+    otra cabecera, supera `max_bytes` o es de otro día (con `rotate_daily`), se
+    renombra y se empieza uno nuevo.
     """
-    file_exists = os.path.isfile(filename)
-    fieldnames = list(data.keys())
 
-    with open(filename, 'a', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    def __init__(
+        self,
+        filename: str,
+        fieldnames: Sequence[str],
+        max_queue: int = 10000,
+        flush_interval: float = 2.0,
+        flush_size: int = 500,
+        max_bytes: int = 10 * 1024 * 1024,
+        rotate_daily: bool = False,
+    ):
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file_day: Optional[date] = None
+        self.dropped = 0
+        self.written = 0
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Encola un registro; False si la cola está llena y el registro se descarta"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"csv-writer:{os.path.basename(self.filename)}", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        buffer: List[Dict[str, Any]] = []
+        next_flush = time.monotonic() + self.flush_interval
+        running = True
+
+        while running:
+            try:
+                record = self._queue.get(timeout=max(next_flush - time.monotonic(), 0.0))
+                if record is None:
+                    running = False
+                else:
+                    buffer.append(record)
+            except queue.Empty:
+                pass
+
+            if buffer and (not running or len(buffer) >= self.flush_size or time.monotonic() >= next_flush):
+                self._flush(buffer)
+                buffer = []
+            if time.monotonic() >= next_flush:
+                next_flush = time.monotonic() + self.flush_interval
+
+    def _flush(self, records: List[Dict[str, Any]]):
+        try:
+            self._rotate_if_needed()
+            file_exists = os.path.isfile(self.filename)
+            with open(self.filename, 'a', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames, extrasaction='ignore')
+                if not file_exists:
+                    writer.writeheader()  # Escribe la cabecera solo si el archivo es nuevo
+                writer.writerows(records)
+            self.written += len(records)
+        except Exception as e:
+            logger.error(f"Error al escribir {len(records)} registros en {self.filename}: {str(e)}")
+
+    def _rotate_if_needed(self):
+        if not os.path.isfile(self.filename):
+            self._file_day = date.today()
+            return
+
+        if self._file_day is None:
+            self._file_day = date.fromtimestamp(os.path.getmtime(self.filename))
+
+        reason = None
+        if self._read_header() != self.fieldnames:
+            reason = "cabecera distinta"
+        elif self.max_bytes and os.path.getsize(self.filename) >= self.max_bytes:
+            reason = "tamaño máximo"
+        elif self.rotate_daily and self._file_day != date.today():
+            reason = "cambio de día"
+
+        if reason:
+            stem, ext = os.path.splitext(self.filename)
+            rotated = f"{stem}.{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext}"
+            suffix = 1
+            while os.path.exists(rotated):
+                rotated = f"{stem}.{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}{ext}"
+                suffix += 1
+            os.replace(self.filename, rotated)
+            self._file_day = date.today()
+            logger.info(f"Archivo {self.filename} rotado a {rotated} ({reason})")
+
+    def _read_header(self) -> List[str]:
+        with open(self.filename, newline='') as csvfile:
+            return next(csv.reader(csvfile), [])
 
-        if not file_exists:
-            writer.writeheader()  # Escribe la cabecera solo si el archivo es nuevo
-        writer.writerow(data)
\ No newline at end of file
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo"""
+        if not self._thread or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"No se pudo vaciar la cola de {self.filename} al cerrar")
+            return
+        self._thread.join(timeout)
@@ -0,0 +1,42 @@
+# app/utils/push_id.py
+import random
+import threading
+import time
+
+# Mismo alfabeto y formato que las claves de push() de Firebase: 8 caracteres de
+# marca de tiempo (ms) + 12 aleatorios, ordenables cronológicamente
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+_lock = threading.Lock()
+_last_push_time = 0
+_last_rand_chars = [0] * 12
+
+
+def generate_push_id() -> str:
+    """Genera localmente una clave estilo push() sin ida y vuelta a Firebase"""
+    global _last_push_time
+
+    with _lock:
+        now = int(time.time() * 1000)
+        duplicate_time = now == _last_push_time
+        _last_push_time = now
+
+        time_chars = []
+        for _ in range(8):
+            time_chars.append(PUSH_CHARS[now % 64])
+            now //= 64
+        push_id = "".join(reversed(time_chars))
+
+        if not duplicate_time:
+            for i in range(12):
+                _last_rand_chars[i] = random.randrange(64)
+        else:
+            # Misma milisésima: incrementar para mantener el orden
+            i = 11
+            while i >= 0 and _last_rand_chars[i] == 63:
+                _last_rand_chars[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand_chars[i] += 1
+
+        return push_id + "".join(PUSH_CHARS[c] for c in _last_rand_chars)
@@ -0,0 +1,357 @@
+# benchmarks/quantize.py
+"""
+Variantes INT8 del modelo entrenado y comparación velocidad/precisión.
+
+Exporta `best.pt` a ONNX (fp32, el mismo artefacto que usa MODEL_BACKEND=onnx),
+genera las variantes cuantizadas INT8 dinámica y estática (calibrada con imágenes
+del dataset de `data.yaml`) y mide para cada una mAP50, mAP50-95, precisión y
+recall sobre el split de validación, latencia por frame en CPU y tiempo de carga.
+La variante elegida se activa con MODEL_BACKEND=onnx y MODEL_PRECISION.
+
+Necesita onnx, onnxruntime y el dataset descargado (ver extra.txt).
+
+Uso (desde Back/):
+    python -m benchmarks.quantize --data ../TrainModel/data.yaml --output quantization.json
+    python -m benchmarks.quantize --precisions int8-static --calibration-images 500
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+import yaml
+
+from app.core.config import settings
+from app.services import model_backends
+from benchmarks.replay import IMAGE_EXTENSIONS, SampleRecorder, _git_commit
+
+logger = logging.getLogger("benchmarks.quantize")
+
+DEFAULT_DATA_YAML = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "TrainModel", "data.yaml"
+)
+
+
+def resolve_dataset(data_yaml: str) -> Dict[str, Any]:
+    """
+    Lee `data.yaml` y resuelve las carpetas de cada split. El `path` guardado
+    apunta a la máquina donde se entrenó; si no existe se usa la carpeta del yaml.
+    """
+    with open(data_yaml, encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+
+    root = data.get("path") or ""
+    if not os.path.isdir(root):
+        root = os.path.dirname(os.path.abspath(data_yaml))
+    dataset = {'root': root, 'names': data.get("names", []), 'nc': data.get("nc")}
+    for split in ("train", "val", "test"):
+        if data.get(split):
+            dataset[split] = os.path.join(root, data[split])
+    return dataset
+
+
+def write_local_data_yaml(dataset: Dict[str, Any], output_dir: str) -> str:
+    """Copia de data.yaml con rutas válidas en esta máquina, para la validación de ultralytics"""
+    path = os.path.join(output_dir, "data.local.yaml")
+    content = {'path': dataset['root'], 'nc': dataset['nc'], 'names': dataset['names']}
+    for split in ("train", "val", "test"):
+        if split in dataset:
+            content[split] = os.path.relpath(dataset[split], dataset['root'])
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(content, f, allow_unicode=True)
+    return path
+
+
+def list_images(folder: str, limit: Optional[int] = None) -> List[str]:
+    paths = sorted(
+        path for path in glob.glob(os.path.join(folder, "*"))
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if limit and len(paths) > limit:
+        # Muestra repartida por todo el split, no solo las primeras imágenes
+        step = len(paths) / limit
+        paths = [paths[int(i * step)] for i in range(limit)]
+    return paths
+
+
+def preprocess(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """Letterbox como el de ultralytics: escala sin deformar, relleno gris, RGB, NCHW float32 0-1"""
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32)[None] / 255.0
+
+
+def _calibration_reader(model_path: str, images: Sequence[str], imgsz: int):
+    """CalibrationDataReader de onnxruntime que entrega las imágenes preprocesadas de una en una"""
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = onnxruntime.InferenceSession(
+        model_path, providers=["CPUExecutionProvider"]
+    ).get_inputs()[0].name
+
+    class ImageCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(images)
+
+        def get_next(self):
+            for path in self._paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {input_name: preprocess(image, imgsz)}
+            return None
+
+    return ImageCalibrationReader()
+
+
+def _head_nodes_to_exclude(model_path: str) -> List[str]:
+    """
+    Nodos del decodificador de cajas (última capa Detect, salvo sus convoluciones):
+    son los que más precisión pierden en INT8 y los que menos cómputo aportan
+    """
+    import onnx
+
+    graph = onnx.load(model_path).graph
+    prefixes = [node.name.split("/")[1] for node in graph.node if node.name.startswith("/model.")]
+    if not prefixes:
+        return []
+    head = max(prefixes, key=lambda prefix: int(prefix.split(".")[1]))
+    return [
+        node.name for node in graph.node
+        if node.name.startswith(f"/{head}/") and node.op_type != "Conv"
+    ]
+
+
+def _copy_metadata(source: str, target: str):
+    """Conserva los metadatos de ultralytics (clases, stride, imgsz) en la variante cuantizada"""
+    import onnx
+
+    metadata = onnx.load(source).metadata_props
+    model = onnx.load(target)
+    del model.metadata_props[:]
+    model.metadata_props.extend(metadata)
+    onnx.save(model, target)
+
+
+def quantize_dynamic_variant(fp32_path: str, output_path: str) -> str:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, output_path, weight_type=QuantType.QUInt8)
+    _copy_metadata(fp32_path, output_path)
+    return output_path
+
+
+def quantize_static_variant(fp32_path: str, output_path: str, images: Sequence[str], imgsz: int,
+                            calibrate_method: str = "minmax", exclude_head: bool = True) -> str:
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    source = fp32_path
+    prepared = f"{os.path.splitext(output_path)[0]}.prep.onnx"
+    try:
+        # Inferencia de formas y fusión previa recomendadas por onnxruntime antes de cuantizar
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(fp32_path, prepared)
+        source = prepared
+    except Exception as e:
+        logger.warning(f"Sin preprocesado de cuantización, se usa el modelo tal cual: {str(e)}")
+
+    methods = {
+        'minmax': CalibrationMethod.MinMax,
+        'entropy': CalibrationMethod.Entropy,
+        'percentile': CalibrationMethod.Percentile,
+    }
+    try:
+        quantize_static(
+            source,
+            output_path,
+            _calibration_reader(source, images, imgsz),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=methods[calibrate_method],
+            nodes_to_exclude=_head_nodes_to_exclude(source) if exclude_head else [],
+        )
+    finally:
+        if os.path.exists(prepared):
+            os.remove(prepared)
+    _copy_metadata(fp32_path, output_path)
+    return output_path
+
+
+def build_variants(model_path: str, imgsz: int, precisions: Sequence[str], calibration: Sequence[str],
+                   calibrate_method: str, exclude_head: bool) -> Dict[str, str]:
+    """Genera (o reutiliza) el ONNX fp32 y las variantes INT8 pedidas, junto a MODEL_PATH"""
+    fp32_path = model_backends.prepare_model(model_path, "onnx", imgsz)
+    variants = {'fp32': fp32_path}
+    for precision in precisions:
+        if precision == "fp32":
+            continue
+        target = model_backends.quantized_path(model_path, imgsz, precision)
+        started = time.perf_counter()
+        if precision == "int8-dynamic":
+            quantize_dynamic_variant(fp32_path, target)
+        else:
+            if not calibration:
+                raise SystemExit("La cuantización estática necesita imágenes de calibración (revisar data.yaml)")
+            quantize_static_variant(fp32_path, target, calibration, imgsz, calibrate_method, exclude_head)
+        logger.info(f"Variante {precision} generada en {time.perf_counter() - started:.1f} s: {target}")
+        variants[precision] = target
+    return variants
+
+
+def measure_speed(path: str, images: Sequence[str], imgsz: int, runs: int, task: Optional[str] = "detect") -> Dict[str, Any]:
+    """Tiempo de carga (crear el modelo + primera inferencia) y latencia por frame en CPU"""
+    from ultralytics import YOLO
+
+    frames = [frame for frame in (cv2.imread(path) for path in images) if frame is not None]
+    if not frames:
+        frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)]
+
+    started = time.perf_counter()
+    model = YOLO(path, task=task) if task else YOLO(path)
+    model(frames[0], verbose=False, device="cpu", imgsz=imgsz)
+    load_s = time.perf_counter() - started
+
+    latency = SampleRecorder()
+    for index in range(runs):
+        started = time.perf_counter()
+        model(frames[index % len(frames)], verbose=False, device="cpu", imgsz=imgsz)
+        latency.observe(time.perf_counter() - started)
+    return {'load_s': round(load_s, 3), 'latency': latency.summary()}
+
+
+def measure_accuracy(path: str, data_yaml: str, imgsz: int, task: Optional[str] = "detect") -> Dict[str, Any]:
+    """mAP, precisión y recall sobre el split de validación con el validador de ultralytics"""
+    from ultralytics import YOLO
+
+    model = YOLO(path, task=task) if task else YOLO(path)
+    metrics = model.val(data=data_yaml, imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False)
+    return {
+        'map50': round(float(metrics.box.map50), 4),
+        'map50_95': round(float(metrics.box.map), 4),
+        'precision': round(float(metrics.box.mp), 4),
+        'recall': round(float(metrics.box.mr), 4),
+    }
+
+
+def run_report(args) -> Dict[str, Any]:
+    model_path = args.model or settings.MODEL_PATH
+    imgsz = args.imgsz or settings.MODEL_IMGSZ
+    dataset = resolve_dataset(args.data)
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    calibration = list_images(dataset.get("train", ""), args.calibration_images)
+    validation = list_images(dataset.get("val", ""))
+    if not validation:
+        logger.warning(f"Sin imágenes de validación en {dataset.get('val')}: se omite mAP/precisión/recall")
+
+    variants = build_variants(
+        model_path, imgsz, args.precisions, calibration, args.calibrate_method, not args.quantize_head
+    )
+    candidates = ([("torch", model_path, None)] if args.include_torch else []) + [
+        (precision, path, "detect") for precision, path in variants.items()
+    ]
+
+    data_yaml = write_local_data_yaml(dataset, args.work_dir) if validation else None
+    results = []
+    for name, path, task in candidates:
+        logger.info(f"Evaluando {name}: {path}")
+        entry = {
+            'variant': name,
+            'path': path,
+            'size_mb': round(_size_bytes(path) / 1024 / 1024, 2),
+            **measure_speed(path, validation[:args.latency_images] or calibration[:args.latency_images],
+                            imgsz, args.runs, task),
+        }
+        if data_yaml:
+            entry.update(measure_accuracy(path, data_yaml, imgsz, task))
+        results.append(entry)
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'platform': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+        },
+        'config': {
+            'model': model_path,
+            'imgsz': imgsz,
+            'data': args.data,
+            'calibration_images': len(calibration),
+            'validation_images': len(validation),
+            'calibrate_method': args.calibrate_method,
+            'quantize_head': args.quantize_head,
+            'runs': args.runs,
+        },
+        'variants': results,
+    }
+
+
+def _size_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    """Tabla comparativa legible de las variantes"""
+    columns = ("variant", "size_mb", "load_s", "p50_ms", "p95_ms", "map50", "map50_95", "precision", "recall")
+    rows = [columns]
+    for entry in report['variants']:
+        values = {**entry, 'p50_ms': entry['latency'].get('p50_ms'), 'p95_ms': entry['latency'].get('p95_ms')}
+        rows.append(tuple("-" if values.get(column) is None else str(values[column]) for column in columns))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cuantización INT8 del modelo y comparación velocidad/precisión")
+    parser.add_argument("--model", help="Pesos entrenados (por defecto MODEL_PATH)")
+    parser.add_argument("--data", default=DEFAULT_DATA_YAML, help="data.yaml del dataset de entrenamiento")
+    parser.add_argument("--imgsz", type=int, help="Tamaño de entrada (por defecto MODEL_IMGSZ)")
+    parser.add_argument("--precisions", nargs="+", default=["int8-dynamic", "int8-static"],
+                        choices=[p for p in model_backends.PRECISIONS if p != "fp32"],
+                        help="Variantes INT8 a generar (fp32 siempre se incluye)")
+    parser.add_argument("--calibration-images", type=int, default=300, help="Imágenes de train para calibrar")
+    parser.add_argument("--calibrate-method", default="minmax", choices=["minmax", "entropy", "percentile"])
+    parser.add_argument("--quantize-head", action="store_true",
+                        help="Cuantizar también el decodificador de cajas (más rápido, menos preciso)")
+    parser.add_argument("--include-torch", action="store_true", help="Incluir best.pt (PyTorch) en la comparación")
+    parser.add_argument("--runs", type=int, default=100, help="Inferencias para medir la latencia")
+    parser.add_argument("--latency-images", type=int, default=20, help="Imágenes distintas usadas al medir latencia")
+    parser.add_argument("--work-dir", default="quantization", help="Carpeta para archivos temporales")
+    parser.add_argument("--output", help="Archivo JSON de salida")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    report = run_report(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print(format_table(report))
+
+
+if __name__ == "__main__":
+    main()
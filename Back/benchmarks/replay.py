@@ -0,0 +1,392 @@
+# benchmarks/replay.py
+"""
+Benchmark sin interfaz del pipeline de detección.
+
+Reproduce videos grabados o carpetas de imágenes a través de CameraManager,
+YoloService y StreamPipeline, sin clientes WebSocket ni Firebase, y emite un
+reporte JSON (FPS, latencia p50/p95/p99 por etapa, tiempo de CPU y memoria pico)
+para comparar regresiones entre commits.
+
+Uso (desde Back/):
+    python -m benchmarks.replay ../TrainModel/runs/detect/predict --output bench.json
+    python -m benchmarks.replay video1.mp4 video2.mp4 --stub-model --stub-latency-ms 30
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.core.camera_manager import CameraManager
+from app.core.config import settings
+from app.services.batch_scheduler import BatchScheduler
+from app.services.stream_pipeline import StreamPipeline, STREAM_MODES
+from app.services.yolo_service import YoloService
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STAGES = ("capture", "copy", "motion", "inference", "extract", "draw", "encode", "raw_encode", "overlay")
+
+logger = logging.getLogger("benchmarks.replay")
+
+
+class SampleRecorder:
+    """Sustituto de un histograma que guarda cada muestra para calcular percentiles exactos"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {'count': 0}
+        values = np.asarray(self.samples) * 1000
+        p50, p95, p99 = np.percentile(values, (50, 95, 99))
+        return {
+            'count': len(values),
+            'mean_ms': round(float(values.mean()), 3),
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'max_ms': round(float(values.max()), 3),
+        }
+
+
+class ReplayCapture:
+    """Envoltorio de cv2.VideoCapture para archivos: marca el fin del video y puede repetirlo"""
+
+    def __init__(self, path: str, loop: bool = False, fps: Optional[float] = None, max_frames: Optional[int] = None):
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        self.interval = 1.0 / fps if fps else 0.0
+        self.max_frames = max_frames
+        self.frames = 0
+        self.exhausted = False
+        self._next_read = 0.0
+
+    def isOpened(self) -> bool:
+        return self.cap.isOpened()
+
+    def _pace(self):
+        if self.interval:
+            delay = self._next_read - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_read = max(self._next_read, time.perf_counter()) + self.interval
+
+    def _read_next(self, image):
+        ret, frame = self.cap.read(image)
+        if not ret and self.loop and self.frames:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def read(self, image=None):
+        if self.exhausted or (self.max_frames and self.frames >= self.max_frames):
+            self.exhausted = True
+            return False, None
+        self._pace()
+        ret, frame = self._read_next(image)
+        if not ret:
+            self.exhausted = True
+            return False, None
+        self.frames += 1
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageFolderCapture(ReplayCapture):
+    """Fuente que entrega las imágenes de una carpeta como si fueran frames de video"""
+
+    def __init__(self, folder: str, loop: bool = False, fps: Optional[float] = None, max_frames: Optional[int] = None):
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(folder, "*"))
+            if path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.loop = loop
+        self.interval = 1.0 / fps if fps else 0.0
+        self.max_frames = max_frames
+        self.frames = 0
+        self.exhausted = False
+        self._next_read = 0.0
+        self._index = 0
+
+    def isOpened(self) -> bool:
+        return bool(self.paths)
+
+    def _read_next(self, image):
+        if self._index >= len(self.paths):
+            if not self.loop:
+                return False, None
+            self._index = 0
+        frame = cv2.imread(self.paths[self._index])
+        self._index += 1
+        if frame is None:
+            return False, None
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class ReplayCameraManager(CameraManager):
+    """CameraManager que lee de un archivo o carpeta local"""
+
+    def __init__(self, camera_id: str, source: str, loop: bool, fps: Optional[float], max_frames: Optional[int]):
+        super().__init__(camera_id, source, "Benchmark")
+        self.auto_reconnect = False
+        self.loop = loop
+        self.fps = fps
+        self.max_frames = max_frames
+
+    def _open_capture(self):
+        if os.path.isdir(self.camera_url):
+            return ImageFolderCapture(self.camera_url, self.loop, self.fps, self.max_frames)
+        return ReplayCapture(self.camera_url, self.loop, self.fps, self.max_frames)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.cap is None or self.cap.exhausted
+
+
+class DetectionSink:
+    """Reemplazo de FirebaseService: solo cuenta las caídas que se habrían guardado"""
+
+    def __init__(self):
+        self.saved = 0
+
+    def in_cooldown(self, key: Optional[str], now=None) -> bool:
+        return False
+
+    async def save_detection(self, detection_data: Dict[str, Any]) -> bool:
+        self.saved += 1
+        return True
+
+
+class _StubBoxes:
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+
+class _StubResult:
+    def __init__(self, data: np.ndarray):
+        self.boxes = _StubBoxes(data)
+
+
+class StubModel:
+    """
+    Modelo falso para aislar el costo del framework: simula la latencia indicada
+    y devuelve algunas cajas fijas con el formato de los resultados de ultralytics
+    """
+
+    def __init__(self, latency_ms: float = 0.0, boxes: int = 3):
+        self.latency = latency_ms / 1000
+        self.boxes = boxes
+
+    def _result(self, frame: np.ndarray) -> _StubResult:
+        height, width = frame.shape[:2]
+        data = np.zeros((self.boxes, 6), dtype=np.float32)
+        for i in range(self.boxes):
+            x1 = width * i / (self.boxes + 1)
+            data[i] = (x1, height * 0.2, x1 + width * 0.2, height * 0.8, 0.8, 1)
+        return _StubResult(data)
+
+    def __call__(self, source, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._result(frame) for frame in frames]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa KiB; macOS, bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+        except ImportError:
+            return None
+
+
+async def _initialize_model(args) -> YoloService:
+    yolo_service = YoloService()
+    if args.stub_model:
+        yolo_service.model = StubModel(args.stub_latency_ms, args.stub_boxes)
+        yolo_service.device = "cpu"
+        yolo_service.backend = "stub"
+        yolo_service.initialized = True
+    else:
+        await yolo_service.initialize(args.model or settings.MODEL_PATH)
+    return yolo_service
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    yolo_service = await _initialize_model(args)
+    use_batching = len(args.sources) > 1 or args.batch_window_ms is not None
+    batch_scheduler = BatchScheduler(
+        yolo_service,
+        window_ms=args.batch_window_ms if args.batch_window_ms is not None else settings.INFERENCE_BATCH_WINDOW_MS,
+        max_batch=settings.INFERENCE_MAX_BATCH,
+    ) if use_batching else None
+    sink = DetectionSink()
+
+    recorders = {stage: SampleRecorder() for stage in STAGES}
+    cameras, pipelines, outputs = [], [], []
+    for index, source in enumerate(args.sources):
+        camera = ReplayCameraManager(f"replay{index}", source, args.loop, args.fps, args.frames)
+        camera.capture_seconds = recorders["capture"]
+        pipeline = StreamPipeline(camera, yolo_service, sink, batch_scheduler)
+        pipeline.motion_gate.enabled = not args.no_motion_gate
+        pipeline.clip_recorder.enabled = not args.no_clips
+        pipeline.stages = {stage: recorders[stage] for stage in pipeline.stages}
+        cameras.append(camera)
+        pipelines.append(pipeline)
+
+    async def consume(subscription, counter: List[int]):
+        # Visor sin WebSocket: solo cuenta los frames entregados
+        while True:
+            await subscription.get()
+            counter[0] += 1
+
+    consumers = []
+    for pipeline in pipelines:
+        counter = [0]
+        outputs.append(counter)
+        consumers.append(asyncio.create_task(consume(pipeline.subscribe(args.mode), counter)))
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for camera, pipeline in zip(cameras, pipelines):
+        await camera.start()
+        pipeline.start()
+
+    deadline = wall_start + args.max_seconds if args.max_seconds else None
+    while True:
+        await asyncio.sleep(0.05)
+        done = all(
+            camera.exhausted and pipeline.last_sequence >= camera.frame_ring.sequence
+            for camera, pipeline in zip(cameras, pipelines)
+        )
+        if done or (deadline and time.perf_counter() >= deadline):
+            break
+
+    # Dejar terminar el último frame en curso
+    await asyncio.sleep(0.1)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    for camera, pipeline in zip(cameras, pipelines):
+        await pipeline.stop()
+        camera.stop()
+    for consumer in consumers:
+        consumer.cancel()
+    yolo_service.executor.stop()
+
+    frames_in = sum(camera.frames_captured for camera in cameras)
+    frames_out = sum(counter[0] for counter in outputs)
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'platform': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'config': {
+            'sources': args.sources,
+            'stub_model': args.stub_model,
+            'stub_latency_ms': args.stub_latency_ms if args.stub_model else None,
+            'backend': yolo_service.backend,
+            'device': yolo_service.device,
+            'motion_gate': not args.no_motion_gate,
+            'batching': use_batching,
+            'fps_limit': args.fps,
+            'mode': args.mode,
+            'clips': not args.no_clips,
+        },
+        'duration_s': round(wall, 3),
+        'frames_captured': frames_in,
+        'frames_processed': frames_out,
+        # La captura no espera al pipeline (igual que en vivo): los frames atrasados se saltan
+        'frames_skipped': frames_in - frames_out,
+        'fps': round(frames_out / wall, 2) if wall else 0.0,
+        'cpu_time_s': round(cpu, 3),
+        'cpu_utilization': round(cpu / wall, 3) if wall else 0.0,
+        'peak_rss_mb': _peak_rss_mb(),
+        'stages': {stage: recorder.summary() for stage, recorder in recorders.items()},
+        'motion_gate': {pipeline.camera_manager.camera_id: pipeline.motion_gate.stats() for pipeline in pipelines},
+        'inference': yolo_service.executor.stats(),
+        'batching': batch_scheduler.stats() if batch_scheduler else None,
+        'falls_detected': sink.saved,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de replay del pipeline de detección")
+    parser.add_argument("sources", nargs="+", help="Videos o carpetas de imágenes (una cámara por fuente)")
+    parser.add_argument("--model", help="Ruta del modelo (por defecto MODEL_PATH)")
+    parser.add_argument("--stub-model", action="store_true", help="Usar un modelo falso para medir solo el framework")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Latencia simulada del modelo falso")
+    parser.add_argument("--stub-boxes", type=int, default=3, help="Cajas devueltas por el modelo falso")
+    parser.add_argument("--frames", type=int, help="Máximo de frames por fuente")
+    parser.add_argument("--fps", type=float, help="Ritmo de reproducción (por defecto, lo más rápido posible)")
+    parser.add_argument("--loop", action="store_true", help="Repetir la fuente (usar con --frames o --max-seconds)")
+    parser.add_argument("--max-seconds", type=float, help="Duración máxima del benchmark")
+    parser.add_argument("--batch-window-ms", type=float, help="Activar el agrupamiento por lotes con esta ventana")
+    parser.add_argument("--no-motion-gate", action="store_true", help="Inferir todos los frames")
+    parser.add_argument("--mode", choices=STREAM_MODES, default="annotated", help="Modo de los visores simulados")
+    parser.add_argument("--no-clips", action="store_true", help="Desactivar el buffer de clips")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto, stdout)")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.ERROR,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    if args.loop and not (args.frames or args.max_seconds):
+        raise SystemExit("--loop requiere --frames o --max-seconds")
+
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import pytest
+
+from app.core.adaptive_quality import AdaptiveQuality, QualityLevel
+
+
+LEVELS = [[90, 1.0, 0], [75, 1.0, 15], [60, 0.75, 10], [45, 0.5, 5]]
+
+
+def _controller(**kwargs):
+    quality = AdaptiveQuality(QualityLevel.parse_levels(LEVELS), window=1.0, upgrade_after=3.0, **kwargs)
+    quality._window_start = quality._stable_since = 0.0
+    return quality
+
+
+def _send(quality, start, seconds, send_time, interval=0.1, dropped=0):
+    """Simula envíos de `send_time` segundos cada `interval` durante `seconds`"""
+    now = start
+    while now < start + seconds:
+        now = round(now + interval, 6)
+        quality.record_send(10_000, send_time, dropped, now=now)
+    return now
+
+
+def test_parse_levels_requires_one_level():
+    with pytest.raises(ValueError):
+        QualityLevel.parse_levels([])
+
+
+def test_steps_down_one_level_per_busy_window():
+    quality = _controller()
+    now = _send(quality, 0.0, 1.0, send_time=0.08)
+    assert quality.level == 1
+    _send(quality, now, 5.0, send_time=0.08)
+    # Nunca baja del último nivel
+    assert quality.level == 3
+    assert quality.changes == 3
+
+
+def test_steps_down_on_dropped_frames_even_if_not_busy():
+    quality = _controller()
+    now = _send(quality, 0.0, 1.0, send_time=0.001)
+    assert quality.level == 0
+    _send(quality, now, 1.0, send_time=0.001, dropped=4)
+    assert quality.level == 1
+
+
+def test_steps_up_only_after_sustained_headroom():
+    quality = _controller()
+    now = _send(quality, 0.0, 2.0, send_time=0.08)
+    assert quality.level == 2
+    now = _send(quality, now, 2.0, send_time=0.005)
+    # Aún no pasaron `upgrade_after` segundos con margen
+    assert quality.level == 2
+    _send(quality, now, 6.0, send_time=0.005)
+    assert quality.level == 0
+
+
+def test_disabled_keeps_best_level():
+    quality = _controller(enabled=False)
+    _send(quality, 0.0, 3.0, send_time=0.09, dropped=5)
+    assert quality.level == 0
+    assert quality.stats()['busy'] > 0.6
+
+
+def test_ready_respects_level_fps():
+    quality = _controller()
+    assert quality.ready(0.01)
+    quality.level = 3  # 5 fps
+    quality.offered(1.0)
+    assert not quality.ready(1.1)
+    assert quality.ready(1.2)
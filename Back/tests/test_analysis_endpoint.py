@@ -0,0 +1,56 @@
+import os
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import analysis
+from app.core.config import settings
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / "entrada").mkdir()
+    (tmp_path / "entrada" / "sala.mp4").write_bytes(b"")
+    monkeypatch.setattr(settings, "ANALYSIS_INPUT_DIR", str(tmp_path / "entrada"))
+    monkeypatch.setattr(settings, "ANALYSIS_OUTPUT_DIR", str(tmp_path / "salida"))
+    monkeypatch.setattr(settings, "ANALYSIS_MAX_RUNNING", 1)
+    monkeypatch.setattr(analysis, "analysis_jobs", {})
+
+    release = threading.Event()
+    calls = []
+
+    def analyze_videos(videos, output_dir, **kwargs):
+        calls.append(kwargs)
+        release.wait(5)
+        return {'detections': 0}
+
+    monkeypatch.setattr(analysis, "analyze_videos", analyze_videos)
+    app = FastAPI()
+    app.include_router(analysis.router)
+    with TestClient(app) as client:
+        client.calls = calls
+        yield client
+        release.set()
+
+
+def test_rejects_paths_outside_input_dir(client):
+    response = client.post("/analysis", json={'videos': ["../secreto.mp4"]})
+    assert response.status_code == 400
+
+
+def test_only_one_job_runs_at_a_time(client):
+    first = client.post("/analysis", json={'videos': ["sala.mp4"], 'workers': 10_000})
+    assert first.status_code == 202
+    assert client.get(f"/analysis/{first.json()['id']}").json()['status'] == 'running'
+
+    second = client.post("/analysis", json={'videos': ["sala.mp4"]})
+    assert second.status_code == 429
+
+    deadline = time.monotonic() + 5
+    while not client.calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Los procesos pedidos se limitan a los núcleos disponibles
+    assert client.calls[0]['workers'] == (os.cpu_count() or 1)
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.services.batch_scheduler import BatchScheduler
+
+
+class FakeYolo:
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    async def detect_batch(self, frames):
+        self.batches.append(list(frames))
+        await asyncio.sleep(0.01)
+        if self.error:
+            raise self.error
+        return [f"resultado-{frame}" for frame in frames]
+
+
+def test_frames_within_window_share_one_batch():
+    yolo = FakeYolo()
+    scheduler = BatchScheduler(yolo, window_ms=20, max_batch=8)
+
+    async def scenario():
+        return await asyncio.gather(*(scheduler.detect(frame, key=f"cam{frame}") for frame in range(3)))
+
+    assert asyncio.run(scenario()) == ["resultado-0", "resultado-1", "resultado-2"]
+    assert yolo.batches == [[0, 1, 2]]
+    assert scheduler.stats()['batch_size_histogram'] == {3: 1}
+
+
+def test_full_batch_dispatches_without_waiting_for_window():
+    yolo = FakeYolo()
+    # Con una ventana de 10 s solo el tamaño máximo puede despachar los lotes a tiempo
+    scheduler = BatchScheduler(yolo, window_ms=10_000, max_batch=2)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(*(scheduler.detect(frame) for frame in range(5))), 1.0)
+
+    assert asyncio.run(scenario()) == [f"resultado-{frame}" for frame in range(5)]
+    # Mientras corre un lote los demás esperan; al terminar se despachan sin ventana
+    assert yolo.batches == [[0, 1], [2, 3], [4]]
+    assert scheduler.stats()['mean_batch_size'] == 5 / 3
+
+
+def test_batch_error_fails_every_frame_in_it():
+    scheduler = BatchScheduler(FakeYolo(error=RuntimeError("sin GPU")), window_ms=5, max_batch=8)
+
+    async def scenario():
+        return await asyncio.gather(scheduler.detect("a"), scheduler.detect("b"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [str(result) for result in results] == ["sin GPU", "sin GPU"]
+    assert not scheduler.pending
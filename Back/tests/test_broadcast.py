@@ -0,0 +1,57 @@
+import asyncio
+
+from app.core.broadcast import BroadcastHub, Subscription
+
+
+def test_subscription_keeps_only_latest_item():
+    async def scenario():
+        subscription = Subscription()
+        assert subscription.offer("a") == 0
+        assert subscription.offer("b") == 1
+        assert subscription.offer("c") == 1
+        assert subscription.dropped == 2
+        assert await subscription.get() == "c"
+        assert subscription.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_hub_counts_drops_per_lagging_subscriber():
+    async def scenario():
+        hub = BroadcastHub()
+        fast = hub.subscribe()
+        slow = hub.subscribe()
+
+        hub.publish(1)
+        assert await fast.get() == 1
+        hub.publish(2)
+
+        assert fast.dropped == 0
+        assert slow.dropped == 1
+        assert hub.dropped == 1
+        assert await slow.get() == 2
+
+    asyncio.run(scenario())
+
+
+def test_hub_select_skips_subscribers_returning_none():
+    async def scenario():
+        hub = BroadcastHub()
+        low = hub.subscribe(state="low")
+        high = hub.subscribe(state="high")
+
+        hub.publish({"high": b"H"}, select=lambda subscription, item: item.get(subscription.state))
+
+        assert low.queue.empty()
+        assert await high.get() == b"H"
+
+    asyncio.run(scenario())
+
+
+def test_unsubscribe_removes_subscriber():
+    hub = BroadcastHub()
+    subscription = hub.subscribe()
+    assert len(hub) == 1
+    hub.unsubscribe(subscription)
+    hub.unsubscribe(subscription)
+    assert len(hub) == 0
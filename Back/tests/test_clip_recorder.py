@@ -0,0 +1,59 @@
+import time
+
+import cv2
+import numpy as np
+
+from app.core.clip_buffer import ClipBuffer
+from app.services.clip_recorder import ClipRecorder
+
+
+def _jpeg(value=128):
+    _, buffer = cv2.imencode('.jpg', np.full((32, 48, 3), value, np.uint8))
+    return buffer.tobytes()
+
+
+def test_clip_buffer_evicts_by_age_and_bytes():
+    buffer = ClipBuffer(max_seconds=1.0, max_bytes=10)
+    for timestamp in (0.0, 0.5, 1.0, 1.6):
+        buffer.append(b"abc", timestamp)
+    # 0.0 y 0.5 quedan fuera de la ventana de 1 s que termina en 1.6
+    assert [timestamp for timestamp, _ in buffer.snapshot()] == [1.0, 1.6]
+
+    buffer.append(b"0123456789", 1.7)
+    assert [timestamp for timestamp, _ in buffer.snapshot()] == [1.7]
+    assert buffer.bytes == 10
+    assert buffer.evicted == 4
+
+
+def test_wants_frame_limits_clip_fps(tmp_path):
+    recorder = ClipRecorder("cam", str(tmp_path), fps=10.0)
+    kept = []
+    for index in range(30):
+        timestamp = index / 30
+        if recorder.wants_frame(timestamp):
+            recorder.add_frame(b"jpeg", timestamp)
+            kept.append(index)
+    assert kept == list(range(0, 30, 3))
+
+    assert not ClipRecorder("cam", str(tmp_path), enabled=False).wants_frame(0.0)
+    assert ClipRecorder("cam", str(tmp_path), fps=0).wants_frame(0.0)
+
+
+def test_clip_is_written_after_post_window(tmp_path):
+    recorder = ClipRecorder("cam", str(tmp_path), pre_seconds=1.0, post_seconds=0.5)
+    for index in range(10):
+        recorder.add_frame(_jpeg(), index * 0.1)
+    path = recorder.reserve_path()
+    recorder.start_clip(path, timestamp=0.9)
+    for index in range(10, 16):
+        recorder.add_frame(_jpeg(200), index * 0.1)
+    assert recorder.stats()['pending_clips'] == 0
+
+    deadline = time.monotonic() + 5
+    while recorder.saved == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recorder.saved == 1
+    capture = cv2.VideoCapture(path)
+    # 10 frames previos más los de 1.0 a 1.4 s
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 15
+    capture.release()
@@ -0,0 +1,92 @@
+import json
+import tracemalloc
+
+import numpy as np
+
+from app.services import detection_analytics
+from app.services.detection_analytics import (
+    clean_detection_id, convert_timings, iter_chunks, iter_firebase_records, iter_timing_rows
+)
+
+
+TIMINGS_CSV = (
+    "detection_id,start_time,end_time,delta_time\n"
+    "{'-OJYrlYUuSUoIeoVoCso'},58703.02,59389.83,686.81\n"
+    "-OJZ0abcDEF,100.0,112.5,12.5\n"
+    "{'-OJbroken'},no-es-numero,1.0,1.0\n"
+)
+
+
+def test_clean_detection_id_strips_legacy_set_format():
+    assert clean_detection_id("{'-OJYrlYUuSUoIeoVoCso'}") == "-OJYrlYUuSUoIeoVoCso"
+    assert clean_detection_id(' {"-OJX"} ') == "-OJX"
+    assert clean_detection_id("-OJZ0abcDEF") == "-OJZ0abcDEF"
+
+
+def test_iter_timing_rows_parses_ids_and_skips_invalid_rows(tmp_path):
+    path = tmp_path / "tiempos.csv"
+    path.write_text(TIMINGS_CSV, encoding="utf-8")
+
+    rows = list(iter_timing_rows(str(path)))
+    assert [row['detection_id'] for row in rows] == ["-OJYrlYUuSUoIeoVoCso", "-OJZ0abcDEF"]
+    assert rows[0]['delta_ms'] == 686.81
+    assert rows[1]['start_ms'] == 100.0
+
+
+def test_convert_timings_writes_clean_ids(tmp_path):
+    path = tmp_path / "tiempos.csv"
+    path.write_text(TIMINGS_CSV, encoding="utf-8")
+
+    result = convert_timings([str(path)], str(tmp_path / "out"), chunk_rows=1)
+    assert result == {'rows': 2, 'parts': 2}
+    ids = np.concatenate([chunk['detection_id'] for chunk in iter_chunks(str(tmp_path / "out"), "timings")])
+    assert ids.tolist() == [b"-OJYrlYUuSUoIeoVoCso", b"-OJZ0abcDEF"]
+
+
+def test_iter_firebase_records_accepts_export_or_collection(tmp_path):
+    records = {
+        "-OJa": {"confidence": 0.9, "location": "Sala", "bbox": [1, 2, 3, 4]},
+        "-OJb": {"confidence": 0.5, "note": "texto con { llaves } y \"comillas\""},
+    }
+    export = tmp_path / "export.json"
+    export.write_text(json.dumps({"notifications": {"x": 1}, "detections": records}), encoding="utf-8")
+    node = tmp_path / "detections.json"
+    node.write_text(json.dumps(records), encoding="utf-8")
+
+    assert dict(iter_firebase_records(str(export))) == records
+    assert dict(iter_firebase_records(str(node))) == records
+
+
+def test_iter_firebase_records_skips_large_nodes_with_bounded_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(detection_analytics, "READ_CHUNK_CHARS", 4096)
+    notifications = {
+        f"-N{i:07d}": {"message": "caída en {sala} \\\"[1]\"", "timestamp": i * 1.5, "tags": [1, {"x": None}]}
+        for i in range(20000)
+    }
+    records = {"-OJa": {"confidence": 0.91, "bbox": [1.5, 2, 3, 4]}}
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps({"notifications": notifications, "detections": records}), encoding="utf-8")
+    assert path.stat().st_size > 2_000_000
+    del notifications
+
+    tracemalloc.start()
+    try:
+        assert dict(iter_firebase_records(str(path))) == records
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # El nodo saltado nunca se decodifica ni se acumula en el buffer
+    assert peak < 200_000
+
+
+def test_iter_firebase_records_values_across_chunk_boundaries(tmp_path, monkeypatch):
+    records = {
+        "-OJa": {"confidence": 0.123456789, "duration": 12345.5e3, "note": "fin \\"},
+        "-OJb": {"confidence": 1, "bbox": [100, 200, 300, 400], "flag": True},
+    }
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps({"notifications": {"-N": "}"}, "detections": records}), encoding="utf-8")
+    # Con bloques diminutos cada número, cadena y escape acaba partido entre dos lecturas
+    for size in range(1, 12):
+        monkeypatch.setattr(detection_analytics, "READ_CHUNK_CHARS", size)
+        assert dict(iter_firebase_records(str(path))) == records
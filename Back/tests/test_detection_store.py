@@ -0,0 +1,18 @@
+from app.services.detection_store import firebase_notification_events
+
+
+NOTIFICATION = {'type': 'fall_detected', 'location': 'Sala', 'read': False}
+
+
+def test_root_patch_from_batched_save_yields_every_notification():
+    events = firebase_notification_events('patch', '/', {'-OJa': NOTIFICATION, '-OJb': NOTIFICATION, '-OJc': None})
+    assert events == [('-OJa', NOTIFICATION), ('-OJb', NOTIFICATION)]
+
+
+def test_single_put_yields_its_notification():
+    assert firebase_notification_events('put', '/-OJa', NOTIFICATION) == [('-OJa', NOTIFICATION)]
+
+
+def test_field_patch_and_deletes_are_ignored():
+    assert firebase_notification_events('patch', '/-OJa', {'read': True}) == []
+    assert firebase_notification_events('put', '/-OJa', None) == []
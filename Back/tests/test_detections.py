@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.models.detections import Detections
+from app.services.yolo_service import YoloService
+
+
+def _detections():
+    return Detections.from_array(np.array([
+        [10.4, 20.6, 110.5, 220.49, 0.8, 0],
+        [0.0, 118.58786, 80.4995, 319.301, 0.7627853155136108, 1],
+    ], dtype=np.float32))
+
+
+def test_to_overlay_rounds_boxes_and_confidences():
+    overlay = _detections().to_overlay()
+
+    assert overlay['boxes'] == [[10, 21, 110, 220], [0, 119, 80, 319]]
+    assert overlay['cls'] == [0, 1]
+    assert overlay['conf'] == [0.8, 0.763]
+    # Sin artefactos de float32 en el mensaje que recibe el cliente
+    assert json.dumps(overlay['conf']) == "[0.8, 0.763]"
+
+
+def test_to_overlay_empty():
+    assert Detections.empty().to_overlay() == {'boxes': [], 'cls': [], 'conf': []}
+
+
+def test_filter_by_class_and_confidence():
+    falls = _detections().filter(classes=(0,), min_conf=0.5)
+    assert len(falls) == 1
+    assert falls.cls.tolist() == [0]
+
+
+class _TensorLike:
+    """Imita un tensor de torch: la copia a host se hace con .cpu().numpy()"""
+
+    def __init__(self, data):
+        self.data = data
+        self.copies = 0
+
+    def cpu(self):
+        self.copies += 1
+        return self
+
+    def numpy(self):
+        return self.data
+
+
+def test_get_detections_copies_boxes_once():
+    tensor = _TensorLike(np.array([[1, 2, 3, 4, 0.5, 1]], dtype=np.float32))
+    detections = YoloService().get_detections(SimpleNamespace(boxes=SimpleNamespace(data=tensor)))
+    assert tensor.copies == 1
+    assert detections.xyxy.flags['C_CONTIGUOUS']
+    assert detections.cls.dtype == np.int32
+    assert detections.to_dicts() == [{'bbox': [1.0, 2.0, 3.0, 4.0], 'conf': 0.5, 'class': 1}]
+
+
+def test_get_detections_passes_through_extracted_detections():
+    detections = _detections()
+    assert YoloService().get_detections(detections) is detections
+    # Un resultado inesperado no rompe el pipeline: se trata como frame sin detecciones
+    assert len(YoloService().get_detections(object())) == 0
+
+
+def test_from_array_accepts_empty_results():
+    assert len(Detections.from_array(np.empty((0, 6), dtype=np.float32))) == 0
+    assert Detections.from_array([]).xyxy.shape == (0, 4)
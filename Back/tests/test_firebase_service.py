@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.services.firebase_service import FirebaseService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FirebaseService()
+    queued = []
+    monkeypatch.setattr(service, "store", object())
+    monkeypatch.setattr(service, "_last_notification", {})
+    monkeypatch.setattr(service, "_enqueue", queued.append)
+    service.queued = queued
+    return service
+
+
+def _fall(camera_id):
+    return {'confidence': 0.9, 'class_id': 1, 'bbox': [0, 0, 1, 1], 'camera_id': camera_id, 'location': camera_id}
+
+
+def test_cooldown_is_kept_per_camera(service):
+    async def save_all():
+        return [
+            await service.save_detection(_fall("sala")),
+            await service.save_detection(_fall("sala")),
+            await service.save_detection(_fall("cocina")),
+        ]
+
+    assert asyncio.run(save_all()) == [True, False, True]
+    assert len(service.queued) == 2
+
+
+def test_cooldown_uses_configured_seconds(service, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_COOLDOWN", 10)
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    service._last_notification["sala"] = now
+    assert service.in_cooldown("sala", now + timedelta(seconds=9))
+    assert not service.in_cooldown("sala", now + timedelta(seconds=10))
+    assert not service.in_cooldown("cocina", now)
+
+
+class FakeStore:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    def save_batch(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sin red")
+        self.batches.append([record.detection_id for record in records])
+
+
+class FakeTimingWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+
+@pytest.fixture
+def writer_service(monkeypatch):
+    service = FirebaseService()
+    monkeypatch.setattr(service, "_last_notification", {})
+    monkeypatch.setattr(service, "_write_queue", None)
+    monkeypatch.setattr(service, "_writer_task", None)
+    monkeypatch.setattr(service, "timing_writer", FakeTimingWriter())
+    monkeypatch.setattr(settings, "FIREBASE_WRITE_BATCH_MS", 20.0)
+    return service
+
+
+def _save_burst(service, cameras, settle=0.2):
+    async def scenario():
+        results = [await service.save_detection(_fall(camera)) for camera in cameras]
+        await asyncio.sleep(settle)
+        service._writer_task.cancel()
+        return results
+    return asyncio.run(scenario())
+
+
+def test_burst_is_written_in_one_batch(writer_service, monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(writer_service, "store", store)
+    assert _save_burst(writer_service, ["sala", "cocina", "pasillo"]) == [True, True, True]
+    assert len(store.batches) == 1 and len(store.batches[0]) == 3
+    assert [row['detection_id'] for row in writer_service.timing_writer.rows] == store.batches[0]
+
+
+def test_failed_batch_is_retried(writer_service, monkeypatch):
+    store = FakeStore(failures=1)
+    monkeypatch.setattr(writer_service, "store", store)
+    # El primer reintento espera 0.5 s
+    _save_burst(writer_service, ["sala", "cocina"], settle=1.0)
+    assert len(store.batches) == 1 and len(store.batches[0]) == 2
+
+
+def test_full_queue_drops_oldest_write(writer_service, monkeypatch):
+    monkeypatch.setattr(writer_service, "store", FakeStore())
+    monkeypatch.setattr(settings, "FIREBASE_WRITE_QUEUE_SIZE", 2)
+
+    async def scenario():
+        for camera in ("sala", "cocina", "pasillo"):
+            assert await writer_service.save_detection(_fall(camera))
+        queued = [pending.record.detection['camera_id'] for pending in list(writer_service._write_queue._queue)]
+        writer_service._writer_task.cancel()
+        return queued
+    assert asyncio.run(scenario()) == ["cocina", "pasillo"]
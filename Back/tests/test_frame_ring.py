@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+
+from app.core.frame_ring import FrameRing
+
+
+def _decode(jpeg):
+    return cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_jpeg_encodes_stable_copy_when_slot_is_lapped():
+    ring = FrameRing(size=2)
+    packet = ring.commit(np.full((48, 64, 3), 40, np.uint8))
+    canvas = packet.image.copy()
+    # La captura vuelve a escribir en el mismo slot antes de que se codifique
+    packet.image[:] = 220
+
+    decoded = _decode(packet.jpeg(canvas))
+    assert abs(int(decoded.mean()) - 40) <= 2
+    # El JPEG se codifica una sola vez por paquete
+    assert packet.jpeg() is packet.jpeg(canvas)
+
+
+def test_acquire_reuses_slots_after_a_full_lap():
+    ring = FrameRing(size=3)
+    images = [np.zeros((2, 2, 3), np.uint8) for _ in range(3)]
+    for image in images:
+        assert ring.acquire() is None
+        ring.commit(image)
+    assert ring.acquire() is images[0]
+    assert ring.latest().sequence == 3
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.inference_executor import InferenceDropped, InferenceExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(deadline_ms=0)
+    yield executor
+    executor.stop()
+
+
+def _blocker():
+    """Función que ocupa el hilo de inferencia hasta que se libera `gate`"""
+    started, gate = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        gate.wait(2)
+        return "ocupado"
+    return busy, started, gate
+
+
+def test_run_returns_result_and_propagates_errors(executor):
+    def fail():
+        raise ValueError("modelo roto")
+
+    async def scenario():
+        assert await executor.run("cam", lambda x: x * 2, 21) == 42
+        with pytest.raises(ValueError, match="modelo roto"):
+            await executor.run("cam", fail)
+
+    asyncio.run(scenario())
+    assert executor.completed == 1
+
+
+def test_newer_frame_supersedes_queued_one(executor):
+    busy, started, gate = _blocker()
+
+    async def scenario():
+        blocking = asyncio.create_task(executor.run("otra", busy))
+        await asyncio.to_thread(started.wait, 2)
+        old = asyncio.create_task(executor.run("cam", lambda: "viejo"))
+        await asyncio.sleep(0)
+        new = asyncio.create_task(executor.run("cam", lambda: "nuevo"))
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(InferenceDropped):
+            await old
+        return await blocking, await new
+
+    assert asyncio.run(scenario()) == ("ocupado", "nuevo")
+    assert executor.superseded == 1
+    assert executor.pending() == 0
+
+
+def test_requests_past_deadline_are_dropped():
+    executor = InferenceExecutor(deadline_ms=50)
+    busy, started, gate = _blocker()
+    calls = []
+
+    async def scenario():
+        blocking = asyncio.create_task(executor.run("otra", busy))
+        await asyncio.to_thread(started.wait, 2)
+        late = asyncio.create_task(executor.run("cam", calls.append, "frame"))
+        await asyncio.sleep(0.15)
+        gate.set()
+        await blocking
+        with pytest.raises(InferenceDropped):
+            await late
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.stop()
+    assert calls == []
+    assert executor.stats()['expired'] == 1
+
+
+def test_stop_fails_pending_requests(executor):
+    busy, started, gate = _blocker()
+
+    async def scenario():
+        blocking = asyncio.create_task(executor.run("otra", busy))
+        await asyncio.to_thread(started.wait, 2)
+        queued = asyncio.create_task(executor.run("cam", lambda: "nunca"))
+        await asyncio.sleep(0)
+        executor.stop()
+        gate.set()
+        with pytest.raises(InferenceDropped):
+            await queued
+        await blocking
+
+    asyncio.run(scenario())
@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.inference_executor import InferenceDropped
+from app.services.inference_workers import InferenceWorkerPool, _Worker
+
+
+def _pool(respawn=None):
+    """Pool con un worker simulado: el otro extremo del pipe hace de proceso de inferencia"""
+    pool = InferenceWorkerPool(1, "modelo.pt", "cpu", "torch", 640)
+    pool.ready = True
+    pool._stopping = respawn is None
+    if respawn is not None:
+        pool._spawn = respawn
+    worker = _Worker(0)
+    parent_conn, child_conn = multiprocessing.Pipe()
+    worker.conn = parent_conn
+    pool.workers = [worker]
+    threading.Thread(target=pool._read_results, args=(worker, parent_conn), daemon=True).start()
+    return pool, worker, child_conn
+
+
+def test_detect_returns_worker_detections():
+    pool, worker, child = _pool()
+
+    async def scenario():
+        task = asyncio.create_task(pool.detect(None, imgsz=320))
+        request_id, _, imgsz = await asyncio.to_thread(child.recv)
+        child.send((request_id, np.array([[1, 2, 3, 4, 0.9, 0]], dtype=np.float32), None))
+        return imgsz, await asyncio.wait_for(task, 2)
+
+    imgsz, detections = asyncio.run(scenario())
+    assert imgsz == 320
+    assert len(detections) == 1
+    assert worker.completed == 1 and not worker.pending
+
+
+def test_worker_error_fails_only_that_request():
+    pool, _, child = _pool()
+
+    async def scenario():
+        task = asyncio.create_task(pool.detect(None))
+        request_id, _, _ = await asyncio.to_thread(child.recv)
+        child.send((request_id, None, "CUDA out of memory"))
+        with pytest.raises(Exception, match="CUDA out of memory"):
+            await asyncio.wait_for(task, 2)
+
+    asyncio.run(scenario())
+
+
+def test_pending_requests_fail_when_worker_dies():
+    pool, worker, child = _pool()
+
+    async def scenario():
+        task = asyncio.create_task(pool.detect(None))
+        await asyncio.to_thread(child.recv)
+        child.close()
+        with pytest.raises(InferenceDropped):
+            await asyncio.wait_for(task, 2)
+        # Un worker dado por terminado no acepta peticiones nuevas: fallan sin quedar colgadas
+        with pytest.raises(InferenceDropped):
+            await asyncio.wait_for(pool.detect(None), 2)
+
+    asyncio.run(scenario())
+    assert worker.conn is None and not worker.pending
+
+
+def test_dead_worker_is_respawned():
+    respawned = threading.Event()
+    pool, worker, child = _pool(respawn=lambda worker: respawned.set())
+    child.close()
+    assert respawned.wait(2)
+    assert worker.restarts == 1
@@ -0,0 +1,47 @@
+from app.core.metrics import Counter, Histogram, registry
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("etapa_seconds", "Duración", ("camera",), buckets=(0.01, 0.1, 1.0))
+    child = histogram.labels("sala")
+    for value in (0.005, 0.01, 0.05, 2.0):
+        child.observe(value)
+
+    assert histogram.render() == [
+        'etapa_seconds_bucket{camera="sala",le="0.01"} 2',
+        'etapa_seconds_bucket{camera="sala",le="0.1"} 3',
+        'etapa_seconds_bucket{camera="sala",le="1.0"} 3',
+        'etapa_seconds_bucket{camera="sala",le="+Inf"} 4',
+        'etapa_seconds_sum{camera="sala"} 2.065',
+        'etapa_seconds_count{camera="sala"} 4',
+    ]
+    # El hijo se reutiliza: se puede cachear en el hot path
+    assert histogram.labels("sala") is child
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("descartes_total", "Descartes", ("camera", "reason"))
+    counter.labels('patio "norte"', "inferencia").inc()
+    counter.labels('patio "norte"', "inferencia").inc(2)
+    assert counter.render() == ['descartes_total{camera="patio \\"norte\\"",reason="inferencia"} 3.0']
+
+
+def test_registry_renders_callbacks_and_skips_failing_ones(monkeypatch):
+    monkeypatch.setattr(registry, "metrics", {})
+    registry.callback("cola_profundidad", "Frames en cola", ("queue",), lambda: {("batch",): 3})
+    registry.callback("rota", "Siempre falla", (), lambda: 1 / 0)
+    counter = registry.counter("frames_total", "Frames")
+    counter.labels().inc()
+    # Pedir de nuevo la métrica devuelve la ya registrada
+    assert registry.counter("frames_total", "Frames") is counter
+
+    assert registry.render() == (
+        "# HELP cola_profundidad Frames en cola\n"
+        "# TYPE cola_profundidad gauge\n"
+        'cola_profundidad{queue="batch"} 3\n'
+        "# HELP rota Siempre falla\n"
+        "# TYPE rota gauge\n"
+        "# HELP frames_total Frames\n"
+        "# TYPE frames_total counter\n"
+        "frames_total 1.0\n"
+    )
@@ -0,0 +1,63 @@
+import numpy as np
+
+from app.services.motion_gate import MotionGate
+
+
+def _frame(value=100):
+    return np.full((240, 320, 3), value, np.uint8)
+
+
+def _with_block(fraction_of_width, value=220):
+    """Frame con un bloque que cubre `fraction_of_width` del ancho, todo el alto"""
+    frame = _frame()
+    frame[:, :int(320 * fraction_of_width)] = value
+    return frame
+
+
+def test_identical_frames_are_gated():
+    gate = MotionGate(threshold=0.05, force_interval=10)
+    assert gate.should_infer(_frame(), now=0.0)
+    assert not gate.should_infer(_frame(), now=0.1)
+    assert gate.stats() == {'inferred': 1, 'gated': 1, 'forced': 0, 'gated_ratio': 0.5}
+
+
+def test_changed_fraction_is_compared_with_threshold():
+    gate = MotionGate(threshold=0.2, force_interval=10)
+    gate.should_infer(_frame(), now=0.0)
+    assert not gate.should_infer(_with_block(0.1), now=0.1)
+    assert gate.should_infer(_with_block(0.3), now=0.2)
+    # La referencia pasa a ser el último frame inferido
+    assert not gate.should_infer(_with_block(0.3), now=0.3)
+
+
+def test_changes_below_pixel_delta_are_ignored():
+    gate = MotionGate(threshold=0.01, pixel_delta=25, force_interval=10)
+    gate.should_infer(_frame(100), now=0.0)
+    # Un cambio de brillo global (p. ej. la exposición automática) no es movimiento
+    assert not gate.should_infer(_frame(115), now=0.1)
+    assert gate.should_infer(_frame(140), now=0.2)
+
+
+def test_still_scene_is_inferred_every_force_interval():
+    gate = MotionGate(threshold=0.05, force_interval=2.0)
+    results = [gate.should_infer(_frame(), now=second / 2) for second in range(9)]
+    assert results == [True, False, False, False, True, False, False, False, True]
+    assert gate.forced == 2
+
+
+def test_reset_and_disabled_always_infer():
+    gate = MotionGate(force_interval=10)
+    gate.should_infer(_frame(), now=0.0)
+    gate.reset()
+    assert gate.should_infer(_frame(), now=0.1)
+
+    disabled = MotionGate(enabled=False)
+    assert all(disabled.should_infer(_frame(), now=0.0) for _ in range(3))
+    assert disabled.gated == 0
+
+
+def test_grayscale_and_odd_sizes_are_supported():
+    gate = MotionGate(downscale_width=160, force_interval=10)
+    assert gate.should_infer(np.zeros((37, 61), np.uint8), now=0.0)
+    # Un cambio de resolución de la cámara reinicia la referencia
+    assert gate.should_infer(np.zeros((480, 640), np.uint8), now=0.1)
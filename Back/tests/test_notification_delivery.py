@@ -0,0 +1,92 @@
+import asyncio
+import json
+from collections import OrderedDict
+
+import pytest
+
+from app.core.config import settings
+from app.core.event_bus import EventBus
+from app.services.notification_listener import ClientOutbox, NotificationListener
+
+
+class FakeWebSocket:
+    def __init__(self, block=False):
+        self.sent = []
+        self.closed = None
+        self.block = block
+
+    async def send_text(self, message):
+        if self.block:
+            await asyncio.sleep(3600)
+        self.sent.append(json.loads(message))
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    listener = NotificationListener()
+    monkeypatch.setattr(listener, "clients", {})
+    monkeypatch.setattr(listener, "_delivered_ids", OrderedDict())
+    return listener
+
+
+def test_event_bus_isolates_failing_subscribers():
+    bus = EventBus()
+    received = []
+    unsubscribe_broken = bus.subscribe("prueba", lambda *args: 1 / 0)
+    unsubscribe = bus.subscribe("prueba", lambda *args: received.append(args))
+    bus.publish("prueba", "id", {"a": 1})
+    unsubscribe()
+    unsubscribe_broken()
+    bus.publish("prueba", "id2", {})
+    assert received == [("id", {"a": 1})]
+
+
+def test_notification_is_delivered_once_from_bus_and_store(listener):
+    async def scenario():
+        websocket = FakeWebSocket()
+        listener.clients[websocket] = ClientOutbox(websocket, listener._evict)
+        # La misma notificación llega por el bus local y luego por el listener del almacenamiento
+        listener._deliver("-N1", {"title": "CAIDA DETECTADA"})
+        listener._deliver("-N1", {"title": "CAIDA DETECTADA"})
+        listener._deliver("-N2", {"title": "CAIDA DETECTADA"})
+        await asyncio.sleep(0.01)
+        listener.disconnect(websocket)
+        return websocket.sent
+
+    assert [message['id'] for message in asyncio.run(scenario())] == ["-N1", "-N2"]
+
+
+def test_dedup_window_is_bounded(listener, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_DEDUP_SIZE", 2)
+    broadcast = []
+    monkeypatch.setattr(listener, "_broadcast_notification", broadcast.append)
+    for notification_id in ("-N1", "-N2", "-N3", "-N1", "-N3"):
+        listener._deliver(notification_id, {})
+    # -N1 salió de la ventana al llegar -N3, así que se vuelve a entregar
+    assert [notification['id'] for notification in broadcast] == ["-N1", "-N2", "-N3", "-N1"]
+    assert list(listener._delivered_ids) == ["-N3", "-N1"]
+
+
+def test_slow_client_is_evicted_without_blocking_others(listener, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_OUTBOX_SIZE", 2)
+
+    async def scenario():
+        slow, fast = FakeWebSocket(block=True), FakeWebSocket()
+        for websocket in (slow, fast):
+            listener.clients[websocket] = ClientOutbox(websocket, listener._evict)
+        for number in range(5):
+            listener._deliver(f"-N{number}", {})
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.01)
+        remaining = list(listener.clients)
+        for websocket in remaining:
+            listener.disconnect(websocket)
+        return slow, fast, remaining
+
+    slow, fast, remaining = asyncio.run(scenario())
+    assert remaining == [fast]
+    assert len(fast.sent) == 5
+    assert slow.closed == 1013
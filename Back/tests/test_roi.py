@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.core.roi import MIN_CROP, RegionOfInterest, build_roi
+from app.models.detections import Detections
+
+
+def test_crop_is_a_view_of_the_bounding_rectangle():
+    roi = RegionOfInterest([[[0.25, 0.5], [0.75, 1.0]]])
+    frame = np.zeros((480, 640, 3), np.uint8)
+    crop, offset = roi.crop(frame)
+    assert crop.shape == (240, 320, 3)
+    assert offset == (160, 240)
+    assert np.shares_memory(crop, frame)
+
+
+def test_to_frame_shifts_boxes_and_drops_centers_outside_the_zones():
+    # Triángulo: la esquina superior derecha del rectángulo envolvente queda fuera
+    roi = RegionOfInterest([[[0.0, 0.0], [0.0, 1.0], [1.0, 1.0]]])
+    shape = (100, 100, 3)
+    detections = Detections.from_array(np.array([
+        [10, 60, 20, 80, 0.9, 0],   # centro (15, 70): dentro
+        [70, 10, 90, 30, 0.8, 0],   # centro (80, 20): fuera
+    ], dtype=np.float32))
+    kept = roi.to_frame(detections, (5, 0), shape)
+    assert kept.xyxy.tolist() == [[15, 60, 25, 80]]
+
+
+@pytest.mark.parametrize("polygon", [
+    [[0.5, 0.2], [0.5, 0.8]],                # rectángulo sin ancho
+    [[0.2, 0.5], [0.8, 0.5]],                # rectángulo sin alto
+    [[0.3, 0.3], [0.3, 0.3]],                # un punto
+    [[0.1, 0.1], [0.5, 0.5], [0.9, 0.9]],    # puntos alineados
+    [[1.2, 1.2], [1.5, 1.6]],                # fuera del frame
+    [[0.5, 0.5]],                            # insuficiente
+])
+def test_degenerate_regions_are_rejected(polygon):
+    with pytest.raises(ValueError):
+        build_roi([polygon])
+
+
+@pytest.mark.parametrize("polygon, shape, expected", [
+    # Zona de menos de un píxel en una cámara de baja resolución
+    ([[0.5, 0.5], [0.501, 0.501]], (120, 160), (64, 44, 96, 76)),
+    # Pegada a la esquina: se amplía hacia dentro del frame
+    ([[0.999, 0.999], [1.0, 1.0]], (480, 640), (608, 448, 640, 480)),
+    ([[0.0, 0.0], [0.001, 0.001]], (480, 640), (0, 0, MIN_CROP, MIN_CROP)),
+    # Frame más chico que el mínimo: el recorte es el frame completo
+    ([[0.4, 0.4], [0.6, 0.6]], (20, 24), (0, 0, 24, 20)),
+])
+def test_tiny_regions_still_give_a_usable_crop(polygon, shape, expected):
+    roi = RegionOfInterest([polygon])
+    assert roi.bounds(shape) == expected
+    crop, _ = roi.crop(np.zeros(shape + (3,), np.uint8))
+    assert crop.size > 0
+
+
+def test_full_frame_has_no_roi():
+    assert build_roi(None) is None
+    assert build_roi([]) is None
@@ -0,0 +1,39 @@
+import asyncio
+
+from app.api.endpoints.stream import StreamOptions, next_stream_item
+from app.core.broadcast import BroadcastHub
+
+
+def test_next_stream_item_returns_published_frame():
+    async def scenario():
+        hub = BroadcastHub()
+        subscription = hub.subscribe()
+        receiver = asyncio.create_task(asyncio.sleep(10))
+        hub.publish(b"frame")
+        item = await next_stream_item(subscription, receiver)
+        receiver.cancel()
+        return item
+
+    assert asyncio.run(scenario()) == b"frame"
+
+
+def test_next_stream_item_notices_disconnect_while_camera_stalls():
+    async def scenario():
+        hub = BroadcastHub()
+        subscription = hub.subscribe()
+        # El receptor termina (cliente desconectado) sin que la cámara publique nada
+        receiver = asyncio.create_task(asyncio.sleep(0.01))
+        item = await asyncio.wait_for(next_stream_item(subscription, receiver), 1.0)
+        # La espera cancelada no consume el próximo frame
+        hub.publish(b"frame")
+        return item, subscription.queue.get_nowait()
+
+    assert asyncio.run(scenario()) == (None, b"frame")
+
+
+def test_stream_options_parse_frames_flag():
+    options = StreamOptions()
+    options.update("overlay", "0")
+    assert (options.mode, options.frames) == ("overlay", False)
+    options.update("desconocido", "true")
+    assert (options.mode, options.frames) == ("overlay", True)
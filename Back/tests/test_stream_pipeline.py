@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.adaptive_quality import QualityLevel
+from app.core.config import settings
+from app.models.detections import CLASS_FALL, Detections
+from app.services.stream_pipeline import StreamPipeline, draw_detections, encode_variants
+
+
+class FakeStore:
+    """Acepta una detección por cámara y luego entra en cooldown"""
+
+    def __init__(self):
+        self.saved = []
+
+    def in_cooldown(self, key, now=None):
+        return any(detection['camera_id'] == key for detection in self.saved)
+
+    async def save_detection(self, detection_data):
+        if self.in_cooldown(detection_data['camera_id']):
+            return False
+        self.saved.append(detection_data)
+        return True
+
+
+def _pipeline(tmp_path, monkeypatch, store):
+    monkeypatch.setattr(settings, "CLIP_ENABLED", True)
+    monkeypatch.setattr(settings, "CLIP_DIR", str(tmp_path))
+    camera = SimpleNamespace(camera_id="sala", location="Sala", roi=None, imgsz=None)
+    return StreamPipeline(camera, yolo_service=None, firebase_service=store)
+
+
+def test_save_falls_reserves_clip_only_for_accepted_detection(tmp_path, monkeypatch):
+    store = FakeStore()
+    pipeline = _pipeline(tmp_path, monkeypatch, store)
+    reserved = []
+    reserve_path = pipeline.clip_recorder.reserve_path
+    monkeypatch.setattr(pipeline.clip_recorder, "reserve_path", lambda: reserved.append(1) or reserve_path())
+
+    falls = Detections.from_array(np.array([
+        [0, 0, 10, 10, 0.9, CLASS_FALL],
+        [20, 20, 40, 40, 0.8, CLASS_FALL],
+        [50, 50, 60, 60, 0.95, CLASS_FALL + 1],
+    ], dtype=np.float32))
+    asyncio.run(pipeline._save_falls(falls))
+    asyncio.run(pipeline._save_falls(falls))
+
+    assert len(store.saved) == 1
+    assert len(reserved) == 1
+    assert store.saved[0]['clip'].startswith(str(tmp_path))
+    assert pipeline.clip_recorder.stats()['pending_clips'] == 1
+
+
+def test_draw_detections_colors_falls_and_people():
+    frame = np.zeros((100, 100, 3), np.uint8)
+    draw_detections(frame, Detections.from_array(np.array([
+        [10, 30, 40, 60, 0.9, CLASS_FALL],
+        [60, 30, 90, 60, 0.8, CLASS_FALL + 1],
+    ], dtype=np.float32)))
+    # Borde izquierdo de cada caja: rojo para la caída y verde para la persona (BGR)
+    assert frame[45, 10].tolist() == [0, 0, 255]
+    assert frame[45, 60].tolist() == [0, 255, 0]
+    # El interior no se toca
+    assert frame[45, 25].tolist() == [0, 0, 0]
+
+    untouched = np.zeros((10, 10, 3), np.uint8)
+    draw_detections(untouched, Detections.empty())
+    assert not untouched.any()
+
+
+def test_encode_variants_shares_encodes_between_levels():
+    levels = QualityLevel.parse_levels([[90, 1.0, 0], [90, 1.0, 15], [60, 0.5, 10]])
+    frame = np.random.default_rng(0).integers(0, 255, (64, 96, 3), dtype=np.uint8)
+    variants = encode_variants(frame, levels, {0, 1, 2})
+    # Los niveles que solo difieren en FPS comparten el mismo JPEG
+    assert variants[0] is variants[1]
+    assert variants[2] is not variants[0]
+    assert len(variants[2]) < len(variants[0])
@@ -0,0 +1,117 @@
+import json
+from datetime import datetime
+
+import cv2
+import numpy as np
+import pytest
+
+from app.models.detections import Detections
+from app.services import video_analysis
+from app.services.video_analysis import analyze_chunk, merge_detections, plan_chunks
+
+_VideoCapture = cv2.VideoCapture
+
+
+def _row(video_time, frame):
+    return {
+        'video': 'sala.mp4',
+        'frame': frame,
+        'video_time': video_time,
+        'class_id': 0,
+        'confidence': 0.9,
+        'bbox': [0, 0, 10, 10],
+    }
+
+
+def test_merge_detections_applies_cooldown():
+    rows = [_row(0.0, 0), _row(5.0, 150), _row(10.0, 300), _row(29.9, 897), _row(30.0, 900)]
+    merged = merge_detections(rows, datetime(2025, 2, 20, 8, 0, 0), "Sala", cooldown_s=10.0)
+
+    records = sorted(merged.values(), key=lambda record: record['frame'])
+    # 5.0 cae dentro del enfriamiento de 0.0; 30.0 está a menos de 10 s de 29.9
+    assert [record['frame'] for record in records] == [0, 300, 897]
+    assert records[1]['timestamp'] == "2025-02-20T08:00:10"
+    assert all(record['location'] == "Sala" and record['status'] == 'pending' for record in records)
+
+
+def test_merge_detections_without_cooldown_keeps_every_row():
+    rows = [_row(0.0, 0), _row(0.1, 3)]
+    assert len(merge_detections(rows, datetime(2025, 1, 1), "Sala", cooldown_s=0.0)) == 2
+
+
+def test_merge_detections_generates_unique_ids():
+    rows = [_row(float(second), second * 30) for second in range(0, 100, 20)]
+    merged = merge_detections(rows, datetime(2025, 1, 1), "Sala", cooldown_s=10.0)
+    assert len(merged) == 5
+
+
+def _frame(number):
+    """Frame con su número codificado en 8 bloques blancos o negros, sobre ruido"""
+    image = np.random.default_rng(number).integers(0, 60, (96, 128, 3), dtype=np.uint8)
+    for bit in range(8):
+        image[0:32, bit * 16:(bit + 1) * 16] = 255 if number >> bit & 1 else 0
+    return image
+
+
+def _frame_number(image):
+    return sum(1 << bit for bit in range(8) if image[8:24, bit * 16 + 4:bit * 16 + 12].mean() > 128)
+
+
+@pytest.fixture
+def encoded_clip(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"XVID"), 25, (128, 96))
+    assert writer.isOpened()
+    for number in range(120):
+        writer.write(_frame(number))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def frame_reader(monkeypatch):
+    """En lugar del modelo, cada frame 'detecta' una caja cuyo x1 es el número leído del píxel"""
+    def predict(frames):
+        return [
+            Detections.from_array(np.array([[_frame_number(frame), 0, 1, 1, 0.9, 0]], dtype=np.float32))
+            for frame in frames
+        ]
+    monkeypatch.setattr(video_analysis, "_predict", predict)
+
+
+class KeyframeSeekCapture:
+    """Simula un códec cuyo seek cae en un keyframe cada 12 frames (y opcionalmente después)"""
+
+    def __init__(self, path, overshoot=0):
+        self.cap = _VideoCapture(path)
+        self.overshoot = overshoot
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and value:
+            value = value // 12 * 12 + self.overshoot
+        return self.cap.set(prop, value)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def _analyzed_frames(chunks, output_dir, stride=1):
+    rows = []
+    for chunk in chunks:
+        result = analyze_chunk(chunk, str(output_dir), stride=stride, batch_size=4)
+        with open(result.output_path, encoding="utf-8") as f:
+            rows.extend(json.loads(line) for line in f)
+    return rows
+
+
+@pytest.mark.parametrize("overshoot", [None, 0, 7])
+def test_chunks_report_the_frame_they_decoded(encoded_clip, frame_reader, tmp_path, monkeypatch, overshoot):
+    if overshoot is not None:
+        monkeypatch.setattr(video_analysis.cv2, "VideoCapture", lambda path: KeyframeSeekCapture(path, overshoot))
+    chunks = plan_chunks(encoded_clip, chunk_seconds=1.0)
+    assert [chunk.start_frame for chunk in chunks] == [0, 25, 50, 75, 100]
+
+    rows = _analyzed_frames(chunks, tmp_path, stride=2)
+    assert [row['frame'] for row in rows] == [row['bbox'][0] for row in rows]
+    assert [row['frame'] for row in rows] == [n for start in range(0, 120, 25) for n in range(start, min(start + 25, 120), 2)]
+    assert rows[-1]['video_time'] == round(118 / 25, 3)